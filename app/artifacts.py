@@ -0,0 +1,133 @@
+import hashlib
+import os
+import shutil
+import tarfile
+
+# Where the model artifact comes from: gs://bucket/blob, a local .tar.gz, or a local model directory
+MODEL_SOURCE = os.getenv("MODEL_SOURCE", "gs://mcp-ai-detector-models/model.tar.gz")
+# Expected SHA-256 of the archive; when empty the digest is only logged
+MODEL_SHA256 = os.getenv("MODEL_SHA256", "")
+STREAM_CHUNK_SIZE = 8 * 1024 * 1024
+
+
+class ChecksumMismatch(Exception):
+    pass
+
+
+class _HashingReader:
+    """File-like wrapper that hashes every byte read through it."""
+
+    def __init__(self, fileobj):
+        self._fileobj = fileobj
+        self.sha256 = hashlib.sha256()
+
+    def read(self, size=-1):
+        data = self._fileobj.read(size)
+        self.sha256.update(data)
+        return data
+
+    def drain(self):
+        while self.read(STREAM_CHUNK_SIZE):
+            pass
+
+    def close(self):
+        self._fileobj.close()
+
+
+def _safe_members(tar):
+    for member in tar:
+        name = os.path.normpath(member.name)
+        if name.startswith("..") or os.path.isabs(name) or not (member.isfile() or member.isdir()):
+            print(f"⚠️ Skipping unsafe archive member: {member.name}")
+            continue
+        yield member
+
+
+def stream_extract(fileobj, dest_dir: str, expected_sha256: str = "") -> str:
+    """
+    Extract a .tar.gz stream into `dest_dir` without writing the archive to disk.
+
+    The archive is read once, sequentially; its SHA-256 is computed on the
+    way through and checked against `expected_sha256` before the extracted
+    tree is moved into place. Returns the archive digest.
+    """
+    staging = dest_dir.rstrip("/") + ".partial"
+    shutil.rmtree(staging, ignore_errors=True)
+    os.makedirs(staging)
+
+    reader = _HashingReader(fileobj)
+    try:
+        with tarfile.open(fileobj=reader, mode="r|gz") as tar:
+            for member in _safe_members(tar):
+                tar.extract(member, path=staging)
+        reader.drain()
+    finally:
+        reader.close()
+
+    digest = reader.sha256.hexdigest()
+    if expected_sha256 and digest != expected_sha256.lower():
+        shutil.rmtree(staging, ignore_errors=True)
+        raise ChecksumMismatch(f"Model archive sha256 {digest} does not match expected {expected_sha256}")
+
+    # Archives are packed either as model/... or with the model files at the root
+    entries = os.listdir(staging)
+    root = os.path.join(staging, entries[0]) if entries == ["model"] else staging
+    shutil.rmtree(dest_dir, ignore_errors=True)
+    os.replace(root, dest_dir)
+    shutil.rmtree(staging, ignore_errors=True)
+    return digest
+
+
+class GCSArtifactSource:
+    def __init__(self, bucket_name: str, blob_name: str):
+        self.bucket_name = bucket_name
+        self.blob_name = blob_name
+
+    def fetch(self, dest_dir: str) -> str:
+        from google.cloud import storage
+
+        print(f"🔽 Streaming model from gs://{self.bucket_name}/{self.blob_name}...")
+        blob = storage.Client().bucket(self.bucket_name).blob(self.blob_name)
+        digest = stream_extract(blob.open("rb", chunk_size=STREAM_CHUNK_SIZE), dest_dir, MODEL_SHA256)
+        print(f"✅ Model extracted (sha256 {digest}).")
+        return dest_dir
+
+
+class LocalArchiveSource:
+    def __init__(self, path: str):
+        self.path = path
+
+    def fetch(self, dest_dir: str) -> str:
+        print(f"📦 Extracting model from {self.path}...")
+        digest = stream_extract(open(self.path, "rb"), dest_dir, MODEL_SHA256)
+        print(f"✅ Model extracted (sha256 {digest}).")
+        return dest_dir
+
+
+class LocalDirectorySource:
+    """An already-extracted model directory, used in place (tests, local runs, baked images)."""
+
+    def __init__(self, path: str):
+        self.path = path
+
+    def fetch(self, dest_dir: str) -> str:
+        return self.path
+
+
+def make_source(spec: str = MODEL_SOURCE):
+    if spec.startswith("gs://"):
+        bucket_name, _, blob_name = spec[len("gs://"):].partition("/")
+        return GCSArtifactSource(bucket_name, blob_name)
+    if spec.startswith("file://"):
+        spec = spec[len("file://"):]
+    if os.path.isdir(spec):
+        return LocalDirectorySource(spec)
+    return LocalArchiveSource(spec)
+
+
+def ensure_model(dest_dir: str, source=None) -> str:
+    """Return a directory holding the model, fetching it from `source` unless already present."""
+    source = source or make_source()
+    if not isinstance(source, LocalDirectorySource) and os.path.exists(os.path.join(dest_dir, "config.json")):
+        return dest_dir
+    return source.fetch(dest_dir)
@@ -0,0 +1,178 @@
+import os
+import torch
+
+# torch (fp32), quantized (dynamic int8 linear layers) or onnx (ONNX Runtime)
+INFERENCE_BACKEND = os.getenv("INFERENCE_BACKEND", "torch")
+# Max absolute probability deviation vs. fp32 before a backend is rejected
+BACKEND_PARITY_TOLERANCE = float(os.getenv("BACKEND_PARITY_TOLERANCE", "0.02"))
+# Optional file with one sample text per line for the parity check
+BACKEND_PARITY_SAMPLES = os.getenv("BACKEND_PARITY_SAMPLES", "")
+ONNX_FILENAME = "model.onnx"
+
+PARITY_TEXTS = [
+    "The quick brown fox jumps over the lazy dog.",
+    "In conclusion, the results demonstrate a significant improvement across all evaluated benchmarks.",
+    "honestly i dont know what happened last night lol, we just kept driving until the sun came up",
+    "As an AI language model, I can provide an overview of the key factors that influence climate change.",
+    "My grandmother's kitchen always smelled of cardamom and burnt sugar on Sunday mornings.",
+    "The committee shall convene quarterly to review compliance with the provisions set forth herein.",
+    "Photosynthesis converts light energy into chemical energy stored in glucose molecules.",
+    "ok",
+]
+
+
+class TorchBackend:
+    """Runs the PyTorch model as loaded (fp32)."""
+
+    name = "torch"
+
+    def __init__(self, model, device):
+        self.model = model
+        self.device = device
+
+    def to_device(self, inputs: dict) -> dict:
+        return {k: v.to(self.device) for k, v in inputs.items()}
+
+    def run(self, inputs: dict) -> torch.Tensor:
+        with torch.inference_mode():
+            return self.model(**inputs).logits
+
+    def __call__(self, inputs: dict) -> torch.Tensor:
+        return self.run(self.to_device(inputs))
+
+
+class QuantizedBackend(TorchBackend):
+    """PyTorch dynamic int8 quantization of every nn.Linear (CPU only)."""
+
+    name = "quantized"
+
+    def __init__(self, model):
+        quantized = torch.quantization.quantize_dynamic(model.cpu(), {torch.nn.Linear}, dtype=torch.qint8)
+        quantized.eval()
+        super().__init__(quantized, torch.device("cpu"))
+
+
+class _LogitsOnly(torch.nn.Module):
+    def __init__(self, model):
+        super().__init__()
+        self.model = model
+
+    def forward(self, input_ids, attention_mask):
+        return self.model(input_ids=input_ids, attention_mask=attention_mask).logits
+
+
+def export_onnx(model, path: str):
+    """Export the classifier to ONNX with dynamic batch and sequence axes."""
+    dummy = torch.ones((1, 8), dtype=torch.long)
+    tmp_path = path + ".tmp"
+    torch.onnx.export(
+        _LogitsOnly(model.cpu()).eval(),
+        (dummy, dummy),
+        tmp_path,
+        input_names=["input_ids", "attention_mask"],
+        output_names=["logits"],
+        dynamic_axes={
+            "input_ids": {0: "batch", 1: "sequence"},
+            "attention_mask": {0: "batch", 1: "sequence"},
+            "logits": {0: "batch"},
+        },
+        opset_version=14,
+    )
+    os.replace(tmp_path, path)
+
+
+class OnnxBackend:
+    """Runs an ONNX export of the model under ONNX Runtime; exports on first use."""
+
+    name = "onnx"
+
+    def __init__(self, model, model_dir: str):
+        self.path = os.path.join(model_dir, ONNX_FILENAME)
+        if not os.path.exists(self.path):
+            print("📦 Exporting model to ONNX...")
+            export_onnx(model, self.path)
+            print("✅ ONNX export written.")
+        self._session = None
+        self._pid = None
+
+    @property
+    def session(self):
+        # ONNX Runtime thread pools don't survive fork(), so forked workers open their own session
+        if self._pid != os.getpid():
+            import onnxruntime as ort
+
+            options = ort.SessionOptions()
+            options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+            options.intra_op_num_threads = torch.get_num_threads()
+            self._session = ort.InferenceSession(self.path, options, providers=["CPUExecutionProvider"])
+            self._pid = os.getpid()
+        return self._session
+
+    def to_device(self, inputs: dict) -> dict:
+        return {
+            "input_ids": inputs["input_ids"].cpu().numpy(),
+            "attention_mask": inputs["attention_mask"].cpu().numpy(),
+        }
+
+    def run(self, feeds: dict) -> torch.Tensor:
+        logits = self.session.run(["logits"], feeds)[0]
+        return torch.from_numpy(logits)
+
+    def __call__(self, inputs: dict) -> torch.Tensor:
+        return self.run(self.to_device(inputs))
+
+
+def _parity_texts() -> list:
+    if BACKEND_PARITY_SAMPLES and os.path.exists(BACKEND_PARITY_SAMPLES):
+        with open(BACKEND_PARITY_SAMPLES, encoding="utf-8") as f:
+            texts = [line.strip() for line in f if line.strip()]
+        if texts:
+            return texts
+    return PARITY_TEXTS
+
+
+def check_parity(reference, candidate, tokenizer, texts: list, temperature: float, max_length: int) -> float:
+    """Max absolute difference in class probabilities between two backends over `texts`."""
+    inputs = tokenizer(texts, return_tensors="pt", truncation=True, padding=True, max_length=max_length)
+    expected = torch.softmax(reference(inputs).float() / temperature, dim=-1)
+    actual = torch.softmax(candidate(inputs).float() / temperature, dim=-1)
+    return float((expected - actual).abs().max())
+
+
+def load_backend(model, device, tokenizer, model_dir: str, temperature: float, max_length: int,
+                 name: str = INFERENCE_BACKEND):
+    """
+    Build the configured inference backend.
+
+    Non-fp32 backends are only accepted if their probabilities stay within
+    BACKEND_PARITY_TOLERANCE of the fp32 model on the parity sample set;
+    otherwise (or if building them fails) the fp32 backend is returned.
+    """
+    reference = TorchBackend(model, device)
+    if name == "torch":
+        return reference
+    if name not in ("quantized", "onnx"):
+        print(f"⚠️ Unknown INFERENCE_BACKEND '{name}', using torch.")
+        return reference
+    if device.type != "cpu":
+        print(f"⚠️ INFERENCE_BACKEND '{name}' targets CPU, keeping torch on {device}.")
+        return reference
+
+    try:
+        if name == "quantized":
+            candidate = QuantizedBackend(model)
+        else:
+            candidate = OnnxBackend(model, model_dir)
+        deviation = check_parity(reference, candidate, tokenizer, _parity_texts(), temperature, max_length)
+    except Exception as e:
+        print(f"⚠️ Could not build '{name}' backend ({e}), using torch.")
+        return reference
+
+    if deviation > BACKEND_PARITY_TOLERANCE:
+        print(f"⚠️ '{name}' backend rejected: max probability deviation {deviation:.4f} "
+              f"> {BACKEND_PARITY_TOLERANCE}. Using torch.")
+        return reference
+
+    print(f"✅ '{name}' backend accepted: max probability deviation {deviation:.4f}.")
+    candidate.parity_deviation = deviation
+    return candidate
@@ -0,0 +1,106 @@
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+from app.profiling import capture
+
+# Batching knobs (override through the deployment env)
+BATCH_MAX_SIZE = int(os.getenv("BATCH_MAX_SIZE", "16"))
+BATCH_MAX_WAIT_MS = float(os.getenv("BATCH_MAX_WAIT_MS", "10"))
+
+
+class MicroBatcher:
+    """
+    Collects concurrent single-text predictions into padded batches.
+
+    Callers block on `predict` (or hold the Future from `submit`) while a
+    background thread groups whatever arrived within `max_wait_ms` -- up to
+    `max_batch_size` texts -- runs `batch_fn` once and hands every caller its
+    own row of the result.
+
+    With an `executor`, batches run on its workers and the next batch is only
+    collected once a worker is free, so queued requests coalesce into larger
+    batches under load instead of queueing as many small ones.
+    """
+
+    def __init__(self, batch_fn, max_batch_size: int = BATCH_MAX_SIZE, max_wait_ms: float = BATCH_MAX_WAIT_MS,
+                 executor=None):
+        self.batch_fn = batch_fn
+        self.max_batch_size = max(1, max_batch_size)
+        self.max_wait = max(0.0, max_wait_ms) / 1000.0
+        self.executor = executor
+        self._slots = None
+        self._queue = None
+        self._thread = None
+        self._pid = None
+        self._lock = threading.Lock()
+
+    def _ensure_started(self):
+        # Started lazily (and restarted after a fork) so importing the app never spawns threads
+        if self._pid == os.getpid() and self._thread is not None and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._pid == os.getpid() and self._thread is not None and self._thread.is_alive():
+                return
+            if self._pid != os.getpid():
+                self._queue = queue.Queue()
+                self._slots = threading.Semaphore(self.executor.workers if self.executor else 1)
+            self._pid = os.getpid()
+            self._thread = threading.Thread(target=self._run, name="micro-batcher", daemon=True)
+            self._thread.start()
+
+    def submit(self, text: str, trace=None) -> Future:
+        self._ensure_started()
+        future = Future()
+        self._queue.put((text, future, time.monotonic(), trace))
+        return future
+
+    def predict(self, text: str) -> dict:
+        return self.submit(text).result()
+
+    def _collect(self) -> list:
+        batch = [self._queue.get()]
+        deadline = time.monotonic() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.monotonic()
+            try:
+                if remaining > 0:
+                    batch.append(self._queue.get(timeout=remaining))
+                else:
+                    batch.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        while True:
+            self._slots.acquire()
+            batch = self._collect()
+            # Drop callers that gave up while queued
+            batch = [item for item in batch if item[1].set_running_or_notify_cancel()]
+            if not batch:
+                self._slots.release()
+            elif self.executor is None:
+                self._dispatch(batch)
+                self._slots.release()
+            else:
+                running = self.executor.submit(self._dispatch, batch, queued_since=[item[2] for item in batch])
+                running.add_done_callback(lambda _: self._slots.release())
+
+    def _dispatch(self, batch: list):
+        traces = [item[3] for item in batch if item[3] is not None]
+        now = time.monotonic()
+        for _, _, enqueued, trace in batch:
+            if trace is not None:
+                trace.stages.append(("queue", (now - enqueued) * 1000))
+        try:
+            with capture(traces, len(batch)):
+                results = self.batch_fn([item[0] for item in batch])
+        except Exception as e:
+            for item in batch:
+                item[1].set_exception(e)
+            return
+        for item, result in zip(batch, results):
+            item[1].set_result(result)
@@ -0,0 +1,207 @@
+import asyncio
+import hashlib
+import json
+import os
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+
+from app.metrics import CACHE_HITS, CACHE_MISSES, CACHE_EVICTIONS, CACHE_ENTRIES, CACHE_BYTES
+
+# Cache limits (override through the deployment env)
+CACHE_MAX_ENTRIES = int(os.getenv("CACHE_MAX_ENTRIES", "10000"))
+CACHE_MAX_BYTES = int(os.getenv("CACHE_MAX_BYTES", str(64 * 1024 * 1024)))
+CACHE_TTL_SECONDS = float(os.getenv("CACHE_TTL_SECONDS", "3600"))
+# "" (in-process only), "memory" (local stand-in for a shared store) or a redis:// URL
+CACHE_SHARED_BACKEND = os.getenv("CACHE_SHARED_BACKEND", "")
+
+
+def cache_key(text: str, model_version: str, temperature: float, threshold: float) -> str:
+    normalized = unicodedata.normalize("NFC", text).strip()
+    raw = f"{model_version}|{temperature!r}|{threshold!r}|{normalized}"
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+class LRUCache:
+    """In-process LRU bounded by entry count and approximate bytes, with per-entry TTL."""
+
+    def __init__(self, max_entries: int = CACHE_MAX_ENTRIES, max_bytes: int = CACHE_MAX_BYTES,
+                 ttl_seconds: float = CACHE_TTL_SECONDS):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl_seconds = ttl_seconds
+        self._entries = OrderedDict()  # key -> (expires_at, value, size)
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+    def get(self, key: str):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires_at, value, _ = entry
+            if expires_at < time.monotonic():
+                self._remove(key, "expired")
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key: str, value: dict):
+        size = len(key) + len(json.dumps(value))
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            if key in self._entries:
+                self._remove(key, None)
+            self._entries[key] = (time.monotonic() + self.ttl_seconds, value, size)
+            self._bytes += size
+            while len(self._entries) > self.max_entries:
+                self._remove(next(iter(self._entries)), "entries")
+            while self._bytes > self.max_bytes:
+                self._remove(next(iter(self._entries)), "bytes")
+            self._report()
+
+    def _remove(self, key: str, reason):
+        _, _, size = self._entries.pop(key)
+        self._bytes -= size
+        if reason:
+            CACHE_EVICTIONS.labels(reason=reason).inc()
+            self._report()
+
+    def _report(self):
+        CACHE_ENTRIES.set(len(self._entries))
+        CACHE_BYTES.set(self._bytes)
+
+
+class MemorySharedBackend:
+    """Dict-backed stand-in for a shared cache store, for local runs and tests."""
+
+    def __init__(self):
+        self._data = {}
+        self._lock = threading.Lock()
+
+    def get(self, key: str):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return None
+            expires_at, payload = entry
+            if expires_at < time.time():
+                del self._data[key]
+                return None
+            return json.loads(payload)
+
+    def set(self, key: str, value: dict, ttl_seconds: float):
+        with self._lock:
+            self._data[key] = (time.time() + ttl_seconds, json.dumps(value))
+
+
+class RedisSharedBackend:
+    """Shared cache across replicas; needs the optional `redis` package."""
+
+    def __init__(self, url: str, prefix: str = "ai-detector:predict:"):
+        import redis
+        self._client = redis.Redis.from_url(url, socket_timeout=0.05)
+        self._prefix = prefix
+
+    def get(self, key: str):
+        payload = self._client.get(self._prefix + key)
+        return json.loads(payload) if payload is not None else None
+
+    def set(self, key: str, value: dict, ttl_seconds: float):
+        self._client.set(self._prefix + key, json.dumps(value), ex=max(1, int(ttl_seconds)))
+
+
+def make_shared_backend(spec: str = CACHE_SHARED_BACKEND):
+    if not spec:
+        return None
+    if spec == "memory":
+        return MemorySharedBackend()
+    if spec.startswith(("redis://", "rediss://")):
+        return RedisSharedBackend(spec)
+    raise ValueError(f"Unknown CACHE_SHARED_BACKEND '{spec}'")
+
+
+class PredictionCache:
+    """
+    Two-tier cache for prediction results.
+
+    Lookups go to the in-process LRU first, then to the optional shared
+    backend; shared-backend failures are treated as misses so the cache can
+    never fail a request.
+    """
+
+    def __init__(self, local: LRUCache = None, shared=None):
+        self.local = local or LRUCache()
+        self.shared = shared
+
+    def get(self, key: str):
+        value = self._get_local(key)
+        if value is None and self.shared is not None:
+            value = self._get_shared(key)
+        return self._count(value)
+
+    async def get_async(self, key: str):
+        """`get` for the event loop: the shared backend's blocking call runs on a worker thread."""
+        value = self._get_local(key)
+        if value is None and self.shared is not None:
+            value = await asyncio.to_thread(self._get_shared, key)
+        return self._count(value)
+
+    def set(self, key: str, value: dict):
+        self.local.set(key, value)
+        if self.shared is not None:
+            self._set_shared(key, value)
+
+    def set_async(self, key: str, value: dict):
+        """`set` for the event loop: the shared store is written on a worker thread, not awaited."""
+        self.local.set(key, value)
+        if self.shared is not None:
+            asyncio.get_running_loop().run_in_executor(None, self._set_shared, key, value)
+
+    def _count(self, value):
+        if value is None:
+            CACHE_MISSES.inc()
+            return None
+        return dict(value)
+
+    def _get_local(self, key: str):
+        value = self.local.get(key)
+        if value is not None:
+            CACHE_HITS.labels(tier="local").inc()
+        return value
+
+    def _get_shared(self, key: str):
+        try:
+            value = self.shared.get(key)
+        except Exception as e:
+            print(f"⚠️ Shared cache get failed: {e}")
+            return None
+        if value is not None:
+            CACHE_HITS.labels(tier="shared").inc()
+            self.local.set(key, value)
+        return value
+
+    def _set_shared(self, key: str, value: dict):
+        try:
+            self.shared.set(key, value, self.local.ttl_seconds)
+        except Exception as e:
+            print(f"⚠️ Shared cache set failed: {e}")
+
+    def get_or_compute(self, key: str, compute) -> dict:
+        value = self.get(key)
+        if value is None:
+            value = compute()
+            self.set(key, value)
+        return value
+
+    def get_or_compute_many(self, keys: list, compute_many) -> list:
+        """Look up every key and compute only the misses, in one `compute_many(indices)` call."""
+        values = [self.get(key) for key in keys]
+        missing = [i for i, value in enumerate(values) if value is None]
+        if missing:
+            for i, value in zip(missing, compute_many(missing)):
+                values[i] = value
+                self.set(keys[i], value)
+        return values
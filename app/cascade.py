@@ -0,0 +1,152 @@
+"""
+Two-stage cascade: a TF-IDF + logistic regression pre-classifier answers the
+texts it is confident about and escalates the rest to RoBERTa.
+
+Train the first stage and pick an uncertainty band offline:
+
+    python -m app.cascade --data labeled.csv --out cascade.joblib
+
+The CSV needs a text column and a 0/1 label column (1 = AI). Pass
+`--transformer-column` with RoBERTa's predicted labels for the same rows to
+also see the end-to-end accuracy of each band.
+"""
+import argparse
+import hashlib
+import os
+
+from app.metrics import CASCADE_DECISIONS
+from app.utils import to_result, THRESHOLD
+
+# Empty disables the cascade
+CASCADE_MODEL_PATH = os.getenv("CASCADE_MODEL_PATH", "")
+# Texts whose first-stage AI probability falls inside [low, high] go to RoBERTa
+CASCADE_LOW = float(os.getenv("CASCADE_LOW", "0.2"))
+CASCADE_HIGH = float(os.getenv("CASCADE_HIGH", "0.8"))
+
+BANDS = [(0.5, 0.5), (0.4, 0.6), (0.3, 0.7), (0.2, 0.8), (0.1, 0.9), (0.05, 0.95), (0.0, 1.0)]
+
+
+class Cascade:
+    def __init__(self, pipeline, low: float = CASCADE_LOW, high: float = CASCADE_HIGH, version: str = ""):
+        self.pipeline = pipeline
+        self.low = low
+        self.high = high
+        self.version = version
+        self._ai_column = list(pipeline.classes_).index(1)
+
+    def ai_probabilities(self, texts: list) -> list:
+        return self.pipeline.predict_proba(texts)[:, self._ai_column].tolist()
+
+    def score(self, texts: list, transformer_fn) -> list:
+        """Decide confident texts with the first stage; send the rest through `transformer_fn` as one call."""
+        results = [None] * len(texts)
+        escalated = []
+        for i, ai in enumerate(self.ai_probabilities(texts)):
+            if self.low <= ai <= self.high:
+                escalated.append(i)
+            else:
+                results[i] = {**to_result(1.0 - ai, ai, THRESHOLD), "stage": "prefilter"}
+
+        if escalated:
+            for i, result in zip(escalated, transformer_fn([texts[i] for i in escalated])):
+                results[i] = {**result, "stage": "transformer"}
+
+        CASCADE_DECISIONS.labels(stage="prefilter").inc(len(texts) - len(escalated))
+        CASCADE_DECISIONS.labels(stage="transformer").inc(len(escalated))
+        return results
+
+
+def load_cascade(path: str = CASCADE_MODEL_PATH):
+    """Load the first-stage pipeline, or return None when the cascade is disabled or unusable."""
+    if not path:
+        return None
+    if not os.path.exists(path):
+        print(f"⚠️ CASCADE_MODEL_PATH {path} not found, cascade disabled.")
+        return None
+    if not CASCADE_LOW <= THRESHOLD <= CASCADE_HIGH:
+        print(f"⚠️ Cascade band [{CASCADE_LOW}, {CASCADE_HIGH}] should contain the threshold {THRESHOLD}.")
+
+    import joblib
+
+    with open(path, "rb") as f:
+        version = hashlib.sha256(f.read()).hexdigest()[:12]
+    print(f"✅ Cascade pre-classifier loaded ({version}), band [{CASCADE_LOW}, {CASCADE_HIGH}].")
+    return Cascade(joblib.load(path), CASCADE_LOW, CASCADE_HIGH, version)
+
+
+def build_pipeline():
+    from sklearn.feature_extraction.text import TfidfVectorizer
+    from sklearn.linear_model import LogisticRegression
+    from sklearn.pipeline import Pipeline
+
+    return Pipeline([
+        ("tfidf", TfidfVectorizer(ngram_range=(1, 2), sublinear_tf=True, min_df=2, max_features=200000)),
+        ("clf", LogisticRegression(max_iter=1000, C=4.0)),
+    ])
+
+
+def band_report(ai_probs, labels, transformer_preds=None, bands=BANDS) -> list:
+    """Accuracy vs. escalation rate for each (low, high) band on held-out data."""
+    rows = []
+    for low, high in bands:
+        escalated = [low <= p <= high for p in ai_probs]
+        decided = [(int(p > THRESHOLD), y) for p, y, e in zip(ai_probs, labels, escalated) if not e]
+        row = {
+            "low": low,
+            "high": high,
+            "escalation_rate": sum(escalated) / len(labels),
+            "prefilter_accuracy": sum(p == y for p, y in decided) / len(decided) if decided else None,
+        }
+        if transformer_preds is not None:
+            final = [t if e else int(p > THRESHOLD)
+                     for p, t, e in zip(ai_probs, transformer_preds, escalated)]
+            row["cascade_accuracy"] = sum(p == y for p, y in zip(final, labels)) / len(labels)
+        rows.append(row)
+    return rows
+
+
+def main():
+    import joblib
+    import pandas as pd
+    from sklearn.model_selection import train_test_split
+
+    parser = argparse.ArgumentParser(description="Train the cascade pre-classifier and report band tradeoffs.")
+    parser.add_argument("--data", required=True, help="CSV with labeled texts")
+    parser.add_argument("--text-column", default="text")
+    parser.add_argument("--label-column", default="label", help="0 = human, 1 = AI")
+    parser.add_argument("--transformer-column", default=None,
+                        help="Optional column with RoBERTa's predicted labels, for end-to-end accuracy")
+    parser.add_argument("--test-size", type=float, default=0.2)
+    parser.add_argument("--out", default="cascade.joblib")
+    args = parser.parse_args()
+
+    df = pd.read_csv(args.data).dropna(subset=[args.text_column, args.label_column])
+    train, test = train_test_split(df, test_size=args.test_size, random_state=42,
+                                   stratify=df[args.label_column])
+
+    pipeline = build_pipeline()
+    pipeline.fit(train[args.text_column].astype(str), train[args.label_column].astype(int))
+    joblib.dump(pipeline, args.out)
+    print(f"✅ Pre-classifier trained on {len(train)} texts, saved to {args.out}")
+
+    cascade = Cascade(pipeline)
+    ai_probs = cascade.ai_probabilities(test[args.text_column].astype(str).tolist())
+    labels = test[args.label_column].astype(int).tolist()
+    transformer_preds = (test[args.transformer_column].astype(int).tolist()
+                         if args.transformer_column else None)
+
+    print(f"\nHeld-out set: {len(test)} texts")
+    header = f"{'band':>13} {'escalated':>10} {'prefilter acc':>14}"
+    if transformer_preds is not None:
+        header += f" {'cascade acc':>12}"
+    print(header)
+    for row in band_report(ai_probs, labels, transformer_preds):
+        acc = f"{row['prefilter_accuracy']:.4f}" if row["prefilter_accuracy"] is not None else "-"
+        line = f"[{row['low']:.2f}, {row['high']:.2f}] {row['escalation_rate']:>10.1%} {acc:>14}"
+        if transformer_preds is not None:
+            line += f" {row['cascade_accuracy']:>12.4f}"
+        print(line)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,132 @@
+import asyncio
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+
+import torch
+
+from app.metrics import INFERENCE_QUEUE_DEPTH, INFERENCE_IN_FLIGHT, INFERENCE_QUEUE_WAIT, INFERENCE_REJECTED
+
+# Executor sizing (override through the deployment env)
+INFERENCE_WORKERS = int(os.getenv("INFERENCE_WORKERS", "1"))
+INFERENCE_QUEUE_SIZE = int(os.getenv("INFERENCE_QUEUE_SIZE", "64"))
+TORCH_THREADS = int(os.getenv("TORCH_THREADS", "0"))  # 0 = pod CPUs / (processes * workers)
+# Server processes sharing the pod's CPUs (set by app.serve)
+SERVE_WORKERS = max(1, int(os.getenv("SERVE_WORKERS", "1")))
+RETRY_AFTER_SECONDS = int(os.getenv("RETRY_AFTER_SECONDS", "1"))
+
+
+class QueueFull(Exception):
+    pass
+
+
+def available_cpus() -> int:
+    """CPUs this container may use: the cgroup quota if one is set, else the host count."""
+    try:
+        # cgroup v2: "<quota> <period>" or "max <period>"
+        with open("/sys/fs/cgroup/cpu.max") as f:
+            quota, period = f.read().split()
+        if quota != "max":
+            return max(1, int(int(quota) // int(period)))
+    except (OSError, ValueError):
+        pass
+    try:
+        # cgroup v1
+        with open("/sys/fs/cgroup/cpu/cpu.cfs_quota_us") as f:
+            quota = int(f.read())
+        with open("/sys/fs/cgroup/cpu/cpu.cfs_period_us") as f:
+            period = int(f.read())
+        if quota > 0:
+            return max(1, quota // period)
+    except (OSError, ValueError):
+        pass
+    return os.cpu_count() or 1
+
+
+class InferenceExecutor:
+    """
+    Dedicated worker threads for model inference with admission control.
+
+    At most `workers` tasks run at once and at most `max_queue` more may
+    wait; `admit()` raises QueueFull beyond that instead of letting requests
+    pile up. torch intra-op threads are split across the workers (and the
+    server processes) so the total matches the pod's CPU allowance.
+    """
+
+    def __init__(self, workers: int = INFERENCE_WORKERS, max_queue: int = INFERENCE_QUEUE_SIZE,
+                 torch_threads: int = TORCH_THREADS):
+        self.workers = max(1, workers)
+        self.max_admitted = self.workers + max(0, max_queue)
+        self.torch_threads = torch_threads or max(1, available_cpus() // (SERVE_WORKERS * self.workers))
+        self._admitted = 0
+        self._running = 0
+        self._lock = threading.Lock()
+        self._pool = None
+        self._pid = None
+        torch.set_num_threads(self.torch_threads)
+
+    def _ensure_pool(self):
+        # Created lazily (and again after a fork), like the micro-batcher thread
+        if self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            torch.set_num_threads(self.torch_threads)
+            self._pool = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="inference")
+            self._pid = os.getpid()
+
+    def _report(self):
+        # Set explicitly (not set_function) so the gauges also work in Prometheus multiprocess mode
+        INFERENCE_QUEUE_DEPTH.set(max(0, self._admitted - self._running))
+        INFERENCE_IN_FLIGHT.set(self._admitted)
+
+    def acquire(self, count: int = 1):
+        """Reserve admission for `count` requests or raise QueueFull; pair with `release`."""
+        with self._lock:
+            if self._admitted + count > self.max_admitted:
+                INFERENCE_REJECTED.labels(reason="queue_full").inc()
+                raise QueueFull(f"Inference queue is full ({self._admitted} requests admitted)")
+            self._admitted += count
+            self._report()
+
+    def release(self, count: int = 1):
+        with self._lock:
+            self._admitted -= count
+            self._report()
+
+    @contextmanager
+    def admit(self, count: int = 1):
+        self.acquire(count)
+        try:
+            yield
+        finally:
+            self.release(count)
+
+    def submit(self, fn, *args, queued_since: list = None):
+        """Run `fn(*args)` on a worker; `queued_since` holds the enqueue time of each request it serves."""
+        self._ensure_pool()
+        queued_since = queued_since or [time.monotonic()]
+
+        def run():
+            started = time.monotonic()
+            for enqueued in queued_since:
+                INFERENCE_QUEUE_WAIT.observe(started - enqueued)
+            with self._lock:
+                self._running += len(queued_since)
+                self._report()
+            try:
+                return fn(*args)
+            finally:
+                with self._lock:
+                    self._running -= len(queued_since)
+                    self._report()
+
+        return self._pool.submit(run)
+
+    async def run(self, fn, *args):
+        """Admit one request and await `fn(*args)` on a worker without blocking the event loop."""
+        with self.admit():
+            return await asyncio.wrap_future(self.submit(fn, *args))
@@ -1,7 +1,19 @@
-from fastapi import FastAPI, HTTPException
-from pydantic import BaseModel
-from app.utils import predict
+from fastapi import FastAPI, HTTPException, Request, Header
+from fastapi.responses import JSONResponse
+from starlette.background import BackgroundTask
+from pydantic import BaseModel, Field
+from typing import List, Literal, Optional
+from app.utils import (predict_batch, predict_bucketed, predict_long, start_loading, start_deploy, start_watching,
+                       model_ready, model_status, TEMPERATURE, THRESHOLD, WINDOW_STRIDE, VERSION_PATTERN)
+from app.registry import registry
+from app.batching import MicroBatcher
+from app.executor import InferenceExecutor, QueueFull, RETRY_AFTER_SECONDS, SERVE_WORKERS
+from app.cascade import load_cascade
+from app.profiling import start_trace, finish_trace, traced, slowest_calls
+from app.streaming import DuplexStreamingResponse, iter_rows, score_rows, FORMATS
+from app.cache import PredictionCache, LRUCache, cache_key, make_shared_backend
 from prometheus_fastapi_instrumentator import Instrumentator
+import asyncio
 import os
 # import tiktoken
 
@@ -13,6 +25,56 @@ app = FastAPI(title="AI Text Detection API")
 instrumentator = Instrumentator()
 instrumentator.instrument(app).expose(app, include_in_schema=True)
 
+MAX_BATCH_TEXTS = int(os.getenv("MAX_BATCH_TEXTS", "1000"))
+# Required in X-Admin-Token for /admin endpoints; empty disables them
+ADMIN_TOKEN = os.getenv("ADMIN_TOKEN", "")
+
+# Optional TF-IDF pre-classifier that only escalates uncertain texts to RoBERTa
+cascade = load_cascade()
+
+def _score_batch(texts: list) -> list:
+    return cascade.score(texts, predict_batch) if cascade else predict_batch(texts)
+
+def _score_bucketed(texts: list) -> list:
+    return cascade.score(texts, predict_bucketed) if cascade else predict_bucketed(texts)
+
+# All inference runs on a dedicated, bounded pool instead of the event loop's threadpool
+inference_pool = InferenceExecutor()
+
+# Concurrent /predict calls share padded forward passes
+batcher = MicroBatcher(_score_batch, executor=inference_pool)
+
+# Resubmitted texts are answered without a forward pass
+prediction_cache = PredictionCache(LRUCache(), make_shared_backend())
+
+def _cache_key(text: str) -> str:
+    # The routing signature changes with every swap or weight change, so old entries just stop matching
+    version = registry.signature()
+    if cascade:
+        version = f"{version}+cascade-{cascade.version}"
+    return cache_key(text, version, TEMPERATURE, THRESHOLD)
+
+def _require_model():
+    if not model_ready.is_set():
+        raise HTTPException(status_code=503, detail="Model is still loading", headers={"Retry-After": "5"})
+
+def _require_admin(token: Optional[str]):
+    if not ADMIN_TOKEN:
+        raise HTTPException(status_code=403, detail="Admin endpoints are disabled (ADMIN_TOKEN is not set)")
+    if token != ADMIN_TOKEN:
+        raise HTTPException(status_code=401, detail="Invalid admin token")
+
+def _require_single_worker():
+    # Forked workers each hold a registry; a change here would only reach the worker taking the request
+    if SERVE_WORKERS > 1:
+        raise HTTPException(status_code=409, detail="With SERVE_WORKERS > 1, model versions are changed "
+                                                    "through MODEL_MANIFEST, which the parent process applies")
+
+@app.exception_handler(QueueFull)
+async def queue_full_handler(request: Request, exc: QueueFull):
+    return JSONResponse(status_code=429, content={"detail": str(exc)},
+                        headers={"Retry-After": str(RETRY_AFTER_SECONDS)})
+
 class PredictRequest(BaseModel):
     text: str
 
@@ -20,14 +82,192 @@ class PredictResponse(BaseModel):
     prediction: int  # 0 = Human, 1 = AI
     confidence: float
     probabilities: dict
+    stage: str = "transformer"  # model that decided: "prefilter" (cascade) or "transformer"
+    model_version: Optional[str] = None  # transformer version that scored the text
+
+class LongPredictRequest(BaseModel):
+    text: str
+    aggregation: Literal["mean", "max", "weighted"] = "mean"
+    stride: int = WINDOW_STRIDE
+    return_windows: bool = False
+
+class WindowResult(PredictResponse):
+    start: int  # token offsets of the window within the document
+    end: int
+
+class LongPredictResponse(PredictResponse):
+    windows: Optional[List[WindowResult]] = None
+
+class BatchPredictRequest(BaseModel):
+    texts: List[str]
+
+class BatchPredictResponse(BaseModel):
+    results: List[PredictResponse]
+
+class DeployRequest(BaseModel):
+    version: str
+    source: str  # gs://bucket/path.tar.gz, a local .tar.gz or a model directory
+    weight: float = Field(1.0, gt=0)
+    mode: Literal["replace", "canary"] = "replace"  # canary serves next to the current versions
+
+class WeightRequest(BaseModel):
+    weight: float = Field(..., gt=0)
+
+@app.on_event("startup")
+def start_model_loading():
+    # Model fetch/load runs in the background; /ready reports when it is done
+    start_loading()
+    # Then keep the served versions in line with MODEL_MANIFEST, if set (app.serve's parent does it
+    # for several workers)
+    if SERVE_WORKERS == 1:
+        start_watching()
 
 @app.get("/")
 def read_root():
+    status = model_status()
+    if status["error"]:
+        # Let the liveness probe restart the pod if loading failed for good
+        raise HTTPException(status_code=500, detail=f"Model loading failed: {status['error']}")
     return {"message": "AI Text Detector is live!"}
 
+@app.get("/ready")
+def read_ready():
+    status = model_status()
+    if not status["ready"]:
+        raise HTTPException(status_code=503, detail=status, headers={"Retry-After": "5"})
+    return status
+
+@app.get("/debug/profiles")
+def read_profiles():
+    # Slowest sampled calls (PROFILE_SAMPLE_RATE or "X-Profile: 1"), with stage timings and cProfile output
+    return {"slowest": slowest_calls.snapshot()}
+
+@app.get("/admin/models")
+def list_models(x_admin_token: Optional[str] = Header(None)):
+    _require_admin(x_admin_token)
+    return {"versions": registry.versions(), "loading": registry.loading}
+
+@app.post("/admin/models", status_code=202)
+def deploy_model(request: DeployRequest, x_admin_token: Optional[str] = Header(None)):
+    """Load a version in the background, warm it up, then swap it in (or add it as a canary)."""
+    _require_admin(x_admin_token)
+    _require_single_worker()
+    if not VERSION_PATTERN.match(request.version):
+        raise HTTPException(status_code=400, detail=f"Invalid model version '{request.version}'")
+    if registry.get(request.version) or registry.loading.get(request.version) == "loading":
+        raise HTTPException(status_code=409, detail=f"Model {request.version} is already served or loading")
+    start_deploy(request.version, request.source, request.weight, replace=request.mode == "replace")
+    return {"version": request.version, "status": "loading"}
+
+@app.put("/admin/models/{version}")
+def set_model_weight(version: str, request: WeightRequest, x_admin_token: Optional[str] = Header(None)):
+    _require_admin(x_admin_token)
+    _require_single_worker()
+    if not registry.set_weight(version, request.weight):
+        raise HTTPException(status_code=404, detail=f"Model {version} is not served")
+    return {"versions": registry.versions()}
+
+@app.delete("/admin/models/{version}")
+def retire_model(version: str, x_admin_token: Optional[str] = Header(None)):
+    """Stop routing to a version; it is released once its in-flight calls finish."""
+    _require_admin(x_admin_token)
+    _require_single_worker()
+    if registry.get(version) is None:
+        raise HTTPException(status_code=404, detail=f"Model {version} is not served")
+    if not registry.retire(version):
+        raise HTTPException(status_code=409, detail="Cannot retire the only served version")
+    return {"versions": registry.versions()}
+
 @app.post("/predict", response_model=PredictResponse)
-def predict_text(request: PredictRequest):
+async def predict_text(request: PredictRequest, x_profile: Optional[str] = Header(None)):
+    if not request.text.strip():
+        raise HTTPException(status_code=400, detail="Text must not be empty")
+    _require_model()
+    key = _cache_key(request.text)
+    result = await prediction_cache.get_async(key)
+    if result is None:
+        trace = start_trace("/predict", x_profile)
+        with inference_pool.admit():
+            result = await asyncio.wrap_future(batcher.submit(request.text, trace))
+        finish_trace(trace)
+        prediction_cache.set_async(key, result)
+    return result
+
+@app.post("/predict/long", response_model=LongPredictResponse, response_model_exclude_none=True)
+async def predict_long_text(request: LongPredictRequest, x_profile: Optional[str] = Header(None)):
     if not request.text.strip():
         raise HTTPException(status_code=400, detail="Text must not be empty")
-    return predict(request.text)
+    _require_model()
+    trace = start_trace("/predict/long", x_profile)
+    try:
+        result = await inference_pool.run(traced(
+            trace, lambda: predict_long(request.text, stride=request.stride, aggregation=request.aggregation,
+                                        return_windows=request.return_windows)
+        ))
+    except ValueError as e:
+        raise HTTPException(status_code=413, detail=str(e))
+    finish_trace(trace)
+    return result
+
+@app.post("/predict/batch", response_model=BatchPredictResponse)
+async def predict_texts(request: BatchPredictRequest, x_profile: Optional[str] = Header(None)):
+    if not request.texts:
+        raise HTTPException(status_code=400, detail="Texts must not be empty")
+    if len(request.texts) > MAX_BATCH_TEXTS:
+        raise HTTPException(status_code=413, detail=f"At most {MAX_BATCH_TEXTS} texts per batch")
+    empty = [i for i, text in enumerate(request.texts) if not text.strip()]
+    if empty:
+        raise HTTPException(status_code=400, detail=f"Texts must not be empty (indices {empty[:10]})")
+    _require_model()
+    keys = [_cache_key(text) for text in request.texts]
+    trace = start_trace("/predict/batch", x_profile)
+    results = await inference_pool.run(
+        traced(trace, prediction_cache.get_or_compute_many), keys,
+        lambda missing: _score_bucketed([request.texts[i] for i in missing])
+    )
+    finish_trace(trace)
+    return {"results": results}
+
+@app.post("/predict/stream")
+async def predict_stream(request: Request, format: Optional[str] = None, text_field: str = "text",
+                         id_field: str = "id"):
+    """
+    Score an NDJSON or CSV upload row by row and stream the results back as NDJSON.
+
+    The body is parsed as it arrives and scored in batches, so memory stays
+    constant regardless of corpus size. `format` defaults from Content-Type.
+    """
+    fmt = format or ("csv" if "csv" in request.headers.get("content-type", "") else "ndjson")
+    if fmt not in FORMATS:
+        raise HTTPException(status_code=400, detail=f"format must be one of {FORMATS}")
+    _require_model()
+
+    async def score_batch(texts: list) -> list:
+        keys = [_cache_key(text) for text in texts]
+        return await asyncio.wrap_future(inference_pool.submit(
+            prediction_cache.get_or_compute_many, keys, lambda missing: _score_bucketed([texts[i] for i in missing])
+        ))
+
+    # One admission slot for the whole stream, returned exactly once however the response ends
+    inference_pool.acquire()
+    released = False
+
+    def release():
+        nonlocal released
+        if not released:
+            released = True
+            inference_pool.release()
+
+    async def body():
+        try:
+            async for line in score_rows(iter_rows(request.stream(), fmt, text_field, id_field), score_batch):
+                yield line
+        finally:
+            release()
 
+    try:
+        # The background task also covers a body that never started (client gone before the first chunk)
+        return DuplexStreamingResponse(body(), media_type="application/x-ndjson", background=BackgroundTask(release))
+    except BaseException:
+        release()
+        raise
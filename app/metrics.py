@@ -0,0 +1,52 @@
+from prometheus_client import Counter, Gauge, Histogram
+
+# Registered on the default registry, so they are served by the Instrumentator's /metrics endpoint.
+# multiprocess_mode only applies when PROMETHEUS_MULTIPROC_DIR is set (app.serve with several workers).
+
+# Prediction cache
+CACHE_HITS = Counter("prediction_cache_hits_total", "Prediction cache hits", ["tier"])
+CACHE_MISSES = Counter("prediction_cache_misses_total", "Prediction cache misses")
+CACHE_EVICTIONS = Counter("prediction_cache_evictions_total", "Prediction cache evictions", ["reason"])
+CACHE_ENTRIES = Gauge("prediction_cache_entries", "Entries held in the in-process prediction cache",
+                      multiprocess_mode="livesum")
+CACHE_BYTES = Gauge("prediction_cache_bytes", "Approximate bytes held in the in-process prediction cache",
+                    multiprocess_mode="livesum")
+
+# Inference executor
+INFERENCE_QUEUE_DEPTH = Gauge("inference_queue_depth", "Admitted inference requests waiting for a worker",
+                              multiprocess_mode="livesum")
+INFERENCE_IN_FLIGHT = Gauge("inference_in_flight", "Admitted inference requests, queued or running",
+                            multiprocess_mode="livesum")
+INFERENCE_QUEUE_WAIT = Histogram(
+    "inference_queue_wait_seconds", "Time from admission to the start of inference",
+    buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+)
+INFERENCE_REJECTED = Counter("inference_rejected_total", "Requests rejected before inference", ["reason"])
+
+# Cascade
+CASCADE_DECISIONS = Counter("cascade_decisions_total", "Texts decided by each cascade stage", ["stage"])
+
+# Predict hot path
+PREDICT_STAGE_LATENCY = Histogram(
+    "predict_stage_seconds", "Time spent in each stage of the predict hot path", ["stage"],
+    buckets=(0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5)
+)
+PREDICT_TOKENS = Histogram(
+    "predict_tokens_per_text", "Tokens per scored row, excluding padding",
+    buckets=(16, 32, 64, 128, 256, 384, 512)
+)
+PREDICT_BATCH_SIZE = Histogram(
+    "predict_batch_size", "Rows per forward pass",
+    buckets=(1, 2, 4, 8, 16, 32, 64, 128)
+)
+
+# Model versions
+MODEL_VERSION_WEIGHT = Gauge("model_version_weight", "Traffic weight of each served model version", ["version"],
+                             multiprocess_mode="livemax")
+MODEL_VERSION_IN_FLIGHT = Gauge("model_version_in_flight", "Inference calls running on each model version",
+                                ["version"], multiprocess_mode="livesum")
+MODEL_VERSION_ROWS = Counter("model_version_rows_total", "Rows scored by each model version", ["version"])
+MODEL_VERSION_FORWARD = Histogram(
+    "model_version_forward_seconds", "Forward pass latency by model version", ["version"],
+    buckets=(0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5)
+)
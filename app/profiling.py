@@ -0,0 +1,133 @@
+import cProfile
+import heapq
+import io
+import itertools
+import os
+import pstats
+import random
+import threading
+import time
+from contextlib import contextmanager
+
+from app.metrics import PREDICT_STAGE_LATENCY
+
+# Fraction of requests traced automatically; "X-Profile: 1" traces a single request
+PROFILE_SAMPLE_RATE = float(os.getenv("PROFILE_SAMPLE_RATE", "0"))
+# How many of the slowest traced calls are kept for /debug/profiles
+PROFILE_KEEP = int(os.getenv("PROFILE_KEEP", "20"))
+PROFILE_TOP_FUNCTIONS = 25
+
+_local = threading.local()
+
+
+class Trace:
+    """Stage timings (and a cProfile summary) for one sampled request."""
+
+    def __init__(self, endpoint: str):
+        self.endpoint = endpoint
+        self.started = time.monotonic()
+        self.timestamp = time.time()
+        self.stages = []
+        self.batch_size = None
+        self.profile = None
+        self.total_ms = None
+
+    def as_dict(self) -> dict:
+        return {
+            "endpoint": self.endpoint,
+            "timestamp": self.timestamp,
+            "total_ms": self.total_ms,
+            "batch_size": self.batch_size,
+            "stages": [{"stage": name, "ms": ms} for name, ms in self.stages],
+            "profile": self.profile,
+        }
+
+
+class SlowestCalls:
+    def __init__(self, keep: int = PROFILE_KEEP):
+        self.keep = keep
+        self._heap = []  # (total_ms, seq, trace), smallest first
+        self._seq = itertools.count()
+        self._lock = threading.Lock()
+
+    def offer(self, trace: Trace):
+        with self._lock:
+            item = (trace.total_ms, next(self._seq), trace)
+            if len(self._heap) < self.keep:
+                heapq.heappush(self._heap, item)
+            elif item[0] > self._heap[0][0]:
+                heapq.heapreplace(self._heap, item)
+            else:
+                return
+        print(f"🐢 Traced {trace.endpoint} call took {trace.total_ms:.1f}ms: "
+              + ", ".join(f"{name}={ms:.1f}ms" for name, ms in trace.stages))
+
+    def snapshot(self) -> list:
+        with self._lock:
+            items = sorted(self._heap, reverse=True)
+        return [trace.as_dict() for _, _, trace in items]
+
+
+slowest_calls = SlowestCalls()
+
+
+def start_trace(endpoint: str, header: str = None):
+    """Return a Trace if this request is sampled (header or PROFILE_SAMPLE_RATE), else None."""
+    if header and header.lower() not in ("0", "false", "no"):
+        return Trace(endpoint)
+    if PROFILE_SAMPLE_RATE and random.random() < PROFILE_SAMPLE_RATE:
+        return Trace(endpoint)
+    return None
+
+
+def finish_trace(trace):
+    if trace is None:
+        return
+    trace.total_ms = (time.monotonic() - trace.started) * 1000
+    slowest_calls.offer(trace)
+
+
+@contextmanager
+def stage(name: str):
+    """Time a hot-path stage into the stage histogram and any traces active on this thread."""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - started
+        PREDICT_STAGE_LATENCY.labels(stage=name).observe(elapsed)
+        for trace in getattr(_local, "traces", ()):
+            trace.stages.append((name, elapsed * 1000))
+
+
+@contextmanager
+def capture(traces: list, batch_size: int = None):
+    """Record stages and a cProfile summary of the work done on this thread into `traces`."""
+    if not traces:
+        yield
+        return
+    _local.traces = traces
+    profiler = cProfile.Profile()
+    profiler.enable()
+    try:
+        yield
+    finally:
+        profiler.disable()
+        _local.traces = ()
+        out = io.StringIO()
+        pstats.Stats(profiler, stream=out).sort_stats("cumulative").print_stats(PROFILE_TOP_FUNCTIONS)
+        for trace in traces:
+            trace.batch_size = batch_size
+            trace.profile = out.getvalue()
+
+
+def traced(trace, fn):
+    """Wrap `fn` so that, when `trace` is set, it runs under `capture`."""
+    if trace is None:
+        return fn
+
+    def run(*args):
+        with capture([trace]):
+            return fn(*args)
+
+    return run
@@ -0,0 +1,170 @@
+import ctypes
+import gc
+import os
+import random
+import threading
+import time
+from contextlib import contextmanager
+
+import torch
+
+from app.metrics import MODEL_VERSION_WEIGHT, MODEL_VERSION_IN_FLIGHT
+
+# Longest a replaced version waits for its in-flight calls before being released anyway
+MODEL_DRAIN_TIMEOUT = float(os.getenv("MODEL_DRAIN_TIMEOUT", "300"))
+DRAIN_POLL_SECONDS = 0.5
+
+
+class ModelVersion:
+    """A loaded tokenizer + inference backend pair, served under a version name."""
+
+    def __init__(self, version: str, tokenizer, backend, model_dir: str):
+        self.version = version
+        self.tokenizer = tokenizer
+        self.backend = backend
+        self.model_dir = model_dir
+        self.loaded_at = time.time()
+        self.in_flight = 0
+
+    def release(self):
+        # Only called once drained; drops the weights even if something still holds this object
+        self.tokenizer = None
+        self.backend = None
+
+
+class ModelRegistry:
+    """
+    Routes inference to the active model versions.
+
+    Requests pick a version at random in proportion to its weight and keep it
+    for the whole call, so a swap never changes the model under a running
+    request. Replaced versions stop receiving traffic immediately and are
+    released once their in-flight calls have drained.
+    """
+
+    def __init__(self):
+        self._routes = []  # [(ModelVersion, weight)]
+        self._lock = threading.Lock()
+        self._drains = []  # threads releasing retired versions
+        self.loading = {}  # version -> "loading" | error message
+
+    @contextmanager
+    def use(self, model: ModelVersion = None):
+        with self._lock:
+            if model is None:
+                model = self._pick()
+            model.in_flight += 1
+        MODEL_VERSION_IN_FLIGHT.labels(version=model.version).inc()
+        try:
+            yield model
+        finally:
+            with self._lock:
+                model.in_flight -= 1
+            MODEL_VERSION_IN_FLIGHT.labels(version=model.version).dec()
+
+    def _pick(self) -> ModelVersion:
+        if not self._routes:
+            raise RuntimeError("No model version is loaded")
+        if len(self._routes) == 1:
+            return self._routes[0][0]
+        models, weights = zip(*self._routes)
+        return random.choices(models, weights=weights)[0]
+
+    def primary(self) -> ModelVersion:
+        """The highest-weighted version, for introspection (no in-flight accounting)."""
+        with self._lock:
+            return max(self._routes, key=lambda route: route[1])[0] if self._routes else None
+
+    def get(self, version: str):
+        with self._lock:
+            return next((model for model, _ in self._routes if model.version == version), None)
+
+    def signature(self) -> str:
+        """Identifies the current routing; changes whenever versions or weights change."""
+        routes = self._routes
+        return ",".join(f"{model.version}:{weight:g}" for model, weight in routes)
+
+    def versions(self) -> list:
+        with self._lock:
+            routes = list(self._routes)
+        return [{"version": model.version, "weight": weight, "in_flight": model.in_flight,
+                 "backend": model.backend.name if model.backend else None, "loaded_at": model.loaded_at}
+                for model, weight in routes]
+
+    def activate(self, model: ModelVersion, weight: float = 1.0, replace: bool = True):
+        """Start routing to `model`; with `replace`, every other version is retired atomically."""
+        _check_weight(weight)
+        with self._lock:
+            retired = [m for m, _ in self._routes if replace or m.version == model.version]
+            self._routes = [(m, w) for m, w in self._routes if m not in retired] + [(model, weight)]
+        self._report()
+        for old in retired:
+            if old is not model:
+                self._drain_in_background(old)
+
+    def set_weight(self, version: str, weight: float) -> bool:
+        _check_weight(weight)
+        with self._lock:
+            if not any(m.version == version for m, _ in self._routes):
+                return False
+            self._routes = [(m, weight if m.version == version else w) for m, w in self._routes]
+        self._report()
+        return True
+
+    def retire(self, version: str) -> bool:
+        with self._lock:
+            model = next((m for m, _ in self._routes if m.version == version), None)
+            if model is None or len(self._routes) == 1:
+                return False
+            self._routes = [(m, w) for m, w in self._routes if m is not model]
+        self._report()
+        self._drain_in_background(model)
+        return True
+
+    def _report(self):
+        for model, weight in self._routes:
+            MODEL_VERSION_WEIGHT.labels(version=model.version).set(weight)
+
+    def _drain_in_background(self, model: ModelVersion, timeout: float = MODEL_DRAIN_TIMEOUT):
+        def drain():
+            deadline = time.monotonic() + timeout
+            while model.in_flight and time.monotonic() < deadline:
+                time.sleep(DRAIN_POLL_SECONDS)
+            if model.in_flight:
+                # Stragglers keep their own reference; the memory goes with the last of them
+                print(f"⚠️ Model version {model.version} still has {model.in_flight} calls after {timeout:.0f}s.")
+            else:
+                model.release()
+            if self.get(model.version) is None:
+                MODEL_VERSION_WEIGHT.remove(model.version)
+                MODEL_VERSION_IN_FLIGHT.remove(model.version)
+            gc.collect()
+            if torch.cuda.is_available():
+                torch.cuda.empty_cache()
+            _trim_heap()
+            print(f"♻️ Model version {model.version} retired.")
+
+        thread = threading.Thread(target=drain, name=f"drain-{model.version}", daemon=True)
+        self._drains = [t for t in self._drains if t.is_alive()] + [thread]
+        thread.start()
+
+    def wait_drained(self, timeout: float = None):
+        """Block until retired versions have been released (app.serve does this before re-forking)."""
+        for thread in list(self._drains):
+            thread.join(timeout)
+
+
+def _check_weight(weight: float):
+    if not weight > 0:
+        raise ValueError(f"Traffic weight must be positive, got {weight}")
+
+
+def _trim_heap():
+    # Hand freed weight memory back to the OS (glibc only)
+    try:
+        ctypes.CDLL("libc.so.6").malloc_trim(0)
+    except (OSError, AttributeError):
+        pass
+
+
+registry = ModelRegistry()
@@ -0,0 +1,160 @@
+"""
+Multi-process server that loads the model once and forks workers sharing it.
+
+    SERVE_WORKERS=4 python -m app.serve --host 0.0.0.0 --port 8000
+
+The parent fetches, loads and warms up the model, freezes the GC and only
+then forks, so every worker maps the same weight pages copy-on-write instead
+of downloading and holding its own copy. Workers run uvicorn on one shared
+listening socket; each gets pod CPUs / (SERVE_WORKERS * INFERENCE_WORKERS)
+torch threads. A worker that dies is re-forked from the loaded parent.
+
+With several workers the parent also owns MODEL_MANIFEST: it loads changed
+versions itself and then replaces the workers with fresh forks, so every
+worker serves the same versions and shares their weights. The workers
+refuse /admin/models changes in this mode.
+"""
+import argparse
+import gc
+import os
+import signal
+import socket
+import time
+
+SERVE_WORKERS = int(os.getenv("SERVE_WORKERS", "1"))
+RESTART_DELAY_SECONDS = 1.0
+REAP_INTERVAL_SECONDS = 1.0
+
+
+def bind_socket(host: str, port: int) -> socket.socket:
+    family = socket.AF_INET6 if ":" in host else socket.AF_INET
+    sock = socket.socket(family, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((host, port))
+    sock.listen(2048)
+    sock.set_inheritable(True)
+    return sock
+
+
+def _clear_multiproc_dir():
+    # prometheus_client multiprocess mode needs an empty directory at startup
+    path = os.getenv("PROMETHEUS_MULTIPROC_DIR")
+    if not path:
+        return
+    os.makedirs(path, exist_ok=True)
+    for name in os.listdir(path):
+        if name.endswith(".db"):
+            os.remove(os.path.join(path, name))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve the AI detector from forked workers sharing one model.")
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--workers", type=int, default=SERVE_WORKERS)
+    parser.add_argument("--log-level", default="info")
+    args = parser.parse_args()
+    workers = max(1, args.workers)
+
+    # Read by app.executor to split the pod's CPUs across the worker processes
+    os.environ["SERVE_WORKERS"] = str(workers)
+    _clear_multiproc_dir()
+
+    import torch
+    import uvicorn
+
+    from app.main import app
+    from app.registry import registry
+    from app.utils import load_model, apply_manifest, MODEL_MANIFEST, MODEL_WATCH_INTERVAL
+
+    # libgomp's thread pool does not survive fork(): keep the parent single-threaded
+    # so workers start their own pools at the configured size
+    torch.set_num_threads(1)
+    load_model()
+    # With one worker, the worker watches the manifest itself
+    watch_manifest = bool(MODEL_MANIFEST) and workers > 1
+    last_mtime = apply_manifest(MODEL_MANIFEST) if watch_manifest else None
+    registry.wait_drained()
+    # Keep the GC from touching (and so copying) the loaded objects in every worker
+    gc.collect()
+    gc.freeze()
+
+    sock = bind_socket(args.host, args.port)
+    config = uvicorn.Config(app, host=args.host, port=args.port, log_level=args.log_level)
+    children = set()
+    retiring = set()  # workers replaced after a manifest change, finishing their requests
+    stopping = False
+
+    def spawn():
+        pid = os.fork()
+        if pid == 0:
+            signal.signal(signal.SIGTERM, signal.SIG_DFL)
+            signal.signal(signal.SIGINT, signal.SIG_DFL)
+            uvicorn.Server(config).run(sockets=[sock])
+            os._exit(0)
+        children.add(pid)
+
+    def terminate(pids):
+        for pid in pids:
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+    def stop(signum, frame):
+        nonlocal stopping
+        stopping = True
+        terminate(list(children))
+
+    def reload_manifest(last_mtime):
+        before = registry.signature()
+        last_mtime = apply_manifest(MODEL_MANIFEST, last_mtime)
+        if registry.signature() == before or stopping:
+            return last_mtime
+        # Fork from a parent that no longer holds the retired versions, then let the old workers drain
+        registry.wait_drained()
+        gc.collect()
+        gc.freeze()
+        old = set(children)
+        children.difference_update(old)
+        retiring.update(old)
+        for _ in range(workers):
+            spawn()
+        terminate(old)
+        print(f"🔁 Served versions changed to {registry.signature()}, replaced {len(old)} workers.")
+        return last_mtime
+
+    for _ in range(workers):
+        spawn()
+    signal.signal(signal.SIGTERM, stop)
+    signal.signal(signal.SIGINT, stop)
+    print(f"🚀 Serving on {args.host}:{args.port} with {workers} workers sharing one model.")
+
+    next_check = time.monotonic() + MODEL_WATCH_INTERVAL
+    while children or retiring:
+        try:
+            pid, status = os.waitpid(-1, os.WNOHANG)
+        except ChildProcessError:
+            break
+        if pid == 0:
+            if watch_manifest and time.monotonic() >= next_check:
+                last_mtime = reload_manifest(last_mtime)
+                next_check = time.monotonic() + MODEL_WATCH_INTERVAL
+            time.sleep(REAP_INTERVAL_SECONDS)
+            continue
+        if os.getenv("PROMETHEUS_MULTIPROC_DIR"):
+            from prometheus_client import multiprocess
+            multiprocess.mark_process_dead(pid)
+        if pid in retiring:
+            retiring.discard(pid)
+            continue
+        children.discard(pid)
+        if not stopping:
+            print(f"⚠️ Worker {pid} exited (status {status}), restarting...")
+            time.sleep(RESTART_DELAY_SECONDS)
+            spawn()
+    sock.close()
+
+
+if __name__ == "__main__":
+    main()
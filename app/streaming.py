@@ -0,0 +1,176 @@
+import codecs
+import csv
+import json
+import os
+from starlette.responses import StreamingResponse
+
+STREAM_BATCH_SIZE = int(os.getenv("STREAM_BATCH_SIZE", "64"))
+# Longest line or (CSV) record accepted; longer ones become an error row and are skipped
+STREAM_MAX_RECORD_CHARS = int(os.getenv("STREAM_MAX_RECORD_CHARS", str(1024 * 1024)))
+FORMATS = ("ndjson", "csv")
+
+
+class DuplexStreamingResponse(StreamingResponse):
+    """
+    StreamingResponse for handlers that keep reading the request body while responding.
+
+    Starlette's StreamingResponse listens for client disconnects on `receive`,
+    which would swallow the request body chunks still being read; here the
+    body reader owns `receive` and sees the disconnect itself.
+    """
+
+    async def __call__(self, scope, receive, send):
+        try:
+            await self.stream_response(send)
+        finally:
+            if self.background is not None:
+                await self.background()
+
+
+async def iter_lines(chunks, max_chars: int = STREAM_MAX_RECORD_CHARS):
+    """
+    Decode an async stream of byte chunks into lines without buffering the whole body.
+
+    A line longer than `max_chars` is yielded as None, once, and the rest of
+    it is dropped up to the next newline.
+    """
+    decoder = codecs.getincrementaldecoder("utf-8")()
+    pending = ""
+    skipping = False
+    async for chunk in chunks:
+        pending += decoder.decode(chunk)
+        *lines, pending = pending.split("\n")
+        if skipping and lines:
+            # The end of the line that was too long
+            lines, skipping = lines[1:], False
+        for line in lines:
+            yield line.rstrip("\r") if len(line) <= max_chars else None
+        if not skipping and len(pending) > max_chars:
+            yield None
+            skipping = True
+        if skipping:
+            pending = ""
+    pending += decoder.decode(b"", final=True)
+    if pending and not skipping:
+        yield pending.rstrip("\r") if len(pending) <= max_chars else None
+
+
+async def _iter_csv_records(lines, max_chars: int = STREAM_MAX_RECORD_CHARS):
+    # A record continues onto the next line while it has an unbalanced quote (RFC 4180 quoted newline).
+    # Quotes are counted line by line, and a record over `max_chars` (or a line too long) is yielded as
+    # None and dropped, so a stray quote can't swallow the rest of the upload; the next line starts afresh.
+    parts, length, quotes = [], 0, 0
+    async for line in lines:
+        if line is None:
+            parts, length, quotes = [], 0, 0
+            yield None
+            continue
+        parts.append(line)
+        length += len(line) + 1
+        quotes += line.count('"')
+        if length > max_chars:
+            parts, length, quotes = [], 0, 0
+            yield None
+        elif quotes % 2 == 0:
+            yield next(csv.reader(["\n".join(parts)]), [])
+            parts, length, quotes = [], 0, 0
+    if parts:
+        yield next(csv.reader(["\n".join(parts)]), [])
+
+
+async def iter_rows(chunks, fmt: str, text_field: str = "text", id_field: str = "id",
+                    max_chars: int = STREAM_MAX_RECORD_CHARS):
+    """
+    Yield `(row, id, text, error)` for every record of an NDJSON or CSV body.
+
+    NDJSON lines may be objects (`text_field`/`id_field`) or bare strings;
+    CSV bodies need a header row naming `text_field`. Bad rows, including
+    ones longer than `max_chars`, yield an error instead of aborting the
+    stream.
+    """
+    too_long = f"Record longer than {max_chars} characters"
+    lines = iter_lines(chunks, max_chars)
+    if fmt == "ndjson":
+        row = 0
+        async for line in lines:
+            if line is None:
+                yield row, None, None, too_long
+                row += 1
+                continue
+            if not line.strip():
+                continue
+            try:
+                record = json.loads(line)
+            except ValueError as e:
+                yield row, None, None, f"Invalid JSON: {e}"
+                row += 1
+                continue
+            if isinstance(record, str):
+                record = {text_field: record}
+            text = record.get(text_field) if isinstance(record, dict) else None
+            record_id = record.get(id_field) if isinstance(record, dict) else None
+            if not isinstance(text, str) or not text.strip():
+                yield row, record_id, None, f"Missing or empty '{text_field}'"
+            else:
+                yield row, record_id, text, None
+            row += 1
+        return
+
+    header = None
+    row = 0
+    async for values in _iter_csv_records(lines, max_chars):
+        if values is None:
+            if header is None:
+                yield row, None, None, f"CSV header longer than {max_chars} characters"
+                return
+            yield row, None, None, too_long
+            row += 1
+            continue
+        if not values:
+            continue
+        if header is None:
+            header = values
+            if text_field not in header:
+                yield row, None, None, f"CSV header has no '{text_field}' column"
+                return
+            continue
+        record = dict(zip(header, values))
+        text = record.get(text_field)
+        if not text or not text.strip():
+            yield row, record.get(id_field), None, f"Missing or empty '{text_field}'"
+        else:
+            yield row, record.get(id_field), text, None
+        row += 1
+
+
+async def score_rows(rows, score_batch, batch_size: int = STREAM_BATCH_SIZE):
+    """
+    Score rows in batches of `batch_size` and yield one NDJSON line per row, in input order.
+
+    `score_batch` is an async callable taking a list of texts; only one batch
+    is held in memory at a time.
+    """
+    batch = []
+
+    async def flush():
+        texts = [text for _, _, text, error in batch if error is None]
+        results = iter(await score_batch(texts)) if texts else iter(())
+        for row, record_id, text, error in batch:
+            out = {"row": row}
+            if record_id is not None:
+                out["id"] = record_id
+            if error is None:
+                out.update(next(results))
+            else:
+                out["error"] = error
+            yield json.dumps(out) + "\n"
+        batch.clear()
+
+    async for item in rows:
+        batch.append(item)
+        if len(batch) >= batch_size:
+            async for line in flush():
+                yield line
+    if batch:
+        async for line in flush():
+            yield line
@@ -1,75 +1,337 @@
+import json
 import os
-import tarfile
-from google.cloud import storage
+import re
+import threading
+import time
 from transformers import RobertaTokenizer, RobertaForSequenceClassification
 import torch
+from app.artifacts import ensure_model, make_source
+from app.backends import load_backend
+from app.metrics import PREDICT_TOKENS, PREDICT_BATCH_SIZE, MODEL_VERSION_ROWS, MODEL_VERSION_FORWARD
+from app.profiling import stage
+from app.registry import registry, ModelVersion
 
 # Constants
-MODEL_DIR = "app/"
-MODEL_ARCHIVE = "model.tar.gz"
-BUCKET_NAME = "mcp-ai-detector-models"# ✅ Change this
-BLOB_NAME = "model.tar.gz" # ✅ Change this if needed (e.g., "model/model.tar.gz")
+MODEL_DIR = "app/model"
+TOKENIZER_FALLBACK = "roberta-base"  # same tokenizer as training, for artifacts that don't bundle one
+MODEL_VERSION = os.getenv("MODEL_VERSION", "latest")
+MODELS_DIR = "app/models"  # versions deployed at runtime, one directory each
+# Optional JSON manifest of versions to serve, reconciled whenever it changes
+MODEL_MANIFEST = os.getenv("MODEL_MANIFEST", "")
+MODEL_WATCH_INTERVAL = float(os.getenv("MODEL_WATCH_INTERVAL", "10"))
+VERSION_PATTERN = re.compile(r"^[A-Za-z0-9][A-Za-z0-9._-]{0,63}$")
+MAX_LENGTH = 512
+TEMPERATURE = 2.0
+THRESHOLD = 0.6
+BATCH_CHUNK_SIZE = int(os.getenv("BATCH_CHUNK_SIZE", "32"))
+WINDOW_STRIDE = int(os.getenv("WINDOW_STRIDE", "256"))
+MAX_WINDOWS = int(os.getenv("MAX_WINDOWS", "64"))
+AGGREGATIONS = ("mean", "max", "weighted")
 
-def download_and_extract_model():
-    if not os.path.exists(MODEL_DIR):
-        os.makedirs(MODEL_DIR)
+# Use GPU if available
+device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
 
-    local_archive_path = os.path.join(MODEL_DIR, MODEL_ARCHIVE)
+# Set once the first version is served; predictions must wait for model_ready
+model_ready = threading.Event()
+load_error = None
+_load_lock = threading.Lock()
+# One version loads at a time, so a deploy never holds more than two models in memory
+_deploy_lock = threading.Lock()
 
-    if not os.path.exists(local_archive_path):
-        print("🔽 Downloading model archive from GCS...")
-        client = storage.Client()
-        bucket = client.bucket(BUCKET_NAME)
-        blob = bucket.blob(BLOB_NAME)
-        blob.download_to_filename(local_archive_path)
-        print("✅ Model archive downloaded.")
+def load_tokenizer(model_dir: str):
+    if os.path.exists(os.path.join(model_dir, "vocab.json")):
+        return RobertaTokenizer.from_pretrained(model_dir)
 
-        print("📦 Extracting model...")
-        with tarfile.open(local_archive_path, "r:gz") as tar:
-            tar.extractall(path=MODEL_DIR)
-        print("✅ Model extracted.")
+    print(f"⚠️ Model artifact has no tokenizer, fetching {TOKENIZER_FALLBACK} from the hub...")
+    tok = RobertaTokenizer.from_pretrained(TOKENIZER_FALLBACK)
+    try:
+        # Bundle it so the next start stays offline
+        tok.save_pretrained(model_dir)
+    except OSError as e:
+        print(f"⚠️ Could not save tokenizer next to the model: {e}")
+    return tok
 
-        # Optionally delete the archive
-        os.remove(local_archive_path)
+def load_weights(model_dir: str):
+    has_safetensors = os.path.exists(os.path.join(model_dir, "model.safetensors"))
+    # safetensors checkpoints are memory-mapped instead of unpickled
+    model = RobertaForSequenceClassification.from_pretrained(model_dir, use_safetensors=has_safetensors)
+    model.eval()
 
-# Download & extract model if needed
-if not os.path.exists(os.path.join(MODEL_DIR, "config.json")):  # adjust based on your actual contents
-    download_and_extract_model()
+    if not has_safetensors:
+        try:
+            # Convert once so later starts memory-map the weights
+            model.save_pretrained(model_dir, safe_serialization=True)
+        except OSError as e:
+            print(f"⚠️ Could not write safetensors weights: {e}")
+    return model
 
-# Force use of the same tokenizer as training
-tokenizer = RobertaTokenizer.from_pretrained("roberta-base")
+def load_version(version: str, source=None, model_dir: str = MODEL_DIR) -> ModelVersion:
+    """Fetch (if needed), load and warm up one model version without serving it yet."""
+    started = time.monotonic()
+    model_dir = ensure_model(model_dir, source)
 
-# Load model from saved directory
-model = RobertaForSequenceClassification.from_pretrained("app/model")
-model.eval()
+    tok = load_tokenizer(model_dir)
+    model = load_weights(model_dir).to(device)
 
-# Move model to GPU if available
-device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
-model.to(device)
+    # Swap in the configured CPU backend (INFERENCE_BACKEND) if it passes the parity check
+    loaded_backend = load_backend(model, device, tok, model_dir, TEMPERATURE, MAX_LENGTH)
+    del model
 
-def predict(text: str, temperature: float = 2.0, threshold: float = 0.6) -> dict:
-    # Tokenize input
-    inputs = tokenizer(text, return_tensors="pt", truncation=True, padding=True, max_length=512)
-    inputs = {k: v.to(device) for k, v in inputs.items()}
+    loaded = ModelVersion(version, tok, loaded_backend, model_dir)
+    # Keep the first (slow) forward pass off the request path
+    predict_batch(["warmup"], model=loaded)
+    print(f"✅ Model {version} loaded ({loaded_backend.name}) in {time.monotonic() - started:.1f}s.")
+    return loaded
 
-    # Predict logits
-    with torch.no_grad():
-        outputs = model(**inputs)
-        logits = outputs.logits
+def load_model(source=None):
+    """Load MODEL_VERSION from MODEL_SOURCE, serve it and mark the service ready."""
+    with _load_lock:
+        if model_ready.is_set():
+            return
+        registry.activate(load_version(MODEL_VERSION, source))
+        model_ready.set()
 
-    # Apply temperature scaling
-    scaled_logits = logits / temperature
-    probs = torch.softmax(scaled_logits, dim=-1).cpu().numpy()[0]
+def start_loading(source=None):
+    """Load the model on a background thread so the server answers liveness probes meanwhile."""
+    if model_ready.is_set():
+        return
 
-    # Prediction using threshold
-    pred = int(probs[1] > threshold)
+    def run():
+        global load_error
+        try:
+            load_model(source)
+        except Exception as e:
+            load_error = f"{type(e).__name__}: {e}"
+            print(f"❌ Model loading failed: {load_error}")
+
+    threading.Thread(target=run, name="model-loader", daemon=True).start()
+
+def model_status() -> dict:
+    primary = registry.primary()
+    return {
+        "ready": model_ready.is_set(),
+        "model_version": primary.version if primary else MODEL_VERSION,
+        "backend": primary.backend.name if primary else None,
+        "versions": registry.versions(),
+        "error": load_error,
+    }
+
+def deploy_version(version: str, source: str, weight: float = 1.0, replace: bool = True):
+    """
+    Load `version` from the artifact spec `source` and start serving it.
+
+    With `replace` it takes all traffic and the previous versions are drained
+    and released; otherwise it joins them with `weight` (traffic is split in
+    proportion to the weights).
+    """
+    if not VERSION_PATTERN.match(version):
+        raise ValueError(f"Invalid model version '{version}'")
+    registry.loading[version] = "loading"
+    try:
+        with _deploy_lock:
+            loaded = load_version(version, make_source(source), os.path.join(MODELS_DIR, version))
+        registry.activate(loaded, weight, replace)
+        registry.loading.pop(version, None)
+        print(f"🔀 Model {version} serving with weight {weight}" + (" (replaced previous)." if replace else "."))
+    except Exception as e:
+        registry.loading[version] = f"failed: {type(e).__name__}: {e}"
+        print(f"❌ Deploying model {version} failed: {e}")
+        raise
+
+def start_deploy(version: str, source: str, weight: float = 1.0, replace: bool = True):
+    """Run deploy_version on a background thread; progress shows up in registry.loading."""
+    registry.loading[version] = "loading"
+
+    def run():
+        try:
+            deploy_version(version, source, weight, replace)
+        except Exception:
+            pass  # recorded in registry.loading
+
+    threading.Thread(target=run, name=f"deploy-{version}", daemon=True).start()
+
+def reconcile_manifest(manifest: dict):
+    """
+    Serve exactly the versions listed in a manifest:
+    {"versions": [{"version": "v2", "source": "gs://...", "weight": 0.9}, ...]}.
+
+    New versions are loaded first, then weights are updated, and only then
+    are unlisted versions retired, so traffic never drops.
+    """
+    wanted = {entry["version"]: entry for entry in manifest.get("versions", [])}
+    if not wanted:
+        print("⚠️ Model manifest lists no versions, ignoring it.")
+        return
+    for version, entry in wanted.items():
+        if registry.get(version) is None:
+            deploy_version(version, entry["source"], float(entry.get("weight", 1.0)), replace=False)
+    for version, entry in wanted.items():
+        registry.set_weight(version, float(entry.get("weight", 1.0)))
+    for served in registry.versions():
+        if served["version"] not in wanted:
+            registry.retire(served["version"])
+
+def apply_manifest(path: str, last_mtime: float = None) -> float:
+    """Reconcile against the manifest at `path` if it changed since `last_mtime`; returns the mtime seen."""
+    try:
+        mtime = os.stat(path).st_mtime
+        if mtime != last_mtime:
+            with open(path) as f:
+                manifest = json.load(f)
+            last_mtime = mtime
+            print(f"👀 Model manifest {path} changed, reconciling...")
+            reconcile_manifest(manifest)
+    except FileNotFoundError:
+        pass
+    except Exception as e:
+        print(f"⚠️ Could not apply model manifest {path}: {e}")
+    return last_mtime
+
+def start_watching(path: str = MODEL_MANIFEST, interval: float = MODEL_WATCH_INTERVAL):
+    """Poll the manifest file and reconcile the served versions whenever it changes."""
+    if not path:
+        return
+
+    def run():
+        model_ready.wait()
+        last_mtime = None
+        while True:
+            last_mtime = apply_manifest(path, last_mtime)
+            time.sleep(interval)
+
+    threading.Thread(target=run, name="model-watcher", daemon=True).start()
 
+def _postprocess(logits, temperature: float, threshold: float, version: str) -> list:
+    with stage("postprocess"):
+        # Apply temperature scaling
+        scaled_logits = logits / temperature
+        probs = torch.softmax(scaled_logits, dim=-1).cpu().numpy()
+
+        return [{**to_result(float(row[0]), float(row[1]), threshold), "model_version": version} for row in probs]
+
+def to_result(human: float, ai: float, threshold: float) -> dict:
+    # Prediction using threshold
+    pred = int(ai > threshold)
     return {
         "prediction": pred,  # 0 = Human, 1 = AI
-        "confidence": float(probs[pred]),
-        "probabilities": {"human": float(probs[0]), "ai": float(probs[1])}
+        "confidence": ai if pred else human,
+        "probabilities": {"human": human, "ai": ai}
     }
 
+def _forward(model: ModelVersion, inputs, temperature: float, threshold: float) -> list:
+    rows = inputs["input_ids"].shape[0]
+    PREDICT_BATCH_SIZE.observe(rows)
+    MODEL_VERSION_ROWS.labels(version=model.version).inc(rows)
+    for count in inputs["attention_mask"].sum(dim=1).tolist():
+        PREDICT_TOKENS.observe(count)
+
+    with stage("transfer"):
+        inputs = model.backend.to_device(inputs)
+    # Predict logits
+    started = time.perf_counter()
+    with stage("forward"):
+        logits = model.backend.run(inputs)
+    MODEL_VERSION_FORWARD.labels(version=model.version).observe(time.perf_counter() - started)
+    return _postprocess(logits, temperature, threshold, model.version)
+
+def predict_batch(texts: list, temperature: float = TEMPERATURE, threshold: float = THRESHOLD,
+                  model: ModelVersion = None) -> list:
+    """Score several texts with one padded forward pass, one result per text."""
+    # The whole call stays on one version, even if another is swapped in meanwhile
+    with registry.use(model) as model:
+        # Tokenize inputs, padding to the longest text in the batch
+        with stage("tokenize"):
+            inputs = model.tokenizer(texts, return_tensors="pt", truncation=True, padding=True,
+                                     max_length=MAX_LENGTH)
+        return _forward(model, inputs, temperature, threshold)
+
+def predict_bucketed(texts: list, temperature: float = TEMPERATURE, threshold: float = THRESHOLD,
+                     chunk_size: int = BATCH_CHUNK_SIZE, model: ModelVersion = None) -> list:
+    """
+    Score a large list of texts in length-sorted chunks.
+
+    Texts are tokenized once without padding, ordered by token count and cut
+    into chunks of `chunk_size`, so each chunk is padded only to its own
+    longest member. Results are returned in the original order.
+    """
+    with registry.use(model) as model:
+        with stage("tokenize"):
+            encoded = model.tokenizer(texts, truncation=True, max_length=MAX_LENGTH)
+        input_ids = encoded["input_ids"]
+        attention_mask = encoded["attention_mask"]
+
+        order = sorted(range(len(texts)), key=lambda i: len(input_ids[i]))
+        results = [None] * len(texts)
+        for start in range(0, len(order), chunk_size):
+            chunk = order[start:start + chunk_size]
+            with stage("pad"):
+                inputs = model.tokenizer.pad(
+                    {"input_ids": [input_ids[i] for i in chunk],
+                     "attention_mask": [attention_mask[i] for i in chunk]},
+                    return_tensors="pt"
+                )
+            for i, result in zip(chunk, _forward(model, inputs, temperature, threshold)):
+                results[i] = result
+        return results
+
+def predict_long(text: str, temperature: float = TEMPERATURE, threshold: float = THRESHOLD,
+                 stride: int = WINDOW_STRIDE, aggregation: str = "mean", return_windows: bool = False,
+                 model: ModelVersion = None) -> dict:
+    """
+    Score a document of any length with overlapping 512-token windows.
+
+    The text is tokenized once; the token stream is cut into windows starting
+    every `stride` tokens, all windows are scored as one padded batch and the
+    per-window probabilities are combined with `aggregation`:
+    "mean", "max" (most AI-like window) or "weighted" (by window token count).
+    """
+    if aggregation not in AGGREGATIONS:
+        raise ValueError(f"Unknown aggregation '{aggregation}', expected one of {AGGREGATIONS}")
+
+    with registry.use(model) as model:
+        tokenizer = model.tokenizer
+        with stage("tokenize"):
+            token_ids = tokenizer(text, add_special_tokens=False)["input_ids"]
+        window_size = MAX_LENGTH - tokenizer.num_special_tokens_to_add()
+        stride = min(max(1, stride), window_size)
+
+        starts = list(range(0, max(len(token_ids) - window_size, 0) + stride, stride))
+        if len(starts) > MAX_WINDOWS:
+            raise ValueError(f"Document needs {len(starts)} windows, at most {MAX_WINDOWS} allowed")
+
+        windows = [token_ids[start:start + window_size] for start in starts]
+        window_inputs = [tokenizer.build_inputs_with_special_tokens(ids) for ids in windows]
+
+        window_results = []
+        for begin in range(0, len(window_inputs), BATCH_CHUNK_SIZE):
+            chunk = window_inputs[begin:begin + BATCH_CHUNK_SIZE]
+            with stage("pad"):
+                inputs = tokenizer.pad(
+                    {"input_ids": chunk, "attention_mask": [[1] * len(ids) for ids in chunk]},
+                    return_tensors="pt"
+                )
+            window_results.extend(_forward(model, inputs, temperature, threshold))
+
+    ai_probs = [r["probabilities"]["ai"] for r in window_results]
+    if aggregation == "max":
+        ai = max(ai_probs)
+    elif aggregation == "weighted":
+        weights = [len(ids) for ids in windows]
+        ai = sum(p * w for p, w in zip(ai_probs, weights)) / sum(weights)
+    else:
+        ai = sum(ai_probs) / len(ai_probs)
+
+    result = {**to_result(1.0 - ai, ai, threshold), "model_version": model.version}
+    if return_windows:
+        result["windows"] = [
+            {"start": start, "end": start + len(ids), **r}
+            for start, ids, r in zip(starts, windows, window_results)
+        ]
+    return result
+
+def predict(text: str, temperature: float = TEMPERATURE, threshold: float = THRESHOLD) -> dict:
+    return predict_batch([text], temperature, threshold)[0]
+
 
 # Your Kubernetes control-plane has initialized successfully!
 
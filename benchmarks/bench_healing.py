@@ -0,0 +1,312 @@
+"""
+Alert-storm load test for the MCP healing server, fully offline.
+
+Runs the MCP server in-process against the fake Kubernetes API
+(mcp/fake_k8s.py) and the scripted fake LLM (mcp/fake_llm.py), replays
+Alertmanager webhook payloads at a fixed rate and reports heal throughput,
+heal and webhook latency percentiles, heal outcomes and API-call counts:
+
+    python -m benchmarks.bench_healing --deployments 20 --rate 10 --duration 30 --out heal.json
+    python -m benchmarks.bench_healing --payloads alerts.jsonl --rate 5
+    python -m benchmarks.bench_healing --save-baseline benchmarks/healing_baseline.json
+    python -m benchmarks.bench_healing --baseline benchmarks/healing_baseline.json --tolerance 0.2
+
+`--payloads` replays recorded Alertmanager payloads (one JSON object per
+line) instead of the synthetic storm; their alerts must name deployments
+created with `--deployments` (`app-0`, `app-1`, ... in namespace `default`).
+`--baseline` exits non-zero if any metric regressed beyond `--tolerance`.
+"""
+import argparse
+import contextlib
+import json
+import os
+import platform
+import random
+import socket
+import sys
+import tempfile
+import threading
+import time
+import urllib.request
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+MCP_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "mcp")
+NAMESPACE = "default"
+
+# One failure per deployment, in turn: two decided by the rulebook (commands, restart), two by the LLM
+FAILURES = [
+    ["Traceback (most recent call last):", '  File "/app/main.py", line 3, in <module>',
+     "ModuleNotFoundError: No module named 'requests_toolbelt'"],
+    ["Traceback (most recent call last):", '  File "/app/utils.py", line 41, in load_model',
+     "FileNotFoundError: [Errno 2] No such file or directory: 'app/model/config.json'"],
+    ["Traceback (most recent call last):", '  File "/app/utils.py", line 77, in predict',
+     "RuntimeError: CUDA error: device-side assert triggered"],
+    ["Traceback (most recent call last):", '  File "/app/worker.py", line 12, in run',
+     "PermissionError: [Errno 13] Permission denied: '/data/cache.lock'"],
+]
+
+
+def percentiles(samples: list) -> dict:
+    samples = sorted(samples)
+    if not samples:
+        return {}
+
+    def pct(p):
+        return samples[min(len(samples) - 1, int(round(p / 100 * (len(samples) - 1))))] * 1000
+
+    return {"p50_ms": pct(50), "p90_ms": pct(90), "p99_ms": pct(99),
+            "mean_ms": sum(samples) / len(samples) * 1000, "max_ms": samples[-1] * 1000}
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def http(method: str, url: str, body: dict = None):
+    data = json.dumps(body).encode() if body is not None else None
+    request = urllib.request.Request(url, data=data, method=method, headers={"Content-Type": "application/json"})
+    with urllib.request.urlopen(request, timeout=120) as response:
+        return json.loads(response.read())
+
+
+def alert(deployment: str, pod: str) -> dict:
+    return {
+        "status": "firing",
+        "labels": {"alertname": "PodCrashing", "mcp_namespace": NAMESPACE, "mcp_deployment": deployment,
+                   "mcp_pod": pod},
+        "annotations": {"description": f"{deployment} is crashing"},
+        "fingerprint": f"{deployment}-crash",
+    }
+
+
+def synthetic_payloads(cluster, deployments: int, alerts_per_payload: int, rng: random.Random):
+    """Endless storm: each payload alerts on random deployments, naming one of their current pods."""
+    while True:
+        alerts = []
+        for name in (f"app-{rng.randrange(deployments)}" for _ in range(alerts_per_payload)):
+            pods = cluster.pods(NAMESPACE, name)
+            if pods:
+                alerts.append(alert(name, rng.choice(pods)))
+        yield {"alerts": alerts}
+
+
+def replayed_payloads(path: str):
+    while True:
+        with open(path) as f:
+            for line in f:
+                if line.strip():
+                    yield json.loads(line)
+
+
+def run_load(base_url: str, payloads, rate: float, duration: float, senders: int) -> tuple:
+    """Open-loop: POST a payload every 1/rate s for `duration` s. Returns (job ids, webhook latencies)."""
+    job_ids, latencies, lock = [], [], threading.Lock()
+
+    def send(payload):
+        started = time.perf_counter()
+        try:
+            accepted = http("POST", f"{base_url}/mcp/heal/auto", payload)["accepted"]
+        except Exception as e:
+            print(f"⚠️ Webhook call failed: {e}", file=sys.stderr)
+            return
+        with lock:
+            latencies.append(time.perf_counter() - started)
+            job_ids.extend(job["job_id"] for job in accepted)
+
+    with ThreadPoolExecutor(max_workers=senders) as pool:
+        started = time.perf_counter()
+        sent = 0
+        while time.perf_counter() - started < duration:
+            pool.submit(send, next(payloads))
+            sent += 1
+            time.sleep(max(0, started + sent / rate - time.perf_counter()))
+    return job_ids, latencies
+
+
+def collect_jobs(base_url: str, job_ids: list, timeout: float) -> list:
+    """Poll GET /mcp/jobs/{id} until every job finished or `timeout` passes."""
+    jobs, pending = {}, list(job_ids)
+    deadline = time.monotonic() + timeout
+    while pending and time.monotonic() < deadline:
+        still_pending = []
+        for job_id in pending:
+            job = http("GET", f"{base_url}/mcp/jobs/{job_id}")
+            if job["status"] in ("succeeded", "failed"):
+                jobs[job_id] = job
+            else:
+                still_pending.append(job_id)
+        pending = still_pending
+        if pending:
+            time.sleep(0.5)
+    return list(jobs.values()) + [{"job_id": job_id, "status": "unfinished"} for job_id in pending]
+
+
+def summarize(jobs: list, webhook_latencies: list, calls: Counter, llm_calls: int, heal_outcome) -> dict:
+    finished = [job for job in jobs if job.get("finished_at")]
+    seconds = [
+        (datetime.fromisoformat(job["finished_at"]) - datetime.fromisoformat(job["submitted_at"])).total_seconds()
+        for job in finished
+    ]
+    dedup = Counter(job["result"]["dedup"] for job in finished if job.get("result"))
+    outcomes = Counter(heal_outcome(job["result"]["result"]) for job in finished
+                       if job.get("result") and job["result"]["dedup"] == "executed")
+    executed = dedup.get("executed", 0)
+    span = 0
+    if finished:
+        span = (max(datetime.fromisoformat(job["finished_at"]) for job in finished)
+                - min(datetime.fromisoformat(job["submitted_at"]) for job in finished)).total_seconds()
+    k8s_calls = sum(calls.values())
+    return {
+        "alerts": len(jobs),
+        "jobs": dict(Counter(job["status"] for job in jobs)),
+        "dedup": dict(dedup),
+        "outcomes": dict(outcomes),
+        "throughput": len(finished) / span if span else None,
+        "heals_per_second": executed / span if span else None,
+        "heal_latency": percentiles(seconds),
+        "webhook_latency": percentiles(webhook_latencies),
+        "k8s_calls": dict(calls),
+        "k8s_calls_per_heal": k8s_calls / executed if executed else None,
+        "llm_calls": llm_calls,
+    }
+
+
+# metric path -> True if higher is better
+COMPARED = {
+    ("throughput",): True,
+    ("heal_latency", "p50_ms"): False,
+    ("heal_latency", "p99_ms"): False,
+    ("webhook_latency", "p99_ms"): False,
+    ("k8s_calls_per_heal",): False,
+}
+
+
+def compare(results: dict, baseline: dict, tolerance: float) -> list:
+    """Metrics that got worse than the baseline by more than `tolerance`."""
+    regressions = []
+    for path, higher_is_better in COMPARED.items():
+        current, base = results, baseline
+        for key in path:
+            current, base = (current or {}).get(key), (base or {}).get(key)
+        if current is None or not base:
+            continue
+        worse = current < base / (1 + tolerance) if higher_is_better else current > base * (1 + tolerance)
+        if worse:
+            regressions.append({"metric": ".".join(path), "baseline": base, "current": current})
+    return regressions
+
+
+def _verb_values(value: str) -> dict:
+    """`0.01` for every verb, or `get=0.01,exec=0.2`."""
+    if "=" not in value:
+        return {verb: float(value) for verb in ("get", "list", "watch", "logs", "patch", "exec")}
+    return {verb: float(v) for verb, v in (part.split("=", 1) for part in value.split(",") if part)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load-test the MCP healing server offline.")
+    parser.add_argument("--deployments", type=int, default=20)
+    parser.add_argument("--rate", type=float, default=10, help="Webhook payloads per second")
+    parser.add_argument("--duration", type=float, default=20, help="Seconds of load")
+    parser.add_argument("--alerts-per-payload", type=int, default=3)
+    parser.add_argument("--payloads", default=None, help="Replay Alertmanager payloads from this JSONL file")
+    parser.add_argument("--senders", type=int, default=32, help="Concurrent webhook callers")
+    parser.add_argument("--k8s-latency", type=_verb_values, default="0.005", help="Seconds per API call")
+    parser.add_argument("--k8s-failure-rate", type=_verb_values, default="0", help="Share of API calls failing")
+    parser.add_argument("--exec-seconds", type=float, default=0.2, help="Run time of each command in a pod")
+    parser.add_argument("--restart-seconds", type=float, default=2.0, help="Time for a rollout to finish")
+    parser.add_argument("--llm-latency", type=float, default=1.0)
+    parser.add_argument("--llm-failure-rate", type=float, default=0.0)
+    parser.add_argument("--cooldown", type=float, default=300, help="HEAL_COOLDOWN_SECONDS of the server")
+    parser.add_argument("--concurrency", type=int, default=4, help="HEAL_CONCURRENCY of the server")
+    parser.add_argument("--drain-timeout", type=float, default=300, help="How long to wait for queued heals")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--verbose", action="store_true", help="Keep the server's own output")
+    parser.add_argument("--out", default=None, help="Write results JSON here (default: stdout)")
+    parser.add_argument("--baseline", default=None, help="Baseline JSON to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="Allowed relative slowdown vs. baseline")
+    parser.add_argument("--save-baseline", default=None, help="Write results as the new baseline")
+    args = parser.parse_args()
+
+    tmp = tempfile.mkdtemp(prefix="bench-healing-")
+    os.environ.update({
+        "K8S_BACKEND": "fake",
+        "LLM_BACKEND": "fake",
+        "METRICS_PORT": "0",
+        "LLM_CACHE_PATH": "",
+        "HISTORY_DB_PATH": os.path.join(tmp, "healing_history.db"),
+        "HEAL_COOLDOWN_SECONDS": str(args.cooldown),
+        "HEAL_CONCURRENCY": str(args.concurrency),
+    })
+    sys.path.insert(0, MCP_DIR)
+    server_output = sys.stderr if args.verbose else open(os.devnull, "w")
+    with contextlib.redirect_stdout(server_output):
+        import uvicorn
+        import k8s_utils
+        import llm_utils
+        from fake_llm import FakeLLM
+        import main as mcp_main
+
+    cluster = k8s_utils.fake_cluster
+    cluster.latency = args.k8s_latency
+    cluster.failure_rate = args.k8s_failure_rate
+    cluster.exec_seconds = args.exec_seconds
+    cluster.restart_seconds = args.restart_seconds
+    llm = FakeLLM(latency=args.llm_latency, failure_rate=args.llm_failure_rate, seed=args.seed)
+    llm_utils.use_model(llm)
+    for i in range(args.deployments):
+        cluster.add_deployment(NAMESPACE, f"app-{i}", logs=["Starting server"] + FAILURES[i % len(FAILURES)])
+
+    port = free_port()
+    server = uvicorn.Server(uvicorn.Config(mcp_main.app, host="127.0.0.1", port=port, log_level="warning"))
+    threading.Thread(target=server.run, daemon=True).start()
+    while not server.started:
+        time.sleep(0.05)
+    base_url = f"http://127.0.0.1:{port}"
+    setup_calls = Counter(cluster.calls)
+
+    payloads = replayed_payloads(args.payloads) if args.payloads else \
+        synthetic_payloads(cluster, args.deployments, args.alerts_per_payload, random.Random(args.seed))
+    with contextlib.redirect_stdout(server_output):
+        job_ids, webhook_latencies = run_load(base_url, payloads, args.rate, args.duration, args.senders)
+        jobs = collect_jobs(base_url, job_ids, args.drain_timeout)
+    server.should_exit = True
+
+    results = summarize(jobs, webhook_latencies, cluster.calls - setup_calls, llm.calls, mcp_main.heal_outcome)
+    report = {
+        "meta": {
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+            "python": platform.python_version(),
+            "cpu_count": os.cpu_count(),
+            **{k: v for k, v in vars(args).items() if k not in ("out", "baseline", "save_baseline", "verbose")},
+        },
+        "results": results,
+    }
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            report["regressions"] = compare(results, json.load(f)["results"], args.tolerance)
+
+    payload = json.dumps(report, indent=2)
+    if args.out:
+        with open(args.out, "w") as f:
+            f.write(payload)
+    else:
+        print(payload)
+    if args.save_baseline:
+        with open(args.save_baseline, "w") as f:
+            f.write(payload)
+
+    for regression in report.get("regressions", []):
+        print(f"❌ Regression in {regression['metric']}: {regression['baseline']:.3f} -> {regression['current']:.3f}",
+              file=sys.stderr)
+    if report.get("regressions"):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
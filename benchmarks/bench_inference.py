@@ -0,0 +1,272 @@
+"""
+Inference benchmark for the ai-detector service.
+
+Measures tokenization, forward pass, predict_batch and micro-batcher latency
+(percentiles) and throughput across batch sizes, sequence lengths and torch
+thread counts. By default it runs a tiny randomly initialized RoBERTa with a
+byte-level tokenizer, so it needs neither GCS nor the Hugging Face hub:
+
+    python -m benchmarks.bench_inference --out bench.json
+    python -m benchmarks.bench_inference --baseline benchmarks/baseline.json --tolerance 0.15
+    python -m benchmarks.bench_inference --save-baseline benchmarks/baseline.json
+
+`--model-dir` benchmarks a real model directory instead, and `--url`
+additionally measures HTTP latency against a running server.
+`--baseline` exits non-zero if any case regressed beyond `--tolerance`.
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import string
+import sys
+import tempfile
+import time
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+import torch
+
+from app import utils
+from app.artifacts import LocalDirectorySource
+from app.batching import MicroBatcher
+from app.executor import InferenceExecutor
+from app.registry import registry
+
+
+def build_tiny_model(model_dir: str, layers: int = 2, hidden: int = 64):
+    """Write a random RoBERTa classifier plus an offline byte-level tokenizer to `model_dir`."""
+    from transformers import RobertaConfig, RobertaForSequenceClassification, RobertaTokenizer
+    from transformers.models.gpt2.tokenization_gpt2 import bytes_to_unicode
+
+    os.makedirs(model_dir, exist_ok=True)
+    vocab = {"<s>": 0, "<pad>": 1, "</s>": 2, "<unk>": 3}
+    for char in bytes_to_unicode().values():
+        vocab.setdefault(char, len(vocab))
+    vocab["<mask>"] = len(vocab)
+    with open(os.path.join(model_dir, "vocab.json"), "w") as f:
+        json.dump(vocab, f)
+    with open(os.path.join(model_dir, "merges.txt"), "w") as f:
+        f.write("#version: 0.2\n")
+    RobertaTokenizer(os.path.join(model_dir, "vocab.json"), os.path.join(model_dir, "merges.txt")) \
+        .save_pretrained(model_dir)
+
+    torch.manual_seed(0)
+    config = RobertaConfig(
+        vocab_size=len(vocab), hidden_size=hidden, num_hidden_layers=layers, num_attention_heads=4,
+        intermediate_size=hidden * 4, max_position_embeddings=utils.MAX_LENGTH + 2, num_labels=2, pad_token_id=1,
+    )
+    RobertaForSequenceClassification(config).save_pretrained(model_dir, safe_serialization=True)
+
+
+def make_texts(count: int, seq_len: int, seed: int = 0) -> list:
+    # Roughly seq_len tokens with the byte-level tokenizer (about one token per character)
+    rng = random.Random(seed)
+    texts = []
+    for _ in range(count):
+        words = []
+        while sum(len(w) + 1 for w in words) < seq_len - 2:
+            words.append("".join(rng.choices(string.ascii_lowercase, k=rng.randint(2, 9))))
+        texts.append(" ".join(words)[:seq_len - 2])
+    return texts
+
+
+def summarize(samples: list, items_per_sample: int) -> dict:
+    samples = sorted(samples)
+
+    def pct(p):
+        return samples[min(len(samples) - 1, int(round(p / 100 * (len(samples) - 1))))] * 1000
+
+    total = sum(samples)
+    return {
+        "p50_ms": pct(50),
+        "p90_ms": pct(90),
+        "p99_ms": pct(99),
+        "mean_ms": total / len(samples) * 1000,
+        "throughput": items_per_sample * len(samples) / total if total else None,
+    }
+
+
+def timed(fn, iterations: int, warmup: int) -> list:
+    for _ in range(warmup):
+        fn()
+    samples = []
+    for _ in range(iterations):
+        started = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - started)
+    return samples
+
+
+def bench_model(batch_sizes, seq_lens, threads, iterations, warmup) -> list:
+    model = registry.primary()
+    results = []
+    for num_threads in threads:
+        torch.set_num_threads(num_threads)
+        for seq_len in seq_lens:
+            for batch_size in batch_sizes:
+                texts = make_texts(batch_size, seq_len)
+                case = {"batch_size": batch_size, "seq_len": seq_len, "threads": num_threads}
+
+                def tokenize():
+                    return model.tokenizer(texts, return_tensors="pt", truncation=True, padding=True,
+                                           max_length=utils.MAX_LENGTH)
+
+                inputs = tokenize()
+                results.append({"stage": "tokenize", **case,
+                                **summarize(timed(tokenize, iterations, warmup), batch_size)})
+                results.append({"stage": "forward", **case,
+                                **summarize(timed(lambda: model.backend(inputs), iterations, warmup), batch_size)})
+                results.append({"stage": "predict_batch", **case,
+                                **summarize(timed(lambda: utils.predict_batch(texts), iterations, warmup),
+                                            batch_size)})
+    return results
+
+
+def bench_batcher(concurrency_levels, seq_len, iterations, warmup) -> list:
+    """
+    The micro-batcher on the inference executor with concurrent in-process callers.
+
+    This is not end-to-end /predict latency: FastAPI, the prediction cache
+    and admission control are bypassed (use `--url` for the HTTP path).
+    """
+    results = []
+    executor = InferenceExecutor(max_queue=max(concurrency_levels))
+    batcher = MicroBatcher(utils.predict_batch, executor=executor)
+    for concurrency in concurrency_levels:
+        texts = make_texts(concurrency, seq_len, seed=concurrency)
+        with ThreadPoolExecutor(max_workers=concurrency) as callers:
+            def one(text):
+                started = time.perf_counter()
+                batcher.predict(text)
+                return time.perf_counter() - started
+
+            for _ in range(warmup):
+                list(callers.map(one, texts))
+            samples = []
+            started = time.perf_counter()
+            for _ in range(iterations):
+                samples.extend(callers.map(one, texts))
+            elapsed = time.perf_counter() - started
+        summary = summarize(samples, 1)
+        summary["throughput"] = len(samples) / elapsed
+        results.append({"stage": "batcher", "concurrency": concurrency, "seq_len": seq_len,
+                        "threads": executor.torch_threads, **summary})
+    return results
+
+
+def bench_http(url: str, concurrency_levels, seq_len, iterations) -> list:
+    results = []
+    for concurrency in concurrency_levels:
+        texts = make_texts(concurrency, seq_len, seed=concurrency)
+
+        def one(text):
+            body = json.dumps({"text": text}).encode()
+            request = urllib.request.Request(url.rstrip("/") + "/predict", data=body,
+                                             headers={"Content-Type": "application/json"})
+            started = time.perf_counter()
+            with urllib.request.urlopen(request, timeout=60) as response:
+                response.read()
+            return time.perf_counter() - started
+
+        with ThreadPoolExecutor(max_workers=concurrency) as callers:
+            samples = []
+            started = time.perf_counter()
+            for _ in range(iterations):
+                samples.extend(callers.map(one, texts))
+            elapsed = time.perf_counter() - started
+        summary = summarize(samples, 1)
+        summary["throughput"] = len(samples) / elapsed
+        results.append({"stage": "http_predict", "concurrency": concurrency, "seq_len": seq_len, **summary})
+    return results
+
+
+def case_key(result: dict) -> str:
+    return "|".join(f"{k}={result.get(k)}" for k in ("stage", "batch_size", "concurrency", "seq_len", "threads"))
+
+
+def compare(results: list, baseline: list, tolerance: float) -> list:
+    """Cases whose p50 latency or throughput got worse than the baseline by more than `tolerance`."""
+    previous = {case_key(r): r for r in baseline}
+    regressions = []
+    for result in results:
+        base = previous.get(case_key(result))
+        if base is None:
+            continue
+        if result["p50_ms"] > base["p50_ms"] * (1 + tolerance):
+            regressions.append({"case": case_key(result), "metric": "p50_ms",
+                                "baseline": base["p50_ms"], "current": result["p50_ms"]})
+        if base.get("throughput") and result["throughput"] < base["throughput"] / (1 + tolerance):
+            regressions.append({"case": case_key(result), "metric": "throughput",
+                                "baseline": base["throughput"], "current": result["throughput"]})
+    return regressions
+
+
+def _ints(value: str) -> list:
+    return [int(v) for v in value.split(",") if v]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark ai-detector inference.")
+    parser.add_argument("--model-dir", default=None, help="Real model directory (default: tiny random model)")
+    parser.add_argument("--batch-sizes", type=_ints, default=[1, 8, 32])
+    parser.add_argument("--seq-lens", type=_ints, default=[64, 256, 512])
+    parser.add_argument("--threads", type=_ints, default=[1, max(1, (os.cpu_count() or 1) // 2)])
+    parser.add_argument("--concurrency", type=_ints, default=[1, 8, 32])
+    parser.add_argument("--iterations", type=int, default=20)
+    parser.add_argument("--warmup", type=int, default=3)
+    parser.add_argument("--url", default=None, help="Also benchmark POST /predict on a running server")
+    parser.add_argument("--out", default=None, help="Write results JSON here (default: stdout)")
+    parser.add_argument("--baseline", default=None, help="Baseline JSON to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.15, help="Allowed relative slowdown vs. baseline")
+    parser.add_argument("--save-baseline", default=None, help="Write results as the new baseline")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        model_dir = args.model_dir
+        if model_dir is None:
+            model_dir = os.path.join(tmp, "model")
+            build_tiny_model(model_dir)
+        utils.load_model(LocalDirectorySource(model_dir))
+
+        results = bench_model(args.batch_sizes, args.seq_lens, args.threads, args.iterations, args.warmup)
+        results += bench_batcher(args.concurrency, max(args.seq_lens), args.iterations, args.warmup)
+        if args.url:
+            results += bench_http(args.url, args.concurrency, max(args.seq_lens), args.iterations)
+
+    report = {
+        "meta": {
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+            "model": args.model_dir or "tiny-random-roberta",
+            "backend": registry.primary().backend.name,
+            "torch": torch.__version__,
+            "python": platform.python_version(),
+            "cpu_count": os.cpu_count(),
+        },
+        "results": results,
+    }
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            report["regressions"] = compare(results, json.load(f)["results"], args.tolerance)
+
+    payload = json.dumps(report, indent=2)
+    if args.out:
+        with open(args.out, "w") as f:
+            f.write(payload)
+    else:
+        print(payload)
+    if args.save_baseline:
+        with open(args.save_baseline, "w") as f:
+            f.write(payload)
+
+    for regression in report.get("regressions", []):
+        print(f"❌ Regression in {regression['case']}: {regression['metric']} "
+              f"{regression['baseline']:.3f} -> {regression['current']:.3f}", file=sys.stderr)
+    if report.get("regressions"):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
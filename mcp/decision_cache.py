@@ -0,0 +1,103 @@
+import json
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+
+from metrics import LLM_CACHE_LOOKUPS, LLM_CACHE_INVALIDATIONS
+
+# Validated LLM healing decisions, keyed by error signature (empty path keeps them in memory only)
+LLM_CACHE_PATH = os.getenv("LLM_CACHE_PATH", "/app/healing_logs/llm_decisions.json")
+LLM_CACHE_TTL_SECONDS = float(os.getenv("LLM_CACHE_TTL_SECONDS", str(7 * 24 * 3600)))
+LLM_CACHE_MAX_ENTRIES = int(os.getenv("LLM_CACHE_MAX_ENTRIES", "500"))
+
+
+class DecisionCache:
+    """
+    LRU + TTL cache of healing decisions, persisted to a JSON file.
+
+    `version` identifies the model and prompt that produced the decisions;
+    a persisted file written under another version is discarded on load.
+    """
+
+    def __init__(self, path: str = LLM_CACHE_PATH, ttl: float = LLM_CACHE_TTL_SECONDS,
+                 max_entries: int = LLM_CACHE_MAX_ENTRIES, version: str = ""):
+        self.path = path
+        self.ttl = ttl
+        self.max_entries = max(1, max_entries)
+        self.version = version
+        self._entries = OrderedDict()  # signature -> {"decision": ..., "expires_at": ...}
+        self._lock = threading.Lock()
+        self._load()
+
+    def _load(self):
+        if not self.path or not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path, encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, ValueError) as e:
+            logging.warning(f"[LLM-CACHE] Ignoring unreadable cache file {self.path}: {e}")
+            return
+        if data.get("version") != self.version:
+            logging.info("[LLM-CACHE] Model or prompt changed, starting with an empty cache")
+            return
+        now = time.time()
+        for signature, entry in data.get("entries", {}).items():
+            if entry.get("expires_at", 0) > now:
+                self._entries[signature] = entry
+        logging.info(f"[LLM-CACHE] Loaded {len(self._entries)} cached healing decisions")
+
+    def _save(self):
+        # Called with the lock held; write-then-rename so a crash never leaves a torn file
+        if not self.path:
+            return
+        tmp_path = self.path + ".tmp"
+        try:
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump({"version": self.version, "entries": self._entries}, f)
+            os.replace(tmp_path, self.path)
+        except OSError as e:
+            logging.warning(f"[LLM-CACHE] Could not persist cache to {self.path}: {e}")
+
+    def get(self, signature: str):
+        with self._lock:
+            entry = self._entries.get(signature)
+            if entry is not None and entry["expires_at"] <= time.time():
+                del self._entries[signature]
+                self._save()
+                entry = None
+            if entry is None:
+                LLM_CACHE_LOOKUPS.labels(result="miss").inc()
+                return None
+            self._entries.move_to_end(signature)
+            LLM_CACHE_LOOKUPS.labels(result="hit").inc()
+            return dict(entry["decision"])
+
+    def set(self, signature: str, decision: dict):
+        with self._lock:
+            self._entries[signature] = {"decision": decision, "expires_at": time.time() + self.ttl}
+            self._entries.move_to_end(signature)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+            self._save()
+
+    def invalidate(self, signature: str) -> bool:
+        with self._lock:
+            if self._entries.pop(signature, None) is None:
+                return False
+            self._save()
+        LLM_CACHE_INVALIDATIONS.inc()
+        logging.info(f"[LLM-CACHE] Dropped cached decision {signature} after a failed heal")
+        return True
+
+    def set_version(self, version: str):
+        """Switch to another model or prompt; decisions made under the old version are dropped."""
+        with self._lock:
+            if version == self.version:
+                return
+            self.version = version
+            self._entries.clear()
+            self._save()
+        logging.info("[LLM-CACHE] Model or prompt changed, starting with an empty cache")
@@ -0,0 +1,107 @@
+import asyncio
+import logging
+import os
+import re
+import time
+
+from metrics import ALERTS_EXECUTED, ALERTS_SUPPRESSED
+from signatures import error_signature
+
+# After a heal, identical alerts (same fingerprint, or same deployment + error signature) are suppressed this long
+HEAL_COOLDOWN_SECONDS = float(os.getenv("HEAL_COOLDOWN_SECONDS", "300"))
+# A failed heal (LLM down, exec timeout...) only suppresses duplicates this long, so the next alert retries
+HEAL_FAILURE_COOLDOWN_SECONDS = float(os.getenv("HEAL_FAILURE_COOLDOWN_SECONDS", "30"))
+
+ERROR_LINE = re.compile(r"error|exception|traceback|fatal|failed|panic|killed|oom|refused|denied", re.IGNORECASE)
+SIGNATURE_LINES = 5
+
+
+def log_signature(logs: str) -> str:
+    """Signature of the last error lines in `logs` (or its last lines if none look like errors)."""
+    lines = [line for line in (logs or "").splitlines() if ERROR_LINE.search(line)]
+    if not lines:
+        lines = (logs or "").strip().splitlines()
+    return error_signature("\n".join(lines[-SIGNATURE_LINES:]))
+
+
+class HealDeduplicator:
+    """
+    Collapses alert storms into as few heals as possible.
+
+    - an alert whose fingerprint was healed within the cooldown is answered
+      with that heal's result before anything is fetched
+    - alerts for a deployment that is already being healed wait for and share
+      that heal's result
+    - after the logs are fetched, an alert with the same (namespace,
+      deployment, error signature) as a heal within the cooldown is answered
+      with that heal's result instead of calling the LLM and exec again
+
+    Failed heals only get `failure_cooldown`, so a transient failure doesn't
+    block retries for the whole cooldown.
+    """
+
+    def __init__(self, cooldown: float = HEAL_COOLDOWN_SECONDS, failure_cooldown: float = HEAL_FAILURE_COOLDOWN_SECONDS):
+        self.cooldown = cooldown
+        self.failure_cooldown = failure_cooldown
+        self._in_flight = {}      # (namespace, deployment) -> asyncio.Future
+        self._fingerprints = {}   # fingerprint -> (expires_at, result)
+        self._signatures = {}     # (namespace, deployment, signature) -> (expires_at, result)
+
+    def _expire(self, now: float):
+        for recent in (self._fingerprints, self._signatures):
+            for key in [k for k, (expires_at, _) in recent.items() if expires_at <= now]:
+                del recent[key]
+
+    async def heal(self, namespace: str, deployment: str, fingerprint: str, fetch_logs, run_heal):
+        """
+        Heal via `run_heal(logs)` unless a duplicate can answer for it.
+
+        `fetch_logs()` and `run_heal(logs)` are coroutines. Returns
+        (outcome, result), outcome being "executed", "coalesced", "cooldown"
+        or "no_logs" (result None).
+        """
+        now = time.monotonic()
+        self._expire(now)
+
+        if fingerprint in self._fingerprints:
+            ALERTS_SUPPRESSED.labels(reason="fingerprint_cooldown").inc()
+            return "cooldown", self._fingerprints[fingerprint][1]
+
+        target = (namespace, deployment)
+        if target in self._in_flight:
+            ALERTS_SUPPRESSED.labels(reason="coalesced").inc()
+            logging.info(f"[DEDUP] Joining in-flight heal of {deployment} in ns {namespace}")
+            return "coalesced", await asyncio.shield(self._in_flight[target])
+
+        future = asyncio.get_running_loop().create_future()
+        # Nobody may be waiting on it; don't warn about an unretrieved exception
+        future.add_done_callback(lambda f: f.cancelled() or f.exception())
+        self._in_flight[target] = future
+        try:
+            logs = await fetch_logs()
+            key = (namespace, deployment, log_signature(logs))
+            if not logs:
+                outcome, result = "no_logs", None
+            elif key in self._signatures:
+                ALERTS_SUPPRESSED.labels(reason="signature_cooldown").inc()
+                logging.info(f"[DEDUP] Same error on {deployment} was healed recently, skipping")
+                outcome, result = "cooldown", self._signatures[key][1]
+            else:
+                ALERTS_EXECUTED.inc()
+                outcome, result = "executed", await run_heal(logs)
+                cooldown = self.cooldown if result is not None and result.get("success") else self.failure_cooldown
+                if result is not None and cooldown > 0:
+                    expires_at = time.monotonic() + cooldown
+                    self._signatures[key] = (expires_at, result)
+                    if fingerprint:
+                        self._fingerprints[fingerprint] = (expires_at, result)
+            future.set_result(result)
+            return outcome, result
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except Exception as e:
+            future.set_exception(e)
+            raise
+        finally:
+            del self._in_flight[target]
@@ -0,0 +1,358 @@
+import bisect
+import copy
+import random
+import re
+import shlex
+import string
+import threading
+import time
+from collections import Counter
+from datetime import datetime, timezone
+
+from kubernetes import client
+from kubernetes.client.rest import ApiException
+
+# Watch events kept for resuming; a watch from an older resourceVersion gets 410 Gone, as from a real API server
+EVENT_HISTORY = 10000
+BATCH_TOKEN = re.compile(r"(__mcp_[0-9a-f]+__) begin 0")
+
+
+def _timestamp(ts: float) -> str:
+    return datetime.fromtimestamp(ts, timezone.utc).strftime("%Y-%m-%dT%H:%M:%S.%f") + "000Z"
+
+
+def _suffix(rng: random.Random, length: int) -> str:
+    return "".join(rng.choices(string.ascii_lowercase + string.digits, k=length))
+
+
+def default_exec_handler(command: str):
+    """(exit code, output) of a command run in a fake pod: anything mentioning `fail` fails."""
+    if "fail" in command:
+        return 1, f"error: {command} failed\n"
+    return 0, f"ok: {command}\n"
+
+
+class FakeCluster:
+    """
+    In-process stand-in for the parts of the Kubernetes API the MCP server
+    uses: pods, pod logs (incl. the previous container), exec, deployments
+    with rolling restarts, and list/watch with resourceVersions.
+
+    `latency` and `failure_rate` map an API verb (get, list, watch, logs,
+    patch, exec) to seconds of delay and the probability of a 500 error.
+    `calls` counts API calls per verb. Plug it into k8s_utils with
+    `use_clients(cluster.core_v1, cluster.apps_v1, cluster.watch, cluster.stream)`,
+    or set K8S_BACKEND=fake.
+    """
+
+    def __init__(self, latency: dict = None, failure_rate: dict = None, exec_seconds: float = 0.05,
+                 restart_seconds: float = 1.0, exec_handler=default_exec_handler, seed: int = 0):
+        self.latency = latency or {}
+        self.failure_rate = failure_rate or {}
+        self.exec_seconds = exec_seconds
+        self.restart_seconds = restart_seconds
+        self.exec_handler = exec_handler
+        self.calls = Counter()
+        self._rng = random.Random(seed)
+        self._changed = threading.Condition()
+        self._version = 0
+        self._objects = {"pods": {}, "deployments": {}}   # kind -> (namespace, name) -> object
+        self._events = {"pods": [], "deployments": []}    # kind -> [(version, type, object)]
+        self._logs = {}           # (namespace, pod) -> [(ts, line)]
+        self._previous_logs = {}  # (namespace, pod) -> [(ts, line)]
+        self.core_v1 = _CoreV1(self)
+        self.apps_v1 = _AppsV1(self)
+
+    # --- test setup -------------------------------------------------------
+
+    def add_deployment(self, namespace: str, name: str, replicas: int = 1, logs: list = None):
+        """A deployment (label app=<name>) with `replicas` ready pods, each starting with `logs`."""
+        deployment = client.V1Deployment(
+            metadata=client.V1ObjectMeta(namespace=namespace, name=name, generation=1, labels={"app": name}),
+            spec=client.V1DeploymentSpec(
+                replicas=replicas,
+                selector=client.V1LabelSelector(match_labels={"app": name}),
+                template=client.V1PodTemplateSpec(metadata=client.V1ObjectMeta(labels={"app": name})),
+            ),
+            status=client.V1DeploymentStatus(observed_generation=1, replicas=replicas, updated_replicas=replicas,
+                                             available_replicas=replicas),
+        )
+        with self._changed:
+            self._emit("deployments", "ADDED", deployment)
+            template = _suffix(self._rng, 9)
+            for _ in range(replicas):
+                self._add_pod(namespace, name, template, logs or [])
+
+    def pods(self, namespace: str, deployment: str) -> list:
+        with self._changed:
+            return sorted(name for (ns, name), pod in self._objects["pods"].items()
+                          if ns == namespace and pod.metadata.labels.get("app") == deployment
+                          and pod.metadata.deletion_timestamp is None)
+
+    def log(self, namespace: str, pod_name: str, *lines: str):
+        with self._changed:
+            self._logs.setdefault((namespace, pod_name), []).extend((time.time(), line) for line in lines)
+
+    def crash(self, namespace: str, pod_name: str, *lines: str):
+        """Restart a pod's container after it logged `lines`, as in a crashloop."""
+        with self._changed:
+            self.log(namespace, pod_name, *lines)
+            self._previous_logs[(namespace, pod_name)] = self._logs.pop((namespace, pod_name), [])
+            pod = copy.deepcopy(self._objects["pods"][(namespace, pod_name)])
+            pod.status.container_statuses[0].restart_count += 1
+            self._emit("pods", "MODIFIED", pod)
+
+    # --- internals --------------------------------------------------------
+
+    def _call(self, verb: str):
+        self.calls[verb] += 1
+        if self.latency.get(verb):
+            time.sleep(self.latency[verb])
+        if self._rng.random() < self.failure_rate.get(verb, 0):
+            raise ApiException(status=500, reason=f"Injected {verb} failure")
+
+    def _emit(self, kind: str, event_type: str, obj):
+        # Called with the lock held; objects in the event history are never modified afterwards
+        obj = copy.deepcopy(obj)
+        self._version += 1
+        obj.metadata.resource_version = str(self._version)
+        key = (obj.metadata.namespace, obj.metadata.name)
+        if event_type == "DELETED":
+            self._objects[kind].pop(key, None)
+        else:
+            self._objects[kind][key] = obj
+        events = self._events[kind]
+        events.append((self._version, event_type, obj))
+        if len(events) > EVENT_HISTORY:
+            del events[:len(events) - EVENT_HISTORY]
+        self._changed.notify_all()
+
+    def _add_pod(self, namespace: str, deployment: str, template: str, logs: list):
+        name = f"{deployment}-{template}-{_suffix(self._rng, 5)}"
+        pod = client.V1Pod(
+            metadata=client.V1ObjectMeta(namespace=namespace, name=name, labels={"app": deployment}),
+            spec=client.V1PodSpec(containers=[client.V1Container(name=deployment)]),
+            status=client.V1PodStatus(
+                phase="Running",
+                conditions=[client.V1PodCondition(type="Ready", status="True")],
+                container_statuses=[client.V1ContainerStatus(name=deployment, image="fake", image_id="fake",
+                                                             ready=True, restart_count=0)],
+            ),
+        )
+        self._emit("pods", "ADDED", pod)
+        self._logs[(namespace, name)] = [(time.time(), line) for line in logs]
+
+    def _restart(self, namespace: str, name: str):
+        """Rolling restart: new pods come up after `restart_seconds`, then the old ones go."""
+        time.sleep(self.restart_seconds)
+        with self._changed:
+            deployment = copy.deepcopy(self._objects["deployments"].get((namespace, name)))
+            if deployment is None:
+                return
+            old = [pod for pod in self._objects["pods"].values()
+                   if pod.metadata.namespace == namespace and pod.metadata.labels.get("app") == name]
+            template = _suffix(self._rng, 9)
+            for _ in range(deployment.spec.replicas):
+                self._add_pod(namespace, name, template, ["Started"])
+            for pod in old:
+                self._emit("pods", "DELETED", pod)
+                self._logs.pop((pod.metadata.namespace, pod.metadata.name), None)
+            deployment.status.observed_generation = deployment.metadata.generation
+            deployment.status.updated_replicas = deployment.status.available_replicas = deployment.spec.replicas
+            deployment.status.replicas = deployment.spec.replicas
+            self._emit("deployments", "MODIFIED", deployment)
+
+    def _list(self, kind: str, namespace: str = None, label_selector: str = None):
+        labels = dict(part.split("=", 1) for part in label_selector.split(",")) if label_selector else {}
+        with self._changed:
+            items = [copy.deepcopy(obj) for (ns, _), obj in self._objects[kind].items()
+                     if (namespace is None or ns == namespace)
+                     and all(obj.metadata.labels.get(k) == v for k, v in labels.items())]
+            return _List(items, str(self._version))
+
+    def _read(self, kind: str, namespace: str, name: str):
+        with self._changed:
+            obj = self._objects[kind].get((namespace, name))
+            if obj is None:
+                raise ApiException(status=404, reason=f"{kind} {namespace}/{name} not found")
+            return copy.deepcopy(obj)
+
+    # --- exec -------------------------------------------------------------
+
+    def stream(self, func, name: str, namespace: str, command: list, _preload_content: bool = True, **kwargs):
+        """Stands in for `kubernetes.stream.stream` on `connect_get_namespaced_pod_exec`."""
+        self._call("exec")
+        self._read("pods", namespace, name)
+        script = command[-1]
+        token = BATCH_TOKEN.search(script)
+        if token is None:
+            time.sleep(self.exec_seconds)
+            return self.exec_handler(script)[1]
+        # A batch from k8s_utils._batch_script: each command is a `/bin/sh -c <quoted command>` line
+        commands = [shlex.split(line)[2] for line in script.splitlines() if line.startswith("/bin/sh -c ")]
+        return _ExecSession(self, commands, token.group(1))
+
+    # --- watch ------------------------------------------------------------
+
+    def watch(self):
+        return _Watch(self)
+
+
+class _List:
+    def __init__(self, items: list, resource_version: str):
+        self.items = items
+        self.metadata = client.V1ListMeta(resource_version=resource_version)
+
+
+class _CoreV1:
+    def __init__(self, cluster: FakeCluster):
+        self.cluster = cluster
+
+    def list_namespaced_pod(self, namespace: str, label_selector: str = None, **kwargs):
+        self.cluster._call("list")
+        return self.cluster._list("pods", namespace, label_selector)
+
+    def list_pod_for_all_namespaces(self, label_selector: str = None, **kwargs):
+        self.cluster._call("list")
+        return self.cluster._list("pods", None, label_selector)
+
+    def read_namespaced_pod(self, name: str, namespace: str, **kwargs):
+        self.cluster._call("get")
+        return self.cluster._read("pods", namespace, name)
+
+    def read_namespaced_pod_log(self, name: str, namespace: str, container: str = None, previous: bool = False,
+                                timestamps: bool = False, tail_lines: int = None, limit_bytes: int = None,
+                                since_seconds: int = None, _preload_content: bool = True, **kwargs):
+        cluster = self.cluster
+        cluster._call("logs")
+        cluster._read("pods", namespace, name)
+        with cluster._changed:
+            source = cluster._previous_logs if previous else cluster._logs
+            if previous and (namespace, name) not in source:
+                raise ApiException(status=400, reason=f"previous terminated container not found for {name}")
+            lines = list(source.get((namespace, name), []))
+        if since_seconds:
+            lines = [(ts, line) for ts, line in lines if ts >= time.time() - since_seconds]
+        if tail_lines:
+            lines = lines[-tail_lines:]
+        text = "".join(f"{_timestamp(ts)} {line}\n" if timestamps else f"{line}\n" for ts, line in lines)
+        data = text.encode("utf-8")[:limit_bytes] if limit_bytes else text.encode("utf-8")
+        return _LogResponse(data) if not _preload_content else data.decode("utf-8", errors="replace")
+
+    def connect_get_namespaced_pod_exec(self, *args, **kwargs):
+        raise NotImplementedError("Use FakeCluster.stream")
+
+
+class _AppsV1:
+    def __init__(self, cluster: FakeCluster):
+        self.cluster = cluster
+
+    def list_namespaced_deployment(self, namespace: str, **kwargs):
+        self.cluster._call("list")
+        return self.cluster._list("deployments", namespace)
+
+    def list_deployment_for_all_namespaces(self, **kwargs):
+        self.cluster._call("list")
+        return self.cluster._list("deployments")
+
+    def read_namespaced_deployment(self, name: str, namespace: str, **kwargs):
+        self.cluster._call("get")
+        return self.cluster._read("deployments", namespace, name)
+
+    def patch_namespaced_deployment(self, name: str, namespace: str, body: dict, **kwargs):
+        cluster = self.cluster
+        cluster._call("patch")
+        with cluster._changed:
+            deployment = copy.deepcopy(cluster._read("deployments", namespace, name))
+            deployment.metadata.generation += 1
+            deployment.status.updated_replicas = 0
+            cluster._emit("deployments", "MODIFIED", deployment)
+        threading.Thread(target=cluster._restart, args=(namespace, name), daemon=True).start()
+        return deployment
+
+
+class _LogResponse:
+    def __init__(self, data: bytes):
+        self.data = data
+
+    def stream(self, amt: int):
+        for i in range(0, len(self.data), amt):
+            yield self.data[i:i + amt]
+
+    def release_conn(self):
+        pass
+
+
+class _ExecSession:
+    """Output of a batched exec, released command by command as `exec_seconds` pass (WSClient-shaped)."""
+
+    def __init__(self, cluster: FakeCluster, commands: list, token: str):
+        self._chunks = []
+        at = time.monotonic()
+        for i, command in enumerate(commands):
+            exit_code, output = cluster.exec_handler(command)
+            at += cluster.exec_seconds
+            self._chunks.append((at, f"\n{token} begin {i}\n{output}\n{token} end {i} {exit_code}\n"))
+        self._stdout = ""
+
+    def is_open(self) -> bool:
+        return bool(self._chunks)
+
+    def update(self, timeout: float = 0):
+        if not self._chunks:
+            return
+        time.sleep(max(0, min(timeout, self._chunks[0][0] - time.monotonic())))
+        while self._chunks and self._chunks[0][0] <= time.monotonic():
+            self._stdout += self._chunks.pop(0)[1]
+
+    def run_forever(self, timeout: float = None):
+        while self.is_open():
+            self.update(timeout=1)
+
+    def peek_stdout(self, timeout: float = 0) -> bool:
+        return bool(self._stdout)
+
+    def read_stdout(self, timeout: float = None) -> str:
+        stdout, self._stdout = self._stdout, ""
+        return stdout
+
+    def peek_stderr(self, timeout: float = 0) -> bool:
+        return False
+
+    def read_stderr(self, timeout: float = None) -> str:
+        return ""
+
+    def close(self):
+        self._chunks = []
+
+
+class _Watch:
+    """Stands in for `kubernetes.watch.Watch` on the fake cluster's list methods."""
+
+    def __init__(self, cluster: FakeCluster):
+        self.cluster = cluster
+        self._stop = False
+
+    def stop(self):
+        self._stop = True
+
+    def stream(self, func, resource_version: str = None, timeout_seconds: int = None, namespace: str = None,
+               **kwargs):
+        cluster = self.cluster
+        cluster._call("watch")
+        kind = "deployments" if "deployment" in func.__name__ else "pods"
+        since = int(resource_version or 0)
+        deadline = time.monotonic() + (timeout_seconds or 300)
+        while not self._stop and time.monotonic() < deadline:
+            with cluster._changed:
+                events = cluster._events[kind]
+                if events and since < events[0][0] - 1:
+                    raise ApiException(status=410, reason="Expired: too old resource version")
+                pending = events[bisect.bisect_right(events, since, key=lambda event: event[0]):]
+                if not pending:
+                    cluster._changed.wait(min(1, max(0, deadline - time.monotonic())))
+                    continue
+            for version, event_type, obj in pending:
+                since = version
+                if namespace is None or obj.metadata.namespace == namespace:
+                    yield {"type": event_type, "object": copy.deepcopy(obj)}
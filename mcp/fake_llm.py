@@ -0,0 +1,60 @@
+import json
+import random
+import re
+import threading
+import time
+
+# (pattern over the prompt, answer); {1}, {2}... are filled from the pattern's groups
+DEFAULT_SCRIPT = [
+    (r"No module named '([\w.]+)'", {"commands": ["pip install {1}"], "description": "Install the missing module {1}"}),
+    (r"FileNotFoundError: .*?'([\w./\-]+)'", {"commands": ["touch {1}"], "description": "Create the missing file {1}"}),
+    (r".", {"commands": ["echo no-op"], "description": "Nothing to fix"}),
+]
+
+PLACEHOLDER = re.compile(r"\{(\d+)\}")
+
+
+class FakeResponse:
+    def __init__(self, text: str):
+        self.text = text
+
+
+class FakeLLM:
+    """
+    Scripted stand-in for the Gemini model (`generate_content(prompt, ...)`).
+
+    Answers with the first `script` entry whose pattern matches the prompt,
+    after `latency` seconds; `failure_rate` of the calls raise instead.
+    `calls` counts the calls made.
+    """
+
+    def __init__(self, script: list = None, latency: float = 0.0, failure_rate: float = 0.0, seed: int = 0):
+        self.script = [(re.compile(pattern), answer) for pattern, answer in (script or DEFAULT_SCRIPT)]
+        self.latency = latency
+        self.failure_rate = failure_rate
+        self.calls = 0
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def generate_content(self, prompt: str, generation_config: dict = None) -> FakeResponse:
+        with self._lock:
+            self.calls += 1
+            failed = self._rng.random() < self.failure_rate
+        time.sleep(self.latency)
+        if failed:
+            raise RuntimeError("Injected LLM failure")
+        for pattern, answer in self.script:
+            m = pattern.search(prompt)
+            if m:
+                return FakeResponse(json.dumps(_fill(answer, (m.group(0),) + m.groups())))
+        return FakeResponse("{}")
+
+
+def _fill(value, groups: tuple):
+    if isinstance(value, str):
+        return PLACEHOLDER.sub(lambda m: groups[int(m.group(1))] or "", value)
+    if isinstance(value, list):
+        return [_fill(item, groups) for item in value]
+    if isinstance(value, dict):
+        return {key: _fill(item, groups) for key, item in value.items()}
+    return value
@@ -52,16 +52,14 @@
 #         "message": log_entry["description"]
 #     }
 import logging
-import os
-import json
-import time
 from datetime import datetime
-from k8s_utils import restart_deployment, exec_command_in_pod, find_target_pod, wait_for_pod_ready
-from llm_utils import infer_healing_commands
+from k8s_utils import restart_deployment, exec_commands_in_pod, find_target_pod, wait_for_pod_ready, wait_for_rollout
+from llm_utils import infer_healing_commands, decision_cache
+from rules import load_rulebook
+from history import healing_history
+
+rulebook = load_rulebook()
 
-LOG_DIR = "/app/healing_logs"
-os.makedirs(LOG_DIR, exist_ok=True)
-LOG_FILE = os.path.join(LOG_DIR, "healing_dataset.json")
 
 def extract_relevant_logs(logs: str) -> str:
     """Extract last 100 lines of logs to capture errors."""
@@ -75,8 +73,12 @@ def analyze_logs_and_heal(namespace: str, deployment_name: str, pod_logs: str) -
 
     pod_logs = extract_relevant_logs(pod_logs)
 
-    # LLM inference
-    result = infer_healing_commands(pod_logs)
+    # Known failures are decided by the rulebook; only the rest goes to the LLM
+    result = rulebook.match(pod_logs)
+    if result is not None:
+        print(f"[MCP] Matched healing rule: {result['rule']}")
+    else:
+        result = infer_healing_commands(pod_logs)
     commands = result.get("commands", [])
     description = result.get("description", "")
     print(f"[MCP] Inferred commands: {commands}")
@@ -90,9 +92,18 @@ def analyze_logs_and_heal(namespace: str, deployment_name: str, pod_logs: str) -
         "logs": pod_logs,
         "healing_action": commands,
         "message": "",
-        "success": False
+        "success": False,
+        "error_signature": result.get("signature"),
+        "cached_decision": result.get("cached", False),
+        "rule": result.get("rule")
     }
 
+    if result.get("action") == "restart":
+        restarted = restart_deployment(namespace, deployment_name)
+        log_entry.update({"healing_action": ["restart"], "message": description, "success": restarted})
+        save_healing_log(log_entry)
+        return {"success": restarted, "action_taken": "restart", "message": description}
+
     # Filter invalid commands
     filtered_commands = [cmd for cmd in commands if cmd.strip() and '<' not in cmd and '>' not in cmd]
     if len(filtered_commands) < len(commands):
@@ -113,7 +124,7 @@ def analyze_logs_and_heal(namespace: str, deployment_name: str, pod_logs: str) -
             save_healing_log(log_entry)
             return {"success": False, "action_taken": "restart_failed", "message": message}
 
-        time.sleep(5)
+        wait_for_rollout(namespace, deployment_name, timeout=60)
         pod_name = find_target_pod(namespace, deployment_name)
         print(f"[MCP] New target pod after restart: {pod_name}")
         pod_ready = wait_for_pod_ready(namespace, pod_name, timeout=60)
@@ -124,22 +135,19 @@ def analyze_logs_and_heal(namespace: str, deployment_name: str, pod_logs: str) -
             return {"success": False, "action_taken": "new_pod_not_ready", "message": message}
         print(f"[MCP] Pod {pod_name} is ready after restart. Proceeding with healing commands.")
 
-    # Execute healing commands
-    full_output = []
-    all_success = True
-    for cmd in filtered_commands:
-        print(f"[MCP] Executing command in pod: {cmd}")
-        res = exec_command_in_pod(namespace, pod_name, cmd)
-        success = res.get("success", False)
-        output = res.get("output", "")
-        full_output.append(f"$ {cmd}\n{output}")
-        if not success:
-            print(f"[MCP] Command failed: {cmd}")
-            all_success = False
-            break
+    # Execute healing commands, all in one exec session
+    print(f"[MCP] Executing commands in pod: {filtered_commands}")
+    res = exec_commands_in_pod(namespace, pod_name, filtered_commands)
+    all_success = res["success"]
+    for r in res["results"]:
+        if r["exit_code"] is None:
+            print(f"[MCP] Command did not finish: {r['command']}")
+        elif r["exit_code"] != 0:
+            print(f"[MCP] Command exited with {r['exit_code']}: {r['command']}")
 
     log_entry["success"] = all_success
-    log_entry["message"] = "\n\n".join(full_output)
+    log_entry["message"] = res["output"]
+    log_entry["exit_codes"] = [r["exit_code"] for r in res["results"]]
     save_healing_log(log_entry)
 
     return {
@@ -149,16 +157,13 @@ def analyze_logs_and_heal(namespace: str, deployment_name: str, pod_logs: str) -
     }
 
 def save_healing_log(log_entry):
+    # A cached fix that didn't work must not be handed out again; a command that
+    # exited non-zero doesn't fail the heal, but it still means the fix didn't work
+    failed = not log_entry.get("success") or any(log_entry.get("exit_codes") or [])
+    if failed and log_entry.get("error_signature"):
+        decision_cache.invalidate(log_entry["error_signature"])
     try:
-        if os.path.exists(LOG_FILE):
-            with open(LOG_FILE, "r+", encoding="utf-8") as f:
-                data = json.load(f)
-                data.append(log_entry)
-                f.seek(0)
-                json.dump(data, f, indent=2)
-        else:
-            with open(LOG_FILE, "w", encoding="utf-8") as f:
-                json.dump([log_entry], f, indent=2)
+        healing_history.append(log_entry)
         print("[MCP] Healing log written successfully.")
     except Exception as e:
         print(f"[MCP] Error writing healing log: {e}")
@@ -0,0 +1,147 @@
+import json
+import logging
+import os
+import sqlite3
+import threading
+
+# Single healing history store on the healing-logs volume (SQLite in WAL mode: O(1) appends, concurrent-safe)
+HISTORY_DB_PATH = os.getenv("HISTORY_DB_PATH", "/app/healing_logs/healing_history.db")
+# Written by earlier versions; imported once into an empty store
+LEGACY_DATASET = os.path.join(os.path.dirname(HISTORY_DB_PATH), "healing_dataset.json")
+MAX_PAGE_SIZE = 500
+
+COLUMNS = ("timestamp", "namespace", "deployment_name", "pod_name", "error_signature", "rule",
+           "cached_decision", "healing_action", "message", "success", "logs")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS heals (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    timestamp TEXT NOT NULL,
+    namespace TEXT,
+    deployment_name TEXT,
+    pod_name TEXT,
+    error_signature TEXT,
+    rule TEXT,
+    cached_decision INTEGER,
+    healing_action TEXT,
+    message TEXT,
+    success INTEGER,
+    logs TEXT,
+    extra TEXT
+);
+CREATE INDEX IF NOT EXISTS heals_timestamp ON heals (timestamp);
+CREATE INDEX IF NOT EXISTS heals_target ON heals (namespace, deployment_name, id);
+CREATE INDEX IF NOT EXISTS heals_deployment ON heals (deployment_name, id);
+CREATE INDEX IF NOT EXISTS heals_signature ON heals (error_signature, id);
+"""
+
+
+class HealingHistory:
+    """Append-only healing log with indexed, cursor-paginated queries."""
+
+    def __init__(self, path: str = HISTORY_DB_PATH):
+        self.path = path
+        self._local = threading.local()
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        conn = self._conn()
+        conn.executescript(SCHEMA)
+
+    def _conn(self) -> sqlite3.Connection:
+        # One connection per thread; heals write from worker threads
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=10, isolation_level=None)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def append(self, entry: dict) -> int:
+        row = [entry.get(column) for column in COLUMNS]
+        row[COLUMNS.index("healing_action")] = json.dumps(entry.get("healing_action"))
+        extra = {k: v for k, v in entry.items() if k not in COLUMNS}
+        cursor = self._conn().execute(
+            f"INSERT INTO heals ({', '.join(COLUMNS)}, extra) VALUES ({', '.join('?' * (len(COLUMNS) + 1))})",
+            row + [json.dumps(extra) if extra else None]
+        )
+        return cursor.lastrowid
+
+    def query(self, namespace: str = None, deployment: str = None, signature: str = None, success: bool = None,
+              since: str = None, until: str = None, cursor: int = None, limit: int = 50,
+              include_logs: bool = False) -> dict:
+        """
+        Newest heals first, filtered by any of the arguments (`since`/`until`
+        are ISO timestamps). Pass the returned `next_cursor` to get the next page.
+        """
+        filters = {
+            "namespace = ?": namespace,
+            "deployment_name = ?": deployment,
+            "error_signature = ?": signature,
+            "success = ?": None if success is None else int(success),
+            "timestamp >= ?": since,
+            "timestamp < ?": until,
+            "id < ?": cursor,
+        }
+        clauses = [clause for clause, value in filters.items() if value is not None]
+        params = [value for value in filters.values() if value is not None]
+        limit = max(1, min(limit, MAX_PAGE_SIZE))
+
+        sql = "SELECT * FROM heals"
+        if clauses:
+            sql += " WHERE " + " AND ".join(clauses)
+        sql += " ORDER BY id DESC LIMIT ?"
+        rows = self._conn().execute(sql, params + [limit + 1]).fetchall()
+
+        items = [self._to_entry(row, include_logs) for row in rows[:limit]]
+        return {"items": items, "next_cursor": items[-1]["id"] if len(rows) > limit else None}
+
+    @staticmethod
+    def _to_entry(row: sqlite3.Row, include_logs: bool) -> dict:
+        entry = dict(row)
+        extra = entry.pop("extra")
+        if extra:
+            entry.update(json.loads(extra))
+        entry["healing_action"] = json.loads(entry["healing_action"]) if entry["healing_action"] else None
+        entry["success"] = bool(entry["success"])
+        entry["cached_decision"] = bool(entry["cached_decision"])
+        if not include_logs:
+            entry.pop("logs")
+        return entry
+
+    def import_legacy(self, path: str = LEGACY_DATASET):
+        """Move a healing_dataset.json from earlier versions into an empty store, once."""
+        if not os.path.exists(path):
+            return
+        if self._conn().execute("SELECT 1 FROM heals LIMIT 1").fetchone():
+            return
+        try:
+            with open(path, encoding="utf-8") as f:
+                entries = json.load(f)
+        except (OSError, ValueError) as e:
+            logging.warning(f"[HISTORY] Could not import {path}: {e}")
+            return
+        conn = self._conn()
+        imported = skipped = 0
+        conn.execute("BEGIN")
+        try:
+            for entry in entries if isinstance(entries, list) else []:
+                try:
+                    if not isinstance(entry, dict):
+                        raise ValueError("not an object")
+                    self.append(entry)
+                    imported += 1
+                except (ValueError, TypeError, sqlite3.Error) as e:
+                    # A failed insert only undoes itself; keep importing the rest
+                    skipped += 1
+                    logging.warning(f"[HISTORY] Skipping malformed legacy heal: {e}")
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        os.replace(path, path + ".migrated")
+        logging.info(f"[HISTORY] Imported {imported} heals from {path}" + (f", skipped {skipped}" if skipped else ""))
+
+
+healing_history = HealingHistory()
+healing_history.import_legacy()
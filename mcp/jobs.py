@@ -0,0 +1,140 @@
+import asyncio
+import logging
+import os
+import time
+import uuid
+from collections import OrderedDict
+from datetime import datetime
+
+from metrics import JOB_QUEUE_DEPTH, JOB_WAIT_SECONDS, JOB_RUN_SECONDS
+
+# Workers taking heal jobs off the queue (HEAL_CONCURRENCY still caps how many heal at once)
+HEAL_WORKERS = int(os.getenv("HEAL_WORKERS", "8"))
+# Finished jobs kept for GET /mcp/jobs/{id}; the oldest are forgotten first
+JOBS_MAX_KEPT = int(os.getenv("JOBS_MAX_KEPT", "1000"))
+# Jobs waiting for a worker; once this many are queued new ones are refused (0 = no limit)
+JOBS_MAX_QUEUED = int(os.getenv("JOBS_MAX_QUEUED", "500"))
+
+
+class QueueFull(Exception):
+    """The job queue holds JOBS_MAX_QUEUED jobs already."""
+
+
+class Job:
+    """One queued heal: `run()` is the coroutine function doing the work."""
+
+    def __init__(self, kind: str, run, **details):
+        self.id = uuid.uuid4().hex
+        self.kind = kind
+        self.run = run
+        self.details = details
+        self.status = "queued"
+        self.result = None
+        self.error = None
+        self.exception = None
+        self.submitted_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+        self.done = asyncio.Event()
+
+    def to_dict(self) -> dict:
+        def iso(ts):
+            return datetime.utcfromtimestamp(ts).isoformat() if ts else None
+
+        return {
+            "job_id": self.id,
+            "kind": self.kind,
+            "status": self.status,
+            **self.details,
+            "submitted_at": iso(self.submitted_at),
+            "started_at": iso(self.started_at),
+            "finished_at": iso(self.finished_at),
+            "result": self.result,
+            "error": self.error,
+        }
+
+
+class JobQueue:
+    """
+    FIFO of heal jobs run by a fixed pool of asyncio workers.
+
+    Callers get a job back immediately and can look it up by id or wait on
+    it. A job whose `run()` raises is marked failed with the error kept.
+    `submit()` raises QueueFull once `max_queued` jobs are waiting.
+    """
+
+    def __init__(self, workers: int = HEAL_WORKERS, max_kept: int = JOBS_MAX_KEPT, max_queued: int = JOBS_MAX_QUEUED):
+        self.workers = max(1, workers)
+        self.max_kept = max_kept
+        self.max_queued = max(0, max_queued)
+        self._queue = None
+        self._jobs = OrderedDict()  # id -> Job
+        self._workers = []
+
+    def start(self):
+        # Created here so the queue belongs to the running event loop
+        self._queue = asyncio.Queue(maxsize=self.max_queued)
+        self._workers = [asyncio.create_task(self._work()) for _ in range(self.workers)]
+        logging.info(f"[JOBS] Started {self.workers} heal workers")
+
+    async def stop(self):
+        for worker in self._workers:
+            worker.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers = []
+
+    def has_room(self, count: int = 1) -> bool:
+        """Whether `count` more jobs can be submitted right now."""
+        return not self.max_queued or self._queue.qsize() + count <= self.max_queued
+
+    def submit(self, kind: str, run, **details) -> Job:
+        if not self.has_room():
+            raise QueueFull(f"{self._queue.qsize()} jobs already queued")
+        job = Job(kind, run, **details)
+        self._jobs[job.id] = job
+        self._forget_finished()
+        self._queue.put_nowait(job)
+        JOB_QUEUE_DEPTH.inc()
+        return job
+
+    def get(self, job_id: str):
+        return self._jobs.get(job_id)
+
+    async def wait(self, job: Job, timeout: float = None) -> bool:
+        """True once the job has finished, False if `timeout` seconds pass first."""
+        try:
+            await asyncio.wait_for(asyncio.shield(job.done.wait()), timeout)
+            return True
+        except asyncio.TimeoutError:
+            return False
+
+    def _forget_finished(self):
+        # Oldest first, skipping jobs still queued or running
+        excess = len(self._jobs) - self.max_kept
+        if excess <= 0:
+            return
+        finished = [job_id for job_id, job in self._jobs.items() if job.done.is_set()][:excess]
+        for job_id in finished:
+            del self._jobs[job_id]
+
+    async def _work(self):
+        while True:
+            job = await self._queue.get()
+            JOB_QUEUE_DEPTH.dec()
+            job.status = "running"
+            job.started_at = time.time()
+            JOB_WAIT_SECONDS.labels(kind=job.kind).observe(job.started_at - job.submitted_at)
+            try:
+                job.result = await job.run()
+                job.status = "succeeded"
+            except asyncio.CancelledError:
+                job.status, job.error = "failed", "cancelled"
+                raise
+            except Exception as e:
+                logging.error(f"[JOBS] {job.kind} job {job.id} failed: {e}")
+                job.status, job.error, job.exception = "failed", str(e), e
+            finally:
+                job.finished_at = time.time()
+                JOB_RUN_SECONDS.labels(kind=job.kind).observe(job.finished_at - job.started_at)
+                job.done.set()
+                self._queue.task_done()
@@ -52,61 +52,283 @@
 #         }
 #     }
 #     return patch_deployment(namespace, deployment_name, patch)
-from kubernetes import client, config
+from kubernetes import client, config, watch
 from kubernetes.stream import stream
 from kubernetes.client.rest import ApiException
+from log_reader import PodLogReader
+from metrics import K8S_API_SECONDS, EXEC_COMMAND_SECONDS, READINESS_WAIT_SECONDS
+import functools
 import logging
+import os
+import re
+import shlex
+import threading
 import time
+import uuid
 
-try:
-    config.load_incluster_config()
-except Exception:
-    config.load_kube_config()
+# "cluster" talks to the Kubernetes API; "fake" to the in-process stand-in in fake_k8s.py (load tests)
+K8S_BACKEND = os.getenv("K8S_BACKEND", "cluster")
+# Namespace the pod/deployment caches watch ("" = all namespaces)
+WATCH_NAMESPACE = os.getenv("WATCH_NAMESPACE", "")
+# Length of one watch request; the next one resumes from the last resourceVersion
+WATCH_TIMEOUT_SECONDS = int(os.getenv("WATCH_TIMEOUT_SECONDS", "300"))
+# How long lookups wait for the initial list before falling back to direct API reads
+CACHE_SYNC_TIMEOUT = float(os.getenv("CACHE_SYNC_TIMEOUT", "5"))
+HTTP_GONE = 410
 
-core_v1 = client.CoreV1Api()
-apps_v1 = client.AppsV1Api()
 
+class Informer:
+    """
+    Local cache of one kind of object, kept current by list-then-watch.
+
+    Lists once, then watches from the list's resourceVersion; each watch
+    resumes where the previous one ended, and the cache is only relisted
+    when the server answers 410 Gone. Readers block on a condition that is
+    notified on every event, so a wait resolves as soon as the change is
+    seen instead of on the next poll.
+
+    `list_func` is an API list method (e.g. `CoreV1Api.list_namespaced_pod`)
+    called with `list_kwargs`; `watch_factory` builds a `kubernetes.watch.Watch`.
+    Any stand-ins with the same shape work, which is how it is exercised
+    without a cluster.
+    """
+
+    def __init__(self, list_func, watch_factory=watch.Watch, timeout_seconds=WATCH_TIMEOUT_SECONDS,
+                 **list_kwargs):
+        self.list_func = list_func
+        self.list_kwargs = list_kwargs
+        self.watch_factory = watch_factory
+        self.timeout_seconds = timeout_seconds
+        self.resource_version = None
+        self._objects = {}  # (namespace, name) -> object
+        self._changed = threading.Condition()
+        self._synced = threading.Event()
+        self._sync_waited = False
+        self._stopped = threading.Event()
+        self._watch = None
+        self._thread = None
+
+    def start(self):
+        with self._changed:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="informer", daemon=True)
+                self._thread.start()
+        return self
+
+    def stop(self):
+        self._stopped.set()
+        if self._watch is not None:
+            self._watch.stop()
+
+    def wait_synced(self, timeout: float = None) -> bool:
+        self.start()
+        # Only the first lookups wait out a slow initial list; later ones fall back right away
+        if self._sync_waited:
+            return self._synced.is_set()
+        synced = self._synced.wait(CACHE_SYNC_TIMEOUT if timeout is None else timeout)
+        self._sync_waited = True
+        return synced
+
+    def _run(self):
+        backoff = 1
+        while not self._stopped.is_set():
+            try:
+                if self.resource_version is None:
+                    self._list()
+                self._watch_once()
+                backoff = 1
+            except ApiException as e:
+                if e.status == HTTP_GONE:
+                    logging.info("[MCP] Watch resourceVersion expired, relisting")
+                    self.resource_version = None
+                    continue
+                logging.warning(f"[MCP] Watch failed ({e.status}), retrying in {backoff}s")
+            except Exception as e:
+                logging.warning(f"[MCP] Watch failed ({e}), retrying in {backoff}s")
+            self._stopped.wait(backoff)
+            backoff = min(backoff * 2, 30)
+
+    def _list(self):
+        with K8S_API_SECONDS.labels(verb="list").time():
+            listed = self.list_func(**self.list_kwargs)
+        with self._changed:
+            self._objects = {self._key(obj): obj for obj in listed.items}
+            self.resource_version = listed.metadata.resource_version
+            self._changed.notify_all()
+        self._synced.set()
+
+    def _watch_once(self):
+        self._watch = self.watch_factory()
+        for event in self._watch.stream(self.list_func, resource_version=self.resource_version,
+                                        timeout_seconds=self.timeout_seconds, allow_watch_bookmarks=True,
+                                        **self.list_kwargs):
+            if event["type"] == "ERROR":
+                raw = event.get("raw_object") or {}
+                raise ApiException(status=raw.get("code"), reason=raw.get("message"))
+            obj = event["object"]
+            with self._changed:
+                if event["type"] == "DELETED":
+                    self._objects.pop(self._key(obj), None)
+                elif event["type"] != "BOOKMARK":
+                    self._objects[self._key(obj)] = obj
+                self.resource_version = obj.metadata.resource_version
+                self._changed.notify_all()
+            if self._stopped.is_set():
+                self._watch.stop()
+
+    @staticmethod
+    def _key(obj):
+        return (obj.metadata.namespace, obj.metadata.name)
+
+    def get(self, namespace: str, name: str):
+        with self._changed:
+            return self._objects.get((namespace, name))
+
+    def list(self, namespace: str, labels: dict = None) -> list:
+        with self._changed:
+            return [
+                obj for (ns, _), obj in self._objects.items()
+                if ns == namespace and all((obj.metadata.labels or {}).get(k) == v for k, v in (labels or {}).items())
+            ]
+
+    def wait_for(self, namespace: str, name: str, predicate, timeout: float):
+        """The object once `predicate(obj)` holds (obj is None while it doesn't exist), else None."""
+        deadline = time.monotonic() + timeout
+        with self._changed:
+            while True:
+                obj = self._objects.get((namespace, name))
+                if predicate(obj):
+                    return obj
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return None
+                self._changed.wait(remaining)
+
+
+def _informer(namespaced_list, all_namespaces_list, watch_factory):
+    if WATCH_NAMESPACE:
+        return Informer(namespaced_list, watch_factory=watch_factory, namespace=WATCH_NAMESPACE)
+    return Informer(all_namespaces_list, watch_factory=watch_factory)
+
+core_v1 = apps_v1 = exec_stream = None
+pod_informer = deployment_informer = pod_log_reader = None
+
+def use_clients(core_api, apps_api, watch_factory=watch.Watch, exec_stream_func=stream):
+    """
+    Point every helper in this module at these API clients. Anything shaped
+    like CoreV1Api/AppsV1Api works, with a matching Watch factory and exec
+    `stream` function. The pod/deployment caches start over.
+    """
+    global core_v1, apps_v1, exec_stream, pod_informer, deployment_informer, pod_log_reader
+    for informer in (pod_informer, deployment_informer):
+        if informer is not None:
+            informer.stop()
+    core_v1, apps_v1, exec_stream = core_api, apps_api, exec_stream_func
+    pod_informer = _informer(core_v1.list_namespaced_pod, core_v1.list_pod_for_all_namespaces, watch_factory)
+    deployment_informer = _informer(apps_v1.list_namespaced_deployment, apps_v1.list_deployment_for_all_namespaces,
+                                    watch_factory)
+    # Remembers each pod's read position so repeated heals only fetch new lines
+    pod_log_reader = PodLogReader(core_v1, get_pod=_get_pod)
+
+def start_informers():
+    pod_informer.start()
+    deployment_informer.start()
+
+def _watched(informer: Informer, namespace: str) -> bool:
+    return (not WATCH_NAMESPACE or namespace == WATCH_NAMESPACE) and informer.wait_synced()
+
+def is_pod_ready(pod) -> bool:
+    if pod is None or pod.metadata.deletion_timestamp or pod.status.phase != "Running":
+        return False
+    return any(c.type == "Ready" and c.status == "True" for c in pod.status.conditions or [])
+
+def is_rollout_complete(deployment) -> bool:
+    """Same test as `kubectl rollout status`: every replica updated, available, and no old ones left."""
+    if deployment is None:
+        return False
+    status, replicas = deployment.status, deployment.spec.replicas or 0
+    return (
+        (status.observed_generation or 0) >= deployment.metadata.generation
+        and (status.updated_replicas or 0) == replicas
+        and (status.replicas or 0) == replicas
+        and (status.available_replicas or 0) == replicas
+    )
+
+def _get_pod(namespace: str, pod_name: str):
+    if _watched(pod_informer, namespace):
+        return pod_informer.get(namespace, pod_name)
+    try:
+        with K8S_API_SECONDS.labels(verb="get").time():
+            return core_v1.read_namespaced_pod(name=pod_name, namespace=namespace)
+    except ApiException:
+        return None
+
+def _timed_wait(wait: str):
+    """Records how long the decorated wait took and whether it ended ready."""
+    def decorate(fn):
+        @functools.wraps(fn)
+        def timed(*args, **kwargs):
+            start, result = time.monotonic(), "timeout"
+            try:
+                ready = fn(*args, **kwargs)
+                result = "ready" if ready else "timeout"
+                return ready
+            finally:
+                READINESS_WAIT_SECONDS.labels(wait=wait, result=result).observe(time.monotonic() - start)
+        return timed
+    return decorate
+
+@_timed_wait("pod")
 def wait_for_pod_ready(namespace: str, pod_name: str, timeout=60):
+    if _watched(pod_informer, namespace):
+        return pod_informer.wait_for(namespace, pod_name, is_pod_ready, timeout) is not None
     start_time = time.time()
     while time.time() - start_time < timeout:
-        try:
-            pod = core_v1.read_namespaced_pod(name=pod_name, namespace=namespace)
-            conditions = pod.status.conditions or []
-            ready_conditions = [c for c in conditions if c.type == "Ready" and c.status == "True"]
-            if pod.status.phase == "Running" and ready_conditions:
-                return True
-        except ApiException:
-            pass
+        if is_pod_ready(_get_pod(namespace, pod_name)):
+            return True
         time.sleep(3)
     return False
 
+@_timed_wait("container")
 def wait_for_container_ready(namespace: str, pod_name: str, expected_container: str, timeout=15):
-    for _ in range(timeout):
+    def has_container(pod):
+        return pod is not None and expected_container in [c.name for c in pod.spec.containers]
+
+    if _watched(pod_informer, namespace):
+        if pod_informer.wait_for(namespace, pod_name, has_container, timeout) is not None:
+            return True
+    else:
+        for _ in range(timeout):
+            if has_container(_get_pod(namespace, pod_name)):
+                return True
+            time.sleep(1)
+    raise RuntimeError(f"[MCP] Container '{expected_container}' not ready in pod '{pod_name}' after {timeout}s")
+
+@_timed_wait("rollout")
+def wait_for_rollout(namespace: str, deployment_name: str, timeout=60) -> bool:
+    """Wait until a restarted deployment has replaced all its pods."""
+    if _watched(deployment_informer, namespace):
+        return deployment_informer.wait_for(namespace, deployment_name, is_rollout_complete, timeout) is not None
+    start_time = time.time()
+    while time.time() - start_time < timeout:
         try:
-            pod = core_v1.read_namespaced_pod(name=pod_name, namespace=namespace)
-            container_names = [c.name for c in pod.spec.containers]
-            if expected_container in container_names:
+            with K8S_API_SECONDS.labels(verb="get").time():
+                deployment = apps_v1.read_namespaced_deployment(name=deployment_name, namespace=namespace)
+            if is_rollout_complete(deployment):
                 return True
         except ApiException:
             pass
-        time.sleep(1)
-    raise RuntimeError(f"[MCP] Container '{expected_container}' not ready in pod '{pod_name}' after {timeout}s")
+        time.sleep(3)
+    return False
 
-def get_pod_logs(namespace: str, pod_name: str, container: str = None, tail_lines: int = 1000) -> str:
-    try:
-        return core_v1.read_namespaced_pod_log(
-            name=pod_name,
-            namespace=namespace,
-            container=container,
-            tail_lines=tail_lines
-        )
-    except ApiException as e:
-        logging.error(f"[MCP] Error fetching logs for pod {pod_name} in {namespace}: {e}")
-        return ""
+def get_pod_logs(namespace: str, pod_name: str, container: str = None) -> str:
+    """Latest LOG_TAIL_LINES lines of the pod's logs, including the crashed container's after a restart."""
+    return pod_log_reader.read(namespace, pod_name, container)
 
 def patch_deployment(namespace: str, deployment_name: str, patch: dict) -> bool:
     try:
-        apps_v1.patch_namespaced_deployment(name=deployment_name, namespace=namespace, body=patch)
+        with K8S_API_SECONDS.labels(verb="patch").time():
+            apps_v1.patch_namespaced_deployment(name=deployment_name, namespace=namespace, body=patch)
         return True
     except ApiException as e:
         logging.error(f"[MCP] Error patching deployment {deployment_name}: {e}")
@@ -129,14 +351,15 @@ def restart_deployment(namespace: str, deployment_name: str) -> bool:
 
 def find_target_pod(namespace: str, deployment_name: str) -> str:
     try:
-        pods = core_v1.list_namespaced_pod(
-            namespace=namespace,
-            label_selector=f'app={deployment_name}'
-        )
-        for pod in pods.items:
-            if pod.status.phase == "Running":
-                return pod.metadata.name
-        return pods.items[0].metadata.name if pods.items else ""
+        if _watched(pod_informer, namespace):
+            pods = pod_informer.list(namespace, {"app": deployment_name})
+        else:
+            with K8S_API_SECONDS.labels(verb="list").time():
+                pods = core_v1.list_namespaced_pod(namespace=namespace, label_selector=f'app={deployment_name}').items
+        # Pods on their way out of a rollout are only picked when nothing else is left
+        pods.sort(key=lambda pod: (not is_pod_ready(pod), pod.status.phase != "Running",
+                                   pod.metadata.deletion_timestamp is not None))
+        return pods[0].metadata.name if pods else ""
     except Exception as e:
         logging.error(f"[MCP] Error finding pod for deployment {deployment_name}: {e}")
         return ""
@@ -144,16 +367,23 @@ def find_target_pod(namespace: str, deployment_name: str) -> str:
 MAX_RETRIES = 3
 RETRY_DELAY = 3
 
-def exec_command_in_pod(namespace: str, pod_name: str, command: str):
-    try:
-        pod = core_v1.read_namespaced_pod(name=pod_name, namespace=namespace)
-        containers = [c.name for c in pod.spec.containers]
-        container_name = containers[0]
-        print(f"[MCP] Detected containers in pod: {containers}")
+# Longest a batched exec session may run before it is cut off
+EXEC_TIMEOUT_SECONDS = int(os.getenv("EXEC_TIMEOUT_SECONDS", "600"))
+
+def _exec_container(namespace: str, pod_name: str) -> str:
+    pod = _get_pod(namespace, pod_name)
+    if pod is None:
+        raise RuntimeError(f"pod {pod_name} not found")
+    containers = [c.name for c in pod.spec.containers]
+    print(f"[MCP] Detected containers in pod: {containers}")
 
-        # Add container readiness wait
-        wait_for_container_ready(namespace, pod_name, container_name)
+    # Add container readiness wait
+    wait_for_container_ready(namespace, pod_name, containers[0])
+    return containers[0]
 
+def exec_command_in_pod(namespace: str, pod_name: str, command: str):
+    try:
+        container_name = _exec_container(namespace, pod_name)
     except Exception as e:
         logging.error(f"[MCP] Failed to retrieve pod/container info: {e}")
         return {
@@ -166,17 +396,18 @@ def exec_command_in_pod(namespace: str, pod_name: str, command: str):
     for attempt in range(1, MAX_RETRIES + 1):
         try:
             print(f"[MCP] Attempt {attempt}: executing `{command}` in pod `{pod_name}` (container={container_name})")
-            resp = stream(
-                core_v1.connect_get_namespaced_pod_exec,
-                name=pod_name,
-                namespace=namespace,
-                container=container_name,
-                command=exec_command,
-                stderr=True,
-                stdin=False,
-                stdout=True,
-                tty=False,
-            )
+            with K8S_API_SECONDS.labels(verb="exec").time():
+                resp = exec_stream(
+                    core_v1.connect_get_namespaced_pod_exec,
+                    name=pod_name,
+                    namespace=namespace,
+                    container=container_name,
+                    command=exec_command,
+                    stderr=True,
+                    stdin=False,
+                    stdout=True,
+                    tty=False,
+                )
             print(f"[MCP] Exec success: {command}")
             return {
                 "success": True,
@@ -199,3 +430,131 @@ def exec_command_in_pod(namespace: str, pod_name: str, command: str):
                 "output": f"Unexpected error during exec: {e}"
             }
 
+def _batch_script(commands: list, token: str) -> str:
+    """
+    One shell script running `commands` in order, each in its own `sh -c` as
+    before, with its output framed by markers carrying its exit code. Every
+    command runs whatever the previous ones exited with.
+    """
+    lines = ["exec 2>&1"]
+    for i, command in enumerate(commands):
+        lines += [
+            f"printf '\\n{token} begin {i}\\n'",
+            f"/bin/sh -c {shlex.quote(command)}",
+            "rc=$?",
+            f"printf '\\n{token} end {i} %d\\n' \"$rc\"",
+        ]
+    return "\n".join(lines)
+
+def _split_batch_output(output: str, commands: list, token: str) -> list:
+    """Per-command results from a batch's framed output; an unfinished command has exit_code None."""
+    results = []
+    for i, command in enumerate(commands):
+        begin = re.search(rf"\n{token} begin {i}\n", output)
+        if begin is None:
+            break
+        end = re.compile(rf"\n{token} end {i} (-?\d+)\n").search(output, begin.end())
+        body = output[begin.end():end.start() if end else len(output)]
+        exit_code = int(end.group(1)) if end else None
+        results.append({"command": command, "exit_code": exit_code, "output": body, "success": exit_code == 0})
+    return results
+
+def _read_session(resp, token: str):
+    """
+    Output of an exec session as it streams in (up to EXEC_TIMEOUT_SECONDS),
+    plus how long each command took, timed by when its end marker arrived.
+    """
+    end_marker = re.compile(rf"\n{token} end \d+ -?\d+\n")
+    output, durations = "\n", []
+    searched = 0
+    last_end = time.monotonic()
+    deadline = last_end + EXEC_TIMEOUT_SECONDS
+    while resp.is_open() and time.monotonic() < deadline:
+        resp.update(timeout=min(1, max(0, deadline - time.monotonic())))
+        if resp.peek_stdout():
+            output += resp.read_stdout()
+        if resp.peek_stderr():
+            output += resp.read_stderr()
+        for m in end_marker.finditer(output, searched):
+            now = time.monotonic()
+            durations.append(now - last_end)
+            last_end = now
+            searched = m.end()
+    return output + resp.read_stdout(timeout=0) + resp.read_stderr(timeout=0), durations
+
+def exec_commands_in_pod(namespace: str, pod_name: str, commands: list):
+    """
+    Run `commands` one after another in a single exec session. Returns one
+    result (command, exit_code, output, success) per command that ran and
+    the overall success, which as with exec_command_in_pod only says the
+    exec itself worked: every command ran to completion, whatever its exit
+    code.
+    """
+    try:
+        container_name = _exec_container(namespace, pod_name)
+    except Exception as e:
+        logging.error(f"[MCP] Failed to retrieve pod/container info: {e}")
+        return {"success": False, "results": [], "output": f"Error retrieving pod/container info: {e}"}
+
+    token = f"__mcp_{uuid.uuid4().hex}__"
+    exec_command = ["/bin/sh", "-c", _batch_script(commands, token)]
+
+    # Only opening the session is retried; once it is open the commands may already have run
+    for attempt in range(1, MAX_RETRIES + 1):
+        try:
+            print(f"[MCP] Attempt {attempt}: executing {len(commands)} commands in pod `{pod_name}` (container={container_name})")
+            with K8S_API_SECONDS.labels(verb="exec").time():
+                resp = exec_stream(
+                    core_v1.connect_get_namespaced_pod_exec,
+                    name=pod_name,
+                    namespace=namespace,
+                    container=container_name,
+                    command=exec_command,
+                    stderr=True,
+                    stdin=False,
+                    stdout=True,
+                    tty=False,
+                    _preload_content=False,
+                )
+            break
+        except ApiException as e:
+            print(f"[MCP] Exec attempt {attempt} failed: {e}")
+            if attempt == MAX_RETRIES:
+                return {"success": False, "results": [], "output": f"Exec failed after {MAX_RETRIES} attempts: {e}"}
+            time.sleep(RETRY_DELAY)
+        except Exception as e:
+            print(f"[MCP] Unexpected error: {e}")
+            return {"success": False, "results": [], "output": f"Unexpected error during exec: {e}"}
+
+    try:
+        output, durations = _read_session(resp, token)
+    except Exception as e:
+        print(f"[MCP] Exec session error: {e}")
+        output, durations = "", []
+    finally:
+        resp.close()
+
+    results = _split_batch_output(output, commands, token)
+    success = len(results) == len(commands) and all(r["exit_code"] is not None for r in results)
+    for r, seconds in zip(results, durations):
+        r["seconds"] = round(seconds, 3)
+        EXEC_COMMAND_SECONDS.labels(result="success" if r["success"] else "failure").observe(seconds)
+    for r in results:
+        print(f"[MCP] `{r['command']}` exited with {r['exit_code']}")
+    return {
+        "success": success,
+        "results": results,
+        "output": "\n\n".join(f"$ {r['command']}\n{r['output']}" for r in results)
+    }
+
+
+if K8S_BACKEND == "fake":
+    from fake_k8s import FakeCluster
+    fake_cluster = FakeCluster()
+    use_clients(fake_cluster.core_v1, fake_cluster.apps_v1, fake_cluster.watch, fake_cluster.stream)
+else:
+    try:
+        config.load_incluster_config()
+    except Exception:
+        config.load_kube_config()
+    use_clients(client.CoreV1Api(), client.AppsV1Api())
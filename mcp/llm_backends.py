@@ -0,0 +1,303 @@
+import asyncio
+import concurrent.futures
+import logging
+import os
+import random
+import threading
+import time
+
+from metrics import LLM_CALL_SECONDS, LLM_RETRIES, LLM_HEDGES, LLM_BREAKER_OPEN
+
+# Backends tried in this order, comma separated: gemini, ollama, fake
+LLM_BACKEND = os.getenv("LLM_BACKEND", "gemini")
+GEMINI_MODEL = os.getenv("GEMINI_MODEL", "gemini-2.0-flash-001")
+OLLAMA_URL = os.getenv("OLLAMA_URL", "http://ollama:11434")
+OLLAMA_MODEL = os.getenv("OLLAMA_MODEL", "mistral")
+OLLAMA_MAX_CONNECTIONS = int(os.getenv("OLLAMA_MAX_CONNECTIONS", "8"))
+# Deadline of one LLM call
+LLM_TIMEOUT_SECONDS = float(os.getenv("LLM_TIMEOUT_SECONDS", "20"))
+LLM_MAX_ATTEMPTS = int(os.getenv("LLM_MAX_ATTEMPTS", "3"))
+# Retries wait a random time up to min(LLM_BACKOFF_MAX, LLM_BACKOFF_BASE * 2^attempt)
+LLM_BACKOFF_BASE = float(os.getenv("LLM_BACKOFF_BASE", "1"))
+LLM_BACKOFF_MAX = float(os.getenv("LLM_BACKOFF_MAX", "10"))
+# A second request is sent if the first hasn't answered after this long (0 = never)
+LLM_HEDGE_AFTER_SECONDS = float(os.getenv("LLM_HEDGE_AFTER_SECONDS", "5"))
+# A backend is skipped for LLM_BREAKER_RESET_SECONDS after this many failed or slow calls in a row
+LLM_BREAKER_FAILURES = int(os.getenv("LLM_BREAKER_FAILURES", "3"))
+LLM_BREAKER_RESET_SECONDS = float(os.getenv("LLM_BREAKER_RESET_SECONDS", "30"))
+LLM_SLOW_CALL_SECONDS = float(os.getenv("LLM_SLOW_CALL_SECONDS", "10"))
+
+GENERATION_CONFIG = {"temperature": 0.3, "max_output_tokens": 512}
+
+
+class LLMUnavailable(Exception):
+    """No backend could produce a usable answer."""
+
+
+class GeminiBackend:
+    """Gemini on Vertex AI, through the SDK's async client."""
+
+    def __init__(self, model: str = GEMINI_MODEL):
+        from vertexai.generative_models import GenerativeModel
+        from google.cloud import aiplatform
+        aiplatform.init(project="ai-detector-pipeline", location="us-central1")
+        self.name = f"gemini:{model}"
+        self.model = GenerativeModel(model)
+
+    async def generate(self, prompt: str) -> str:
+        response = await self.model.generate_content_async(prompt, generation_config=GENERATION_CONFIG)
+        return response.text
+
+    async def aclose(self):
+        pass
+
+
+class OllamaBackend:
+    """Ollama's /api/generate over a pooled keep-alive HTTP connection (see mcp/ollama/)."""
+
+    def __init__(self, url: str = OLLAMA_URL, model: str = OLLAMA_MODEL, max_connections: int = OLLAMA_MAX_CONNECTIONS):
+        self.name = f"ollama:{model}"
+        self.url = url.rstrip("/")
+        self.model = model
+        self.max_connections = max_connections
+        self._client = None
+
+    async def generate(self, prompt: str) -> str:
+        if self._client is None:
+            # Created on first use so it belongs to the client's event loop
+            import httpx
+            self._client = httpx.AsyncClient(
+                base_url=self.url,
+                timeout=httpx.Timeout(LLM_TIMEOUT_SECONDS, connect=5),
+                limits=httpx.Limits(max_connections=self.max_connections,
+                                    max_keepalive_connections=self.max_connections),
+            )
+        response = await self._client.post("/api/generate", json={
+            "model": self.model,
+            "prompt": prompt,
+            "stream": False,
+            "format": "json",
+            "options": {"temperature": GENERATION_CONFIG["temperature"],
+                        "num_predict": GENERATION_CONFIG["max_output_tokens"]},
+        })
+        response.raise_for_status()
+        return response.json()["response"]
+
+    async def aclose(self):
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+
+class SyncModelBackend:
+    """Any object with a blocking `generate_content(prompt, generation_config)`, e.g. the FakeLLM."""
+
+    def __init__(self, model, name: str):
+        self.name = name
+        self.model = model
+
+    async def generate(self, prompt: str) -> str:
+        response = await asyncio.to_thread(self.model.generate_content, prompt, generation_config=GENERATION_CONFIG)
+        return response.text
+
+    async def aclose(self):
+        pass
+
+
+def build_backend(kind: str):
+    if kind == "gemini":
+        return GeminiBackend()
+    if kind == "ollama":
+        return OllamaBackend()
+    if kind == "fake":
+        from fake_llm import FakeLLM
+        return SyncModelBackend(FakeLLM(), "fake")
+    raise ValueError(f"Unknown LLM backend {kind!r} (expected gemini, ollama or fake)")
+
+
+class CircuitBreaker:
+    """
+    Opens after `failures` failed or slow calls in a row; while open the
+    backend is skipped. After `reset_seconds` one trial call is let through
+    and its outcome closes or re-opens the breaker; a cancelled trial frees
+    the slot for the next call.
+    """
+
+    def __init__(self, name: str, failures: int = LLM_BREAKER_FAILURES, reset_seconds: float = LLM_BREAKER_RESET_SECONDS,
+                 slow_seconds: float = LLM_SLOW_CALL_SECONDS):
+        self.name = name
+        self.failures = failures
+        self.reset_seconds = reset_seconds
+        self.slow_seconds = slow_seconds
+        self._failed = 0
+        self._opened_at = None
+        self._trial = False
+
+    def allow(self) -> bool:
+        """Whether a call may be sent now; call it only when sending one, it may take the trial slot."""
+        if self._opened_at is None:
+            return True
+        if not self._trial and time.monotonic() - self._opened_at >= self.reset_seconds:
+            self._trial = True
+            return True
+        return False
+
+    def cancelled(self):
+        """A call let through was cancelled before it had an outcome; a trial may be sent again."""
+        self._trial = False
+
+    def record(self, ok: bool, seconds: float):
+        if ok and seconds <= self.slow_seconds:
+            self._failed, self._opened_at, self._trial = 0, None, False
+            LLM_BREAKER_OPEN.labels(backend=self.name).set(0)
+            return
+        self._failed += 1
+        if self._trial or self._failed >= self.failures:
+            if self._opened_at is None or self._trial:
+                logging.warning(f"[LLM] Circuit open for {self.name} after {self._failed} failed or slow calls")
+            self._opened_at, self._trial = time.monotonic(), False
+            LLM_BREAKER_OPEN.labels(backend=self.name).set(1)
+
+
+class LLMClient:
+    """
+    Sends prompts to the first healthy backend and retries with jittered
+    exponential backoff, starting each retry at the healthy backend after
+    the one that just failed.
+
+    Every call has a deadline. A call still running after `hedge_after`
+    seconds is raced against a second one, sent to the next healthy backend
+    or the same one if there is no other, and the first answer wins. Each
+    backend has a circuit breaker, so a failing or slow backend is skipped
+    in favour of the next. With every breaker open, calls fail at once and
+    only the rulebook heals.
+
+    Runs on its own event loop thread: `complete()` can be called from any
+    worker thread and the backends' connections are shared between heals.
+    `close()` stops that thread and closes the connections.
+    """
+
+    def __init__(self, backends: list, timeout: float = LLM_TIMEOUT_SECONDS, max_attempts: int = LLM_MAX_ATTEMPTS,
+                 hedge_after: float = LLM_HEDGE_AFTER_SECONDS):
+        self.backends = backends
+        self.breakers = {backend.name: CircuitBreaker(backend.name) for backend in backends}
+        self.timeout = timeout
+        self.max_attempts = max_attempts
+        self.hedge_after = hedge_after
+        self._loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self._loop.run_forever, name="llm-client", daemon=True)
+        self._thread.start()
+
+    @property
+    def name(self) -> str:
+        return ",".join(backend.name for backend in self.backends)
+
+    def complete(self, prompt: str, parse):
+        """
+        `parse(text)` of the first answer it accepts (raising ValueError
+        rejects an answer and retries), plus the answering backend's name.
+        Raises LLMUnavailable when every attempt failed.
+        """
+        if self._loop.is_closed():
+            raise LLMUnavailable("LLM client is closed")
+        future = asyncio.run_coroutine_threadsafe(self._complete(prompt, parse), self._loop)
+        try:
+            return future.result()
+        except concurrent.futures.CancelledError:
+            raise LLMUnavailable("LLM client was closed during the call") from None
+
+    def close(self, timeout: float = 5):
+        """Cancels running calls, closes the backends' connections and stops the event loop thread."""
+        if self._loop.is_closed():
+            return
+
+        async def shutdown():
+            calls = [task for task in asyncio.all_tasks() if task is not asyncio.current_task()]
+            for task in calls:
+                task.cancel()
+            await asyncio.gather(*calls, return_exceptions=True)
+            await asyncio.gather(*(backend.aclose() for backend in self.backends), return_exceptions=True)
+
+        try:
+            asyncio.run_coroutine_threadsafe(shutdown(), self._loop).result(timeout)
+        except Exception as e:
+            logging.warning(f"[LLM] Error closing LLM client {self.name}: {e}")
+        finally:
+            self._loop.call_soon_threadsafe(self._loop.stop)
+            self._thread.join(timeout)
+            if not self._thread.is_alive():
+                self._loop.close()
+
+    async def _complete(self, prompt: str, parse):
+        error = None
+        start = 0
+        for attempt in range(self.max_attempts):
+            if attempt:
+                LLM_RETRIES.inc()
+                await asyncio.sleep(random.uniform(0, min(LLM_BACKOFF_MAX, LLM_BACKOFF_BASE * 2 ** attempt)))
+            ordered = self.backends[start:] + self.backends[:start]
+            primary = self._dispatchable(ordered)
+            if primary is None:
+                raise LLMUnavailable("every LLM backend is failing (circuit open)")
+            try:
+                text, name = await self._hedged(prompt, primary, ordered)
+                return parse(text), name
+            except Exception as e:
+                error = e
+                logging.warning(f"[LLM] Attempt {attempt + 1} failed: {e}")
+                # Fail over: the next attempt goes first to the backend after this one
+                start = (self.backends.index(primary) + 1) % len(self.backends)
+        raise LLMUnavailable(f"no usable answer after {self.max_attempts} attempts: {error}")
+
+    def _dispatchable(self, backends: list):
+        """The first of `backends` its breaker lets a call through to, asked only until one does."""
+        return next((backend for backend in backends if self.breakers[backend.name].allow()), None)
+
+    async def _call(self, backend, prompt: str):
+        started = time.monotonic()
+        try:
+            try:
+                text = await asyncio.wait_for(backend.generate(prompt), self.timeout)
+            except asyncio.TimeoutError:
+                raise TimeoutError(f"{backend.name} did not answer within {self.timeout}s") from None
+        except BaseException as e:
+            seconds = time.monotonic() - started
+            # A hedge that lost the race says nothing about the backend's health
+            if isinstance(e, asyncio.CancelledError):
+                self.breakers[backend.name].cancelled()
+            else:
+                self.breakers[backend.name].record(False, seconds)
+                LLM_CALL_SECONDS.labels(backend=backend.name, result="error").observe(seconds)
+            raise
+        seconds = time.monotonic() - started
+        self.breakers[backend.name].record(True, seconds)
+        LLM_CALL_SECONDS.labels(backend=backend.name, result="ok").observe(seconds)
+        return text, backend.name
+
+    async def _hedged(self, prompt: str, primary_backend, backends: list):
+        primary = asyncio.ensure_future(self._call(primary_backend, prompt))
+        if self.hedge_after <= 0:
+            return await primary
+        done, _ = await asyncio.wait({primary}, timeout=self.hedge_after)
+        if done:
+            return primary.result()
+
+        # The next backend that takes a call, or the same one if there is no other
+        after = backends.index(primary_backend) + 1
+        hedge_backend = self._dispatchable(backends[after:] + backends[:after])
+        if hedge_backend is None:
+            return await primary
+        hedge = asyncio.ensure_future(self._call(hedge_backend, prompt))
+        pending = {primary, hedge}
+        try:
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        LLM_HEDGES.labels(winner="hedge" if task is hedge else "primary").inc()
+                        return task.result()
+            # Both failed; report the first request's error
+            return primary.result()
+        finally:
+            for task in pending:
+                task.cancel()
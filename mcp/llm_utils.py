@@ -43,14 +43,23 @@
 #         }
 # llm_utils.py
 
+import hashlib
 import json
-import time
-from vertexai.generative_models import GenerativeModel
-from google.cloud import aiplatform
-
-# Initialize Vertex AI
-aiplatform.init(project="ai-detector-pipeline", location="us-central1")
-model = GenerativeModel("gemini-2.0-flash-001")
+from decision_cache import DecisionCache
+from signatures import error_signature
+from log_reader import ErrorExtractor
+from llm_backends import LLM_BACKEND, LLMClient, LLMUnavailable, SyncModelBackend, build_backend
+
+def use_backends(backends: list):
+    """Send healing prompts to `backends`, in order of preference, closing the previous ones."""
+    global llm_client
+    previous, llm_client = llm_client, LLMClient(backends)
+    decision_cache.set_version(_decision_version(llm_client))
+    previous.close()
+
+def use_model(llm):
+    """Send healing prompts to `llm`, anything with `generate_content(prompt, generation_config)`."""
+    use_backends([SyncModelBackend(llm, type(llm).__name__)])
 
 PROMPT_TEMPLATE = """You are a Kubernetes pod self-healing assistant.
 
@@ -70,83 +79,90 @@ You will receive container logs that include a traceback or runtime error. Your
 - Do NOT include commands like `apt`, `yum`, `rm -rf`, `shutdown`, or multi-line shell logic
 """
 
+def _decision_version(client: LLMClient) -> str:
+    # Decisions are only reused for the models and prompt that produced them
+    return hashlib.sha256((client.name + PROMPT_TEMPLATE).encode("utf-8")).hexdigest()[:12]
+
+llm_client = LLMClient([build_backend(kind.strip()) for kind in LLM_BACKEND.split(",") if kind.strip()])
+decision_cache = DecisionCache(version=_decision_version(llm_client))
+
 def extract_key_errors(logs: str, max_chars=500) -> str:
     """
     Extracts crash-related lines from logs and returns last `max_chars` characters.
     """
-    lines = logs.strip().splitlines()
-    error_lines = []
-    keywords = ["Traceback", "ModuleNotFoundError", "ImportError", "FileNotFoundError", "PermissionError", "RuntimeError", "NameError"]
-    exclude = ["FutureWarning", "DeprecationWarning"]
-
-    for line in reversed(lines):
-        if any(x in line for x in keywords) and not any(y in line for y in exclude):
-            error_lines.insert(0, line)
-
-    extracted = "\n".join(error_lines)
-    return extracted[-max_chars:] if extracted else "\n".join(lines[-10:])[-max_chars:]
+    extractor = ErrorExtractor(max_error_chars=max_chars)
+    for line in logs.strip().splitlines():
+        extractor.feed(line)
+    return extractor.errors()
 
 def infer_healing_commands(logs: str) -> dict:
+    """
+    Healing commands for the errors in `logs`. Validated answers are cached by
+    error signature, so a known failure skips the LLM; the result carries the
+    `signature` (and `cached`) so a failed heal can invalidate its entry.
+    """
     prompt_logs = extract_key_errors(logs)
-    prompt = PROMPT_TEMPLATE.format(logs=prompt_logs)
-
-    for attempt in range(3):
-        try:
-            response = model.generate_content(
-                prompt,
-                generation_config={
-                    "temperature": 0.3,
-                    "max_output_tokens": 512
-                }
-            )
-
-            output = response.text.strip()
-            print(f"[MCP] Gemini raw response:\n{output}")
-
-            # Extract JSON block
-            json_start = output.find("{")
-            json_end = output.rfind("}") + 1
-            if json_start == -1 or json_end == -1:
-                raise ValueError("No valid JSON block found.")
-
-            healing = json.loads(output[json_start:json_end])
-
-            # Validate and filter commands
-            if not isinstance(healing, dict):
-                raise ValueError("Expected a JSON object")
-
-            if "commands" not in healing or not isinstance(healing["commands"], list):
-                raise ValueError("Missing or invalid 'commands' key")
-
-            if "description" not in healing:
-                healing["description"] = "Auto-generated healing commands."
-
-            blacklist = [
-                "rm -rf", "shutdown", "reboot", "apt", "yum", "apk", "uninstall",
-                "input(", "&& read", "curl | sh", "wget | sh"
-            ]
-
-            filtered = [
-                cmd for cmd in healing["commands"]
-                if not any(bad in cmd for bad in blacklist)
-                and "\n" not in cmd
-                and ";" not in cmd
-            ]
-
-            if not filtered:
-                raise ValueError("All commands were filtered out")
-
-            healing["commands"] = filtered
-            return healing
-
-        except Exception as e:
-            print(f"[MCP] Gemini error (attempt {attempt + 1}): {e}")
-            time.sleep(2)
-
-    return {
-        "commands": [],
-        "description": "Gemini failure: Unable to infer valid healing commands."
-    }
-
+    # Wider extract than the prompt's, so the normalized tail that is hashed is never cut mid-line
+    signature = error_signature(extract_key_errors(logs, max_chars=2000))
+    cached = decision_cache.get(signature)
+    if cached is not None:
+        print(f"[MCP] Reusing cached healing decision for error signature {signature}")
+        return {**cached, "signature": signature, "cached": True}
 
+    prompt = PROMPT_TEMPLATE.format(logs=prompt_logs)
 
+    try:
+        healing, backend = llm_client.complete(prompt, parse_healing_commands)
+    except LLMUnavailable as e:
+        print(f"[MCP] LLM error: {e}")
+        return {
+            "commands": [],
+            "description": "LLM failure: Unable to infer valid healing commands.",
+            "signature": signature,
+            "cached": False
+        }
+
+    print(f"[MCP] Healing commands from {backend}: {healing['commands']}")
+    decision_cache.set(signature, healing)
+    return {**healing, "signature": signature, "cached": False}
+
+def parse_healing_commands(output: str) -> dict:
+    """The LLM's answer as a validated healing dict; ValueError if unusable."""
+    output = output.strip()
+    print(f"[MCP] LLM raw response:\n{output}")
+
+    # Extract JSON block
+    json_start = output.find("{")
+    json_end = output.rfind("}") + 1
+    if json_start == -1 or json_end == 0:
+        raise ValueError("No valid JSON block found.")
+
+    healing = json.loads(output[json_start:json_end])
+
+    # Validate and filter commands
+    if not isinstance(healing, dict):
+        raise ValueError("Expected a JSON object")
+
+    if "commands" not in healing or not isinstance(healing["commands"], list):
+        raise ValueError("Missing or invalid 'commands' key")
+
+    if "description" not in healing:
+        healing["description"] = "Auto-generated healing commands."
+
+    blacklist = [
+        "rm -rf", "shutdown", "reboot", "apt", "yum", "apk", "uninstall",
+        "input(", "&& read", "curl | sh", "wget | sh"
+    ]
+
+    filtered = [
+        cmd for cmd in healing["commands"]
+        if not any(bad in cmd for bad in blacklist)
+        and "\n" not in cmd
+        and ";" not in cmd
+    ]
+
+    if not filtered:
+        raise ValueError("All commands were filtered out")
+
+    healing["commands"] = filtered
+    return healing
@@ -0,0 +1,170 @@
+import codecs
+import logging
+import math
+import os
+import re
+import threading
+from collections import OrderedDict, deque
+from datetime import datetime, timezone
+
+from kubernetes.client.rest import ApiException
+
+from metrics import K8S_API_SECONDS, LOG_FETCH_BYTES
+
+# Lines of each pod's log kept for healing (the logs a heal sees)
+LOG_TAIL_LINES = int(os.getenv("LOG_TAIL_LINES", "100"))
+# Cap on the bytes pulled by one log request, whatever the lines look like
+LOG_LIMIT_BYTES = int(os.getenv("LOG_LIMIT_BYTES", str(1024 * 1024)))
+# Pods whose read position and tail are remembered (least recently read are dropped)
+LOG_READER_MAX_PODS = int(os.getenv("LOG_READER_MAX_PODS", "512"))
+# Slack for clock skew between the MCP server and the nodes when asking for recent lines
+SINCE_MARGIN_SECONDS = 5
+
+KEY_ERRORS = re.compile(r"Traceback|ModuleNotFoundError|ImportError|FileNotFoundError|PermissionError|RuntimeError|NameError")
+EXCLUDED = re.compile(r"FutureWarning|DeprecationWarning")
+FALLBACK_LINES = 10
+
+
+class ErrorExtractor:
+    """
+    Single pass over log lines, in bounded memory.
+
+    Keeps the last `tail_lines` lines and just enough of the latest crash
+    lines to fill `max_error_chars`; `errors()` is the condensed error block
+    (or the last lines when nothing looks like a crash).
+    """
+
+    def __init__(self, tail_lines: int = LOG_TAIL_LINES, max_error_chars: int = 2000):
+        self.max_error_chars = max_error_chars
+        self.tail = deque(maxlen=max(tail_lines, FALLBACK_LINES))
+        self._errors = deque()
+        self._error_chars = 0
+
+    def feed(self, line: str):
+        self.tail.append(line)
+        if KEY_ERRORS.search(line) and not EXCLUDED.search(line):
+            # _error_chars is the length of the joined block
+            self._error_chars += len(line) + (1 if self._errors else 0)
+            self._errors.append(line)
+            # Drop the oldest crash lines once the rest still fill the budget
+            while self._error_chars - len(self._errors[0]) - 1 >= self.max_error_chars:
+                self._error_chars -= len(self._errors.popleft()) + 1
+
+    def errors(self, max_chars: int = None) -> str:
+        max_chars = max_chars or self.max_error_chars
+        if self._errors:
+            return "\n".join(self._errors)[-max_chars:]
+        return "\n".join(list(self.tail)[-FALLBACK_LINES:])[-max_chars:]
+
+
+def _parse_timestamp(ts: str):
+    """Sortable (seconds, nanoseconds) from an RFC 3339 log timestamp, or None."""
+    try:
+        seconds, _, rest = ts.rstrip("Z").partition(".")
+        return datetime.fromisoformat(seconds).replace(tzinfo=timezone.utc), int(rest.ljust(9, "0")[:9] or 0)
+    except ValueError:
+        return None
+
+
+class _PodLog:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.tail = deque(maxlen=LOG_TAIL_LINES)
+        self.last_seen = None  # (datetime, ns) of the newest line read
+        self.restarts_read = 0
+
+
+class PodLogReader:
+    """
+    Reads pod logs incrementally: the first read takes the last
+    LOG_TAIL_LINES lines, later reads only ask for lines written since the
+    newest one already seen. When the container has restarted since the
+    last read (a crashloop), the previous container's logs are read first,
+    since they hold the crash. Responses are consumed as a stream, so memory
+    per read stays bounded by the tail however chatty the pod is.
+    """
+
+    def __init__(self, core_v1, get_pod=None, max_pods: int = LOG_READER_MAX_PODS):
+        self.core_v1 = core_v1
+        self.get_pod = get_pod
+        self.max_pods = max_pods
+        self._pods = OrderedDict()  # (namespace, pod, container) -> _PodLog
+        self._lock = threading.Lock()
+
+    def _state(self, key) -> _PodLog:
+        with self._lock:
+            state = self._pods.get(key)
+            if state is None:
+                state = self._pods[key] = _PodLog()
+                while len(self._pods) > self.max_pods:
+                    self._pods.popitem(last=False)
+            self._pods.move_to_end(key)
+            return state
+
+    def _restart_count(self, namespace: str, pod_name: str, container: str) -> int:
+        pod = self.get_pod(namespace, pod_name) if self.get_pod else None
+        for status in (pod.status.container_statuses or []) if pod is not None else []:
+            if container is None or status.name == container:
+                return status.restart_count or 0
+        return 0
+
+    def read(self, namespace: str, pod_name: str, container: str = None) -> str:
+        """The pod's latest LOG_TAIL_LINES log lines, fetching only what is new."""
+        state = self._state((namespace, pod_name, container))
+        with state.lock:
+            restarts = self._restart_count(namespace, pod_name, container)
+            try:
+                if restarts > state.restarts_read:
+                    self._fetch(state, namespace, pod_name, container, previous=True)
+                self._fetch(state, namespace, pod_name, container, previous=False)
+                state.restarts_read = restarts
+            except ApiException as e:
+                logging.error(f"[MCP] Error fetching logs for pod {pod_name} in {namespace}: {e}")
+            return "\n".join(state.tail)
+
+    def _fetch(self, state: _PodLog, namespace: str, pod_name: str, container: str, previous: bool):
+        kwargs = {}
+        if state.last_seen is not None:
+            age = (datetime.now(timezone.utc) - state.last_seen[0]).total_seconds()
+            kwargs["since_seconds"] = max(1, math.ceil(age) + SINCE_MARGIN_SECONDS)
+        try:
+            with K8S_API_SECONDS.labels(verb="logs").time():
+                resp = self.core_v1.read_namespaced_pod_log(
+                    name=pod_name, namespace=namespace, container=container, previous=previous, timestamps=True,
+                    tail_lines=LOG_TAIL_LINES, limit_bytes=LOG_LIMIT_BYTES, _preload_content=False, **kwargs
+                )
+        except ApiException as e:
+            # No previous container to read (e.g. it was already garbage collected)
+            if previous and e.status in (400, 404):
+                return
+            raise
+        fetched = [0]
+        read_up_to = state.last_seen
+        try:
+            for line in _iter_lines(resp, fetched):
+                ts, _, text = line.partition(" ")
+                seen = _parse_timestamp(ts)
+                if seen is None:
+                    continue
+                # since_seconds overlaps the previous read; skip what was already taken
+                if read_up_to is not None and seen <= read_up_to:
+                    continue
+                state.last_seen = seen
+                state.tail.append(text)
+        finally:
+            resp.release_conn()
+            LOG_FETCH_BYTES.labels(container="previous" if previous else "current").observe(fetched[0])
+
+
+def _iter_lines(resp, fetched: list, chunk_size: int = 64 * 1024):
+    """Decoded lines of a streamed response; `fetched[0]` counts the bytes read."""
+    decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
+    pending = ""
+    for chunk in resp.stream(chunk_size):
+        fetched[0] += len(chunk)
+        pending += decoder.decode(chunk)
+        *lines, pending = pending.split("\n")
+        yield from lines
+    pending += decoder.decode(b"", final=True)
+    if pending:
+        yield pending
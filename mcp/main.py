@@ -1,12 +1,21 @@
-from fastapi import FastAPI, HTTPException, Request
+from fastapi import FastAPI, HTTPException, Request, Query
+from fastapi.responses import JSONResponse
 from pydantic import BaseModel
+from typing import Optional
+from concurrent.futures import ThreadPoolExecutor
+import asyncio
 import logging
-from k8s_utils import get_pod_logs
+import time
+import weakref
+from k8s_utils import get_pod_logs, start_informers
 from healing import analyze_logs_and_heal
+from dedup import HealDeduplicator
+from history import healing_history, MAX_PAGE_SIZE
+from jobs import JobQueue, QueueFull
+from metrics import HEALS, HEAL_SECONDS
 from prometheus_client import start_http_server, Counter
 import os
 import json
-from datetime import datetime
 import sys
 
 logging.basicConfig(
@@ -16,29 +25,41 @@ logging.basicConfig(
 )
 
 # Prometheus metrics server
-start_http_server(8001)
-healing_actions_counter = Counter('mcp_healing_actions_total', 'Total number of healing actions performed')
-
-LOG_DIR = "/app/healing_logs"
-os.makedirs(LOG_DIR, exist_ok=True)
-LOG_FILE = os.path.join(LOG_DIR, "heal_log.jsonl")
+METRICS_PORT = int(os.getenv("METRICS_PORT", "8001"))
+start_http_server(METRICS_PORT)
+healing_actions_counter = Counter('mcp_healing_actions_total', 'Total number of successful healing actions')
+# action_taken values reported as is; any other action is a list of commands
+HEAL_OUTCOMES = ("none", "restart_failed", "new_pod_not_ready")
+
+# Heals running at once; each one blocks a thread on Kubernetes/LLM calls
+HEAL_CONCURRENCY = int(os.getenv("HEAL_CONCURRENCY", "4"))
+heal_slots = asyncio.Semaphore(HEAL_CONCURRENCY)
+# One heal at a time per (namespace, deployment); a lock is dropped once no heal holds or awaits it
+deployment_locks = weakref.WeakValueDictionary()
+# Every heal, from /mcp/heal or the webhook, runs as a job on this queue
+jobs = JobQueue()
+# Retry-After sent with a 429/503 when the job queue is full
+QUEUE_FULL_RETRY_AFTER = "10"
+# Coalesces duplicate alerts and enforces HEAL_COOLDOWN_SECONDS between identical heals
+dedup = HealDeduplicator()
+
+def deployment_lock(namespace: str, deployment: str) -> asyncio.Lock:
+    lock = deployment_locks.get((namespace, deployment))
+    if lock is None:
+        lock = deployment_locks[(namespace, deployment)] = asyncio.Lock()
+    return lock
 
 def perform_healing():
     healing_actions_counter.inc()
 
-def log_healing_event(namespace, deployment_name, pod_name, logs, result):
-    log_entry = {
-        "timestamp": datetime.utcnow().isoformat(),
-        "namespace": namespace,
-        "deployment_name": deployment_name,
-        "pod_name": pod_name,
-        "logs": logs,
-        "healing_action": result.get("action_taken"),
-        "message": result.get("message"),
-        "success": result.get("success")
-    }
-    with open(LOG_FILE, "a") as f:
-        f.write(json.dumps(log_entry) + "\n")
+def heal_outcome(result) -> str:
+    if result is None:
+        return "no_logs"
+    action = result.get("action_taken")
+    if action in HEAL_OUTCOMES:
+        return action
+    kind = "restart" if action == "restart" else "commands"
+    return kind if result.get("success") else f"{kind}_failed"
 
 app = FastAPI(title="Model-Centric Pipeline (MCP) Server")
 
@@ -53,22 +74,136 @@ class HealResponse(BaseModel):
     action_taken: str = None
     message: str = None
 
+@app.on_event("startup")
+async def size_thread_pool():
+    # Blocking heal steps run via asyncio.to_thread; make sure the pool never caps HEAL_CONCURRENCY
+    asyncio.get_running_loop().set_default_executor(
+        ThreadPoolExecutor(max_workers=HEAL_CONCURRENCY + 4, thread_name_prefix="heal")
+    )
+
+@app.on_event("startup")
+async def start_jobs():
+    jobs.start()
+
+@app.on_event("shutdown")
+async def stop_jobs():
+    await jobs.stop()
+
+@app.on_event("startup")
+async def warm_caches():
+    # Pod/deployment lookups during heals are served from watch-driven caches
+    start_informers()
+
+async def _heal(namespace: str, deployment: str, pod_name: str, logs: str = None, fallback_logs: str = ""):
+    """
+    Heal one deployment without blocking the event loop.
+
+    Waits for the deployment's lock first and a concurrency slot second, so
+    alerts queued behind a busy deployment don't hold slots other
+    deployments could use. Returns None if no logs could be found.
+    """
+    async with deployment_lock(namespace, deployment):
+        async with heal_slots:
+            started, outcome, result = time.monotonic(), "error", None
+            try:
+                pod_logs = logs or await asyncio.to_thread(get_pod_logs, namespace, pod_name) or fallback_logs
+                if pod_logs:
+                    # Records itself in the healing history
+                    result = await asyncio.to_thread(analyze_logs_and_heal, namespace, deployment, pod_logs)
+                outcome = heal_outcome(result)
+            finally:
+                HEAL_SECONDS.labels(outcome=outcome).observe(time.monotonic() - started)
+                HEALS.labels(namespace=namespace, deployment=deployment, outcome=outcome).inc()
+            if result is not None and result.get("success"):
+                perform_healing()
+            return result
+
+def _alert_target(alert: dict):
+    """(namespace, deployment, pod, description, fingerprint) for a firing alert, or None if it can't be healed."""
+    if alert.get("status") != "firing":
+        return None
+
+    labels = alert.get("labels", {})
+    annotations = alert.get("annotations", {})
+
+    namespace = labels.get("mcp_namespace") or annotations.get("mcp_namespace")
+    deployment = labels.get("mcp_deployment") or annotations.get("mcp_deployment")
+    pod_name = labels.get("mcp_pod") or annotations.get("mcp_pod")
+
+    if not all([namespace, deployment, pod_name]):
+        logging.warning(f"[AUTO] Skipping alert, missing namespace/deployment/pod: {alert}")
+        return None
+    return namespace, deployment, pod_name, annotations.get("description", ""), alert.get("fingerprint")
+
+async def _heal_alert(namespace: str, deployment: str, pod_name: str, description: str, fingerprint: str = None):
+    logging.info(f"[AUTO] Healing alert triggered for pod {pod_name} in ns {namespace}")
+
+    async def fetch_logs():
+        return await asyncio.to_thread(get_pod_logs, namespace, pod_name) or description
+
+    async def run_heal(logs):
+        return await _heal(namespace, deployment, pod_name, logs=logs)
+
+    try:
+        outcome, result = await dedup.heal(namespace, deployment, fingerprint, fetch_logs, run_heal)
+    except Exception as e:
+        logging.error(f"[AUTO] Healing {deployment} in ns {namespace} failed: {e}")
+        return None
+    if result is None:
+        logging.warning(f"[AUTO] No logs found for pod {pod_name}")
+        return None
+    return {
+        "pod": pod_name,
+        "namespace": namespace,
+        "result": result,
+        "dedup": outcome
+    }
+
+def _job_accepted(job):
+    return {"job_id": job.id, "status": job.status, "status_url": f"/mcp/jobs/{job.id}"}
+
 @app.post("/mcp/heal", response_model=HealResponse)
-async def heal(req: HealRequest):
+async def heal(req: HealRequest, wait: float = Query(0, ge=0)):
+    """
+    Queues a heal and answers 202 with its job id; poll GET /mcp/jobs/{id}.
+    With ?wait=<seconds>, answers with the heal result as before if it
+    finishes in time. Answers 429 when the queue is full.
+    """
     logging.info(f"Received heal request for pod {req.pod_name} in namespace {req.namespace}")
 
-    pod_logs = req.logs or get_pod_logs(req.namespace, req.pod_name)
-    if not pod_logs:
-        raise HTTPException(status_code=404, detail="Could not retrieve pod logs")
-
-    result = analyze_logs_and_heal(req.namespace, req.deployment_name, pod_logs)
-    perform_healing()
-    log_healing_event(req.namespace, req.deployment_name, req.pod_name, pod_logs, result)
+    async def run():
+        result = await _heal(req.namespace, req.deployment_name, req.pod_name, logs=req.logs)
+        if result is None:
+            raise LookupError("Could not retrieve pod logs")
+        return result
 
-    return HealResponse(**result)
+    try:
+        job = jobs.submit("heal", run, namespace=req.namespace, deployment=req.deployment_name, pod=req.pod_name)
+    except QueueFull as e:
+        raise HTTPException(status_code=429, detail=f"Heal queue is full ({e}); retry later",
+                            headers={"Retry-After": QUEUE_FULL_RETRY_AFTER})
+    if not wait or not await jobs.wait(job, wait):
+        return JSONResponse(status_code=202, content=_job_accepted(job))
+
+    if job.status == "failed":
+        raise HTTPException(status_code=404 if isinstance(job.exception, LookupError) else 500, detail=job.error)
+    return HealResponse(**job.result)
+
+@app.get("/mcp/jobs/{job_id}")
+async def job_status(job_id: str):
+    job = jobs.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Unknown job {job_id}")
+    return job.to_dict()
 
 @app.post("/mcp/heal/auto")
-async def auto_heal(request: Request):
+async def auto_heal(request: Request, wait: bool = False):
+    """
+    Alertmanager webhook. Each alert is queued as a heal job and the webhook
+    answers 202 right away; pass ?wait=true to get the results instead.
+    Answers 503 without queueing anything when the alerts don't all fit in
+    the queue.
+    """
     payload = await request.json()
     try:
         logging.info(f"[AUTO] Received raw payload from Alertmanager:\n{json.dumps(payload, indent=2)}")
@@ -79,40 +214,35 @@ async def auto_heal(request: Request):
     if not alerts:
         raise HTTPException(status_code=400, detail="No alerts received")
 
-    responses = []
-    for alert in alerts:
-        if alert.get("status") != "firing":
-            continue
-
-        labels = alert.get("labels", {})
-        annotations = alert.get("annotations", {})
-
-        namespace = labels.get("mcp_namespace") or annotations.get("mcp_namespace")
-        deployment = labels.get("mcp_deployment") or annotations.get("mcp_deployment")
-        pod_name = labels.get("mcp_pod") or annotations.get("mcp_pod")
-
-        if not all([namespace, deployment, pod_name]):
-            logging.warning(f"[AUTO] Skipping alert, missing namespace/deployment/pod: {alert}")
-            continue
-
-        logging.info(f"[AUTO] Healing alert triggered for pod {pod_name} in ns {namespace}")
-
-        pod_logs = get_pod_logs(namespace, pod_name) or annotations.get("description", "")
-        if not pod_logs:
-            logging.warning(f"[AUTO] No logs found for pod {pod_name}")
-            continue
-
-        result = analyze_logs_and_heal(namespace, deployment, pod_logs)
-        perform_healing()
-        log_healing_event(namespace, deployment, pod_name, pod_logs, result)
-
-        responses.append({
-            "pod": pod_name,
-            "namespace": namespace,
-            "result": result
-        })
-
-    return {"healed": responses}
+    targets = [target for target in map(_alert_target, alerts) if target]
+    # All or nothing: Alertmanager retries the whole notification on a 5xx
+    if not jobs.has_room(len(targets)):
+        raise HTTPException(status_code=503, detail="Heal queue is full; retry later",
+                            headers={"Retry-After": QUEUE_FULL_RETRY_AFTER})
+    queued = [
+        jobs.submit("alert", lambda target=target: _heal_alert(*target),
+                    namespace=target[0], deployment=target[1], pod=target[2])
+        for target in targets
+    ]
+
+    if wait:
+        await asyncio.gather(*(jobs.wait(job) for job in queued))
+        return {"healed": [job.result for job in queued if job.result]}
+
+    return JSONResponse(status_code=202, content={
+        "accepted": [{**job.details, **_job_accepted(job)} for job in queued]
+    })
+
+@app.get("/mcp/history")
+async def history(namespace: Optional[str] = None, deployment: Optional[str] = None,
+                  signature: Optional[str] = None, success: Optional[bool] = None,
+                  since: Optional[str] = None, until: Optional[str] = None, cursor: Optional[int] = None,
+                  limit: int = Query(50, ge=1, le=MAX_PAGE_SIZE), include_logs: bool = False):
+    """Healing history, newest first; follow `next_cursor` for older pages."""
+    return await asyncio.to_thread(
+        healing_history.query, namespace=namespace, deployment=deployment, signature=signature, success=success,
+        since=since, until=until, cursor=cursor, limit=limit, include_logs=include_logs
+    )
 
 @app.get("/")
 async def root():
@@ -0,0 +1,40 @@
+from prometheus_client import Counter, Gauge, Histogram
+
+# Served by start_http_server(8001) in main.py
+
+# Alert deduplication
+ALERTS_EXECUTED = Counter('mcp_alerts_executed_total', 'Alerts that ran a heal')
+ALERTS_SUPPRESSED = Counter('mcp_alerts_suppressed_total', 'Alerts answered without a new heal', ['reason'])
+
+# LLM decision cache
+LLM_CACHE_LOOKUPS = Counter('mcp_llm_cache_lookups_total', 'Healing decision cache lookups', ['result'])
+LLM_CACHE_INVALIDATIONS = Counter('mcp_llm_cache_invalidations_total', 'Cached decisions dropped after a failed heal')
+
+# Rulebook
+RULE_HITS = Counter('mcp_rule_hits_total', 'Heals decided by a rulebook rule', ['rule'])
+RULE_MISSES = Counter('mcp_rule_misses_total', 'Heals with no matching rule, sent to the LLM')
+
+# Heal job queue
+JOB_QUEUE_DEPTH = Gauge('mcp_job_queue_depth', 'Heal jobs waiting for a worker')
+JOB_WAIT_SECONDS = Histogram('mcp_job_wait_seconds', 'Time heal jobs spend queued', ['kind'],
+                             buckets=(0.01, 0.1, 0.5, 1, 5, 15, 30, 60, 120, 300))
+JOB_RUN_SECONDS = Histogram('mcp_job_run_seconds', 'Time heal jobs take once started', ['kind'],
+                            buckets=(0.1, 0.5, 1, 5, 15, 30, 60, 120, 300, 600))
+
+# Healing pipeline
+HEALS = Counter('mcp_heals_total', 'Heals by how they ended', ['namespace', 'deployment', 'outcome'])
+HEAL_SECONDS = Histogram('mcp_heal_duration_seconds', 'End-to-end heal time, log fetch included', ['outcome'],
+                         buckets=(0.5, 1, 2.5, 5, 10, 20, 30, 60, 120, 300, 600))
+LLM_CALL_SECONDS = Histogram('mcp_llm_call_seconds', 'Latency of one LLM call', ['backend', 'result'],
+                             buckets=(0.25, 0.5, 1, 2, 4, 8, 15, 30, 60))
+LLM_RETRIES = Counter('mcp_llm_retries_total', 'LLM calls retried after an error or an invalid answer')
+LLM_HEDGES = Counter('mcp_llm_hedges_total', 'Hedged LLM calls by which request answered first', ['winner'])
+LLM_BREAKER_OPEN = Gauge('mcp_llm_breaker_open', 'Whether an LLM backend is skipped by its circuit breaker', ['backend'])
+K8S_API_SECONDS = Histogram('mcp_k8s_api_seconds', 'Latency of Kubernetes API calls', ['verb'],
+                            buckets=(0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5))
+EXEC_COMMAND_SECONDS = Histogram('mcp_exec_command_seconds', 'Time a healing command ran in the pod', ['result'],
+                                 buckets=(0.1, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300))
+READINESS_WAIT_SECONDS = Histogram('mcp_readiness_wait_seconds', 'Time spent waiting for pods or rollouts',
+                                   ['wait', 'result'], buckets=(0.1, 0.5, 1, 2.5, 5, 10, 20, 30, 60, 120))
+LOG_FETCH_BYTES = Histogram('mcp_log_fetch_bytes', 'Bytes of pod logs fetched per request', ['container'],
+                            buckets=(0, 1024, 4096, 16384, 65536, 262144, 1048576))
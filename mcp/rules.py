@@ -0,0 +1,116 @@
+import json
+import logging
+import os
+import re
+
+from metrics import RULE_HITS, RULE_MISSES
+
+# Rulebook evaluated before asking the LLM (.json, or .yaml/.yml with PyYAML installed)
+RULES_PATH = os.getenv("RULES_PATH", os.path.join(os.path.dirname(os.path.abspath(__file__)), "rules.yaml"))
+ACTIONS = ("commands", "restart")
+
+GROUP_NAME = re.compile(r"\(\?P<(\w+)>")
+GROUP_REF = re.compile(r"\(\?P=(\w+)\)")
+# Captured values end up in shell commands, so they may only be plain names and paths
+SAFE_VALUE = re.compile(r"[\w.\-/]+")
+
+
+class Rulebook:
+    """
+    Ordered regex rules over pod logs, compiled into a single alternation.
+
+    One scan over the logs finds every rule occurrence; the earliest rule in
+    the file wins and, within it, the latest occurrence in the logs. Named
+    groups in a pattern (plus `package`, mapped from `module`) can be used
+    as {placeholders} in the rule's commands and description.
+
+    `packages` is an allowlist from dotted module names to the package
+    providing them (and their submodules). A rule whose `module` it doesn't
+    cover, or that belongs to one of `project_packages`, doesn't match.
+    """
+
+    def __init__(self, rules: list, packages: dict = None, project_packages: list = ()):
+        self.rules = []
+        self.packages = packages or {}
+        self.project_packages = set(project_packages or ())
+        parts = []
+        for rule in rules:
+            try:
+                if rule.get("action", "commands") not in ACTIONS:
+                    raise ValueError(f"action must be one of {ACTIONS}")
+                if rule.get("action", "commands") == "commands" and not rule.get("commands"):
+                    raise ValueError("a 'commands' rule needs commands")
+                re.compile(rule["pattern"])
+            except (KeyError, ValueError, re.error) as e:
+                logging.error(f"[RULES] Skipping invalid rule {rule.get('name')}: {e}")
+                continue
+            index = len(self.rules)
+            # Namespace each rule's named groups so they can share one pattern
+            pattern = GROUP_NAME.sub(lambda m: f"(?P<r{index}_{m.group(1)}>", rule["pattern"])
+            pattern = GROUP_REF.sub(lambda m: f"(?P=r{index}_{m.group(1)})", pattern)
+            parts.append(f"(?P<r{index}>{pattern})")
+            self.rules.append(rule)
+        self._regex = re.compile("|".join(parts), re.MULTILINE) if parts else None
+
+    def match(self, logs: str):
+        """The healing decision of the best matching rule, or None."""
+        best = None
+        if self._regex is not None:
+            for m in self._regex.finditer(logs or ""):
+                index = int(m.lastgroup[1:])
+                if best is None or index <= best[0]:
+                    best = (index, m)
+        if best is None:
+            RULE_MISSES.inc()
+            return None
+
+        index, m = best
+        rule = self.rules[index]
+        prefix = f"r{index}_"
+        values = {name[len(prefix):]: value for name, value in m.groupdict().items()
+                  if name.startswith(prefix) and value is not None}
+        if "module" in values and "package" not in values:
+            package = self.package_for(values["module"])
+            if package is None:
+                logging.warning(f"[RULES] Rule {rule['name']}: no allowlisted package provides {values['module']}")
+                RULE_MISSES.inc()
+                return None
+            values["package"] = package
+        if not all(SAFE_VALUE.fullmatch(value) for value in values.values()):
+            logging.warning(f"[RULES] Rule {rule['name']} matched unsafe values {values}, ignoring it")
+            RULE_MISSES.inc()
+            return None
+
+        RULE_HITS.labels(rule=rule["name"]).inc()
+        return {
+            "action": rule.get("action", "commands"),
+            "commands": [cmd.format(**values) for cmd in rule.get("commands", [])],
+            "description": rule.get("description", f"Matched rule {rule['name']}").format(**values),
+            "rule": rule["name"],
+        }
+
+    def package_for(self, module: str):
+        """The allowlisted package providing `module`, or None."""
+        parts = module.split(".")
+        if parts[0] in self.project_packages:
+            return None
+        for end in range(len(parts), 0, -1):
+            package = self.packages.get(".".join(parts[:end]))
+            if package:
+                return package
+        return None
+
+
+def load_rulebook(path: str = RULES_PATH) -> Rulebook:
+    if not path or not os.path.exists(path):
+        logging.warning(f"[RULES] No rulebook at {path}, every heal goes to the LLM")
+        return Rulebook([])
+    with open(path, encoding="utf-8") as f:
+        if path.endswith(".json"):
+            data = json.load(f)
+        else:
+            import yaml
+            data = yaml.safe_load(f)
+    rulebook = Rulebook(data.get("rules", []), data.get("packages", {}), data.get("project_packages", []))
+    logging.info(f"[RULES] Loaded {len(rulebook.rules)} rules from {path}")
+    return rulebook
@@ -0,0 +1,38 @@
+import hashlib
+import re
+
+# Order matters: specific shapes first, bare numbers last
+VOLATILE = [
+    (re.compile(r"\d{4}-\d{2}-\d{2}[T ]\d{2}:\d{2}:\d{2}(?:[.,]\d+)?(?:Z|[+-]\d{2}:?\d{2})?"), "<ts>"),
+    (re.compile(r"\b[a-z0-9](?:[-a-z0-9]*[a-z0-9])?-[a-z0-9]{8,10}-[a-z0-9]{5}\b"), "<pod>"),
+    (re.compile(r"\b[0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12}\b", re.IGNORECASE), "<uuid>"),
+    (re.compile(r"\b0x[0-9a-f]+\b", re.IGNORECASE), "<addr>"),
+    (re.compile(r"\b[0-9a-f]{12,}\b", re.IGNORECASE), "<hash>"),
+    (re.compile(r"\bline \d+", re.IGNORECASE), "line <n>"),
+    (re.compile(r"\d+"), "<n>"),
+]
+# Only the tail is hashed, so repeated tracebacks and cut-off first lines don't change the signature
+SIGNATURE_CHARS = 400
+
+
+def normalize_errors(text: str) -> str:
+    """
+    Mask the parts of error lines that change between occurrences of the same
+    failure, and keep each distinct line once (at its last occurrence) so a
+    traceback repeated by a crashloop reads the same as a single one.
+    """
+    lines = []
+    seen = set()
+    for line in reversed((text or "").splitlines()):
+        line = line.strip()
+        for pattern, replacement in VOLATILE:
+            line = pattern.sub(replacement, line)
+        if line and line not in seen:
+            seen.add(line)
+            lines.append(line)
+    return "\n".join(reversed(lines))
+
+
+def error_signature(text: str) -> str:
+    """Short stable hash identifying a failure across pods, restarts and timestamps."""
+    return hashlib.sha256(normalize_errors(text)[-SIGNATURE_CHARS:].encode("utf-8")).hexdigest()[:16]
@@ -0,0 +1,55 @@
+import os
+import sys
+import tempfile
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# The MCP server's modules import each other by bare name (they run from mcp/)
+sys.path[:0] = [ROOT, os.path.join(ROOT, "mcp")]
+
+# Keep the MCP modules offline and off the real volumes when imported
+os.environ.setdefault("K8S_BACKEND", "fake")
+os.environ.setdefault("LLM_BACKEND", "fake")
+os.environ.setdefault("LLM_CACHE_PATH", "")
+os.environ.setdefault("METRICS_PORT", "0")
+os.environ.setdefault("HISTORY_DB_PATH", os.path.join(tempfile.mkdtemp(prefix="mcp-tests-"), "history.db"))
+
+
+@pytest.fixture(scope="session")
+def model(tmp_path_factory):
+    """A tiny randomly initialised RoBERTa served as version "test" (see benchmarks/bench_inference.py)."""
+    import torch
+
+    from app import utils
+    from app.backends import TorchBackend
+    from app.registry import ModelVersion
+    from benchmarks.bench_inference import build_tiny_model
+
+    model_dir = str(tmp_path_factory.mktemp("model"))
+    build_tiny_model(model_dir)
+    tokenizer = utils.load_tokenizer(model_dir)
+    weights = utils.load_weights(model_dir)
+    return ModelVersion("test", tokenizer, TorchBackend(weights, torch.device("cpu")), model_dir)
+
+
+@pytest.fixture
+def cluster():
+    """A fake Kubernetes API with one deployment, ns/app, of two pods."""
+    from fake_k8s import FakeCluster
+
+    cluster = FakeCluster(exec_seconds=0.01, restart_seconds=0.1)
+    cluster.add_deployment("ns", "app", replicas=2)
+    return cluster
+
+
+@pytest.fixture
+def clients(cluster):
+    """Point k8s_utils at `cluster` for one test."""
+    import k8s_utils
+
+    k8s_utils.use_clients(cluster.core_v1, cluster.apps_v1, cluster.watch, cluster.stream)
+    yield cluster
+    default = k8s_utils.fake_cluster
+    k8s_utils.use_clients(default.core_v1, default.apps_v1, default.watch, default.stream)
@@ -0,0 +1,136 @@
+import hashlib
+import io
+import os
+import tarfile
+
+import pytest
+
+from app.artifacts import (ChecksumMismatch, LocalArchiveSource, LocalDirectorySource, ensure_model, make_source,
+                           stream_extract)
+
+
+def make_archive(members: dict, symlinks: dict = None) -> bytes:
+    buf = io.BytesIO()
+    with tarfile.open(fileobj=buf, mode="w:gz") as tar:
+        for name, data in members.items():
+            info = tarfile.TarInfo(name)
+            info.size = len(data)
+            tar.addfile(info, io.BytesIO(data))
+        for name, target in (symlinks or {}).items():
+            info = tarfile.TarInfo(name)
+            info.type = tarfile.SYMTYPE
+            info.linkname = target
+            tar.addfile(info)
+    return buf.getvalue()
+
+
+def test_extracts_and_returns_digest(tmp_path):
+    archive = make_archive({"model/config.json": b"{}", "model/vocab.json": b"{}"})
+    dest = str(tmp_path / "model")
+    digest = stream_extract(io.BytesIO(archive), dest, hashlib.sha256(archive).hexdigest())
+    assert digest == hashlib.sha256(archive).hexdigest()
+    assert sorted(os.listdir(dest)) == ["config.json", "vocab.json"]
+    assert not os.path.exists(dest + ".partial")
+
+
+def test_skips_unsafe_members(tmp_path):
+    archive = make_archive({"config.json": b"{}", "../escape.txt": b"x", "/etc/abs.txt": b"x"},
+                           symlinks={"link": "/etc/passwd"})
+    dest = tmp_path / "out" / "model"
+    stream_extract(io.BytesIO(archive), str(dest))
+    assert os.listdir(dest) == ["config.json"]
+    assert not (tmp_path / "out" / "escape.txt").exists()
+
+
+def test_checksum_mismatch_leaves_nothing_behind(tmp_path):
+    archive = make_archive({"config.json": b"{}"})
+    dest = str(tmp_path / "model")
+    with pytest.raises(ChecksumMismatch):
+        stream_extract(io.BytesIO(archive), dest, "0" * 64)
+    assert not os.path.exists(dest)
+    assert not os.path.exists(dest + ".partial")
+
+
+def test_local_sources(tmp_path):
+    archive_path = tmp_path / "model.tar.gz"
+    archive_path.write_bytes(make_archive({"model/config.json": b"{}"}))
+    source = make_source(f"file://{archive_path}")
+    assert isinstance(source, LocalArchiveSource)
+    dest = str(tmp_path / "extracted")
+    assert ensure_model(dest, source) == dest
+    assert os.listdir(dest) == ["config.json"]
+
+    source = make_source(dest)
+    assert isinstance(source, LocalDirectorySource)
+    assert ensure_model(str(tmp_path / "unused"), source) == dest
+
+
+def test_nested_traversal_and_links_are_skipped(tmp_path):
+    buf = io.BytesIO()
+    with tarfile.open(fileobj=buf, mode="w:gz") as tar:
+        for name, data in {"model/config.json": b"{}", "model/../../nested.txt": b"x"}.items():
+            info = tarfile.TarInfo(name)
+            info.size = len(data)
+            tar.addfile(info, io.BytesIO(data))
+        link = tarfile.TarInfo("model/hard")
+        link.type = tarfile.LNKTYPE
+        link.linkname = "/etc/passwd"
+        tar.addfile(link)
+    dest = tmp_path / "out" / "model"
+    stream_extract(io.BytesIO(buf.getvalue()), str(dest))
+    assert os.listdir(dest) == ["config.json"]
+    assert not list(tmp_path.rglob("nested.txt"))
+
+
+def test_expected_digest_is_case_insensitive(tmp_path):
+    archive = make_archive({"config.json": b"{}"})
+    digest = hashlib.sha256(archive).hexdigest()
+    assert stream_extract(io.BytesIO(archive), str(tmp_path / "model"), digest.upper()) == digest
+
+
+@pytest.fixture
+def deploys(model, tmp_path, monkeypatch):
+    """A registry serving the test model, deploying new versions under tmp_path, plus an archive of the model."""
+    from app import artifacts, utils
+    from app.registry import ModelRegistry, ModelVersion
+
+    registry = ModelRegistry()
+    # Its own ModelVersion: the replaced one is released, the shared fixture must not be
+    registry.activate(ModelVersion("current", model.tokenizer, model.backend, model.model_dir))
+    monkeypatch.setattr(utils, "registry", registry)
+    monkeypatch.setattr(utils, "MODELS_DIR", str(tmp_path / "models"))
+
+    def archive(extra: dict = None) -> str:
+        path = tmp_path / "v2.tar.gz"
+        with tarfile.open(path, "w:gz") as tar:
+            tar.add(model.model_dir, arcname="model")
+            for name, data in (extra or {}).items():
+                info = tarfile.TarInfo(name)
+                info.size = len(data)
+                tar.addfile(info, io.BytesIO(data))
+        monkeypatch.setattr(artifacts, "MODEL_SHA256", hashlib.sha256(path.read_bytes()).hexdigest())
+        return str(path)
+
+    return utils, registry, archive
+
+
+def test_deploy_with_wrong_checksum_keeps_serving_the_current_version(deploys, tmp_path, monkeypatch):
+    from app import artifacts
+
+    utils, registry, archive = deploys
+    source = archive()
+    monkeypatch.setattr(artifacts, "MODEL_SHA256", "0" * 64)
+    with pytest.raises(ChecksumMismatch):
+        utils.deploy_version("v2", source)
+    assert registry.loading["v2"].startswith("failed: ChecksumMismatch")
+    assert [v["version"] for v in registry.versions()] == ["current"]
+    assert not (tmp_path / "models" / "v2").exists()
+
+
+def test_deploy_skips_traversal_members(deploys, tmp_path):
+    utils, registry, archive = deploys
+    utils.deploy_version("v2", archive({"../../escape.txt": b"x", "model/../../../escape2.txt": b"x"}))
+    assert [v["version"] for v in registry.versions()] == ["v2"]
+    assert not list(tmp_path.rglob("escape*.txt"))
+    assert utils.predict_batch(["hello"])[0]["model_version"] == "v2"
+    registry.wait_drained(5)
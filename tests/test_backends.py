@@ -0,0 +1,59 @@
+import pytest
+import torch
+
+from app import backends
+from app.backends import QuantizedBackend, TorchBackend, load_backend
+
+
+def skewed(offset: float):
+    """A candidate backend class whose logits are the fp32 ones shifted by `offset` on the AI class."""
+
+    class Skewed(TorchBackend):
+        def __init__(self, model, *args):
+            super().__init__(model, torch.device("cpu"))
+
+        def run(self, inputs):
+            logits = super().run(inputs).clone()
+            logits[:, 1] += offset
+            return logits
+
+    return Skewed
+
+
+def load(model, name: str):
+    return load_backend(model.backend.model, torch.device("cpu"), model.tokenizer, model.model_dir,
+                        temperature=1.0, max_length=64, name=name)
+
+
+@pytest.mark.parametrize("name, cls", [("quantized", "QuantizedBackend"), ("onnx", "OnnxBackend")])
+def test_backend_past_tolerance_falls_back_to_torch(model, monkeypatch, name, cls):
+    monkeypatch.setattr(backends, cls, skewed(5.0))
+    backend = load(model, name)
+    assert type(backend) is TorchBackend
+
+
+@pytest.mark.parametrize("name, cls", [("quantized", "QuantizedBackend"), ("onnx", "OnnxBackend")])
+def test_backend_within_tolerance_is_accepted(model, monkeypatch, name, cls):
+    monkeypatch.setattr(backends, cls, skewed(0.001))
+    backend = load(model, name)
+    assert type(backend) is not TorchBackend
+    assert 0 < backend.parity_deviation <= backends.BACKEND_PARITY_TOLERANCE
+
+
+def test_backend_that_fails_to_build_falls_back_to_torch(model, monkeypatch):
+    def broken(*args):
+        raise RuntimeError("no onnxruntime")
+
+    monkeypatch.setattr(backends, "OnnxBackend", broken)
+    assert type(load(model, "onnx")) is TorchBackend
+
+
+def test_real_quantized_backend_against_the_tolerance(model, monkeypatch):
+    monkeypatch.setattr(backends, "BACKEND_PARITY_TOLERANCE", 1.0)
+    assert isinstance(load(model, "quantized"), QuantizedBackend)
+    monkeypatch.setattr(backends, "BACKEND_PARITY_TOLERANCE", -1.0)
+    assert type(load(model, "quantized")) is TorchBackend
+
+
+def test_unknown_backend_is_torch(model):
+    assert type(load(model, "tensorrt")) is TorchBackend
@@ -0,0 +1,84 @@
+import threading
+import time
+
+import pytest
+
+from app import utils
+from app.batching import MicroBatcher
+from app.executor import InferenceExecutor
+
+TEXTS = ["short", "a somewhat longer text", "x" * 300, "another one", "last"]
+
+
+def recording(model, sizes: list):
+    def batch_fn(texts):
+        sizes.append(len(texts))
+        return utils.predict_batch(texts, model=model)
+
+    return batch_fn
+
+
+def submit_together(batcher, texts: list) -> list:
+    """Submit `texts` from one thread each, all released at once."""
+    start = threading.Barrier(len(texts))
+    futures = [None] * len(texts)
+
+    def submit(i):
+        start.wait()
+        futures[i] = batcher.submit(texts[i])
+
+    threads = [threading.Thread(target=submit, args=(i,)) for i in range(len(texts))]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return futures
+
+
+@pytest.mark.parametrize("executor", [False, True])
+def test_concurrent_submits_share_one_call(model, executor):
+    sizes = []
+    batcher = MicroBatcher(recording(model, sizes), max_batch_size=16, max_wait_ms=500,
+                           executor=InferenceExecutor(workers=1, max_queue=16, torch_threads=1) if executor else None)
+    futures = submit_together(batcher, TEXTS)
+    results = [future.result(timeout=10) for future in futures]
+    assert sizes == [len(TEXTS)]
+    # Each caller gets its own row: the same as scoring its text alone
+    for text, result in zip(TEXTS, results):
+        alone = utils.predict_batch([text], model=model)[0]
+        assert result["prediction"] == alone["prediction"]
+        assert result["probabilities"]["ai"] == pytest.approx(alone["probabilities"]["ai"], abs=1e-5)
+
+
+def test_full_batch_is_flushed_without_waiting(model):
+    sizes = []
+    batcher = MicroBatcher(recording(model, sizes), max_batch_size=2, max_wait_ms=2000)
+    started = time.monotonic()
+    futures = submit_together(batcher, TEXTS[:4])
+    for future in futures:
+        future.result(timeout=10)
+    assert sizes == [2, 2]
+    assert time.monotonic() - started < 1.5
+
+
+def test_partial_batch_is_flushed_after_max_wait(model):
+    sizes = []
+    batcher = MicroBatcher(recording(model, sizes), max_batch_size=16, max_wait_ms=50)
+    started = time.monotonic()
+    batcher.predict("alone")
+    assert sizes == [1]
+    assert 0.04 <= time.monotonic() - started < 1.5
+
+
+def test_error_reaches_every_caller_in_the_batch():
+    def batch_fn(texts):
+        raise RuntimeError(f"failed on {len(texts)} texts")
+
+    batcher = MicroBatcher(batch_fn, max_batch_size=16, max_wait_ms=200)
+    futures = submit_together(batcher, TEXTS[:3])
+    for future in futures:
+        with pytest.raises(RuntimeError, match="failed on 3 texts"):
+            future.result(timeout=10)
+    # The batcher keeps serving afterwards
+    batcher.batch_fn = lambda texts: [len(text) for text in texts]
+    assert batcher.predict("four") == 4
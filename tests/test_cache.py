@@ -0,0 +1,87 @@
+import asyncio
+import json
+import threading
+
+from app.cache import PredictionCache, LRUCache
+
+
+class BlockingSharedBackend:
+    """Shared backend that records which thread each call ran on."""
+
+    def __init__(self):
+        self.data = {}
+        self.threads = []
+
+    def get(self, key):
+        self.threads.append(threading.current_thread())
+        return self.data.get(key)
+
+    def set(self, key, value, ttl_seconds):
+        self.threads.append(threading.current_thread())
+        self.data[key] = value
+
+
+def test_async_lookups_keep_shared_backend_off_the_event_loop():
+    shared = BlockingSharedBackend()
+    cache = PredictionCache(LRUCache(), shared)
+
+    async def run():
+        assert await cache.get_async("k") is None
+        cache.set_async("k", {"prediction": 1})
+        await asyncio.sleep(0.1)
+        cache.local = LRUCache()  # force the next lookup to the shared tier
+        return await cache.get_async("k")
+
+    assert asyncio.run(run()) == {"prediction": 1}
+    assert len(shared.threads) == 3
+    assert threading.main_thread() not in shared.threads
+
+
+def test_shared_backend_failure_is_a_miss():
+    class Broken:
+        def get(self, key):
+            raise ConnectionError("down")
+
+        def set(self, key, value, ttl_seconds):
+            raise ConnectionError("down")
+
+    cache = PredictionCache(LRUCache(), Broken())
+    cache.set("k", {"prediction": 0})
+    assert cache.get("k") == {"prediction": 0}
+    assert asyncio.run(cache.get_async("missing")) is None
+
+
+def test_lru_evicts_least_recently_used_by_entries():
+    cache = LRUCache(max_entries=2, max_bytes=10 ** 6, ttl_seconds=60)
+    cache.set("a", {"v": 1})
+    cache.set("b", {"v": 2})
+    assert cache.get("a") == {"v": 1}  # "b" is now the least recently used
+    cache.set("c", {"v": 3})
+    assert cache.get("b") is None
+    assert cache.get("a") == {"v": 1}
+    assert cache.get("c") == {"v": 3}
+
+
+def test_lru_evicts_by_bytes():
+    value = {"text": "x" * 50}
+    size = len("k0") + len(json.dumps(value))
+    cache = LRUCache(max_entries=100, max_bytes=size * 2, ttl_seconds=60)
+    for i in range(3):
+        cache.set(f"k{i}", value)
+    assert cache.get("k0") is None
+    assert cache.get("k1") == value and cache.get("k2") == value
+    # A value larger than the whole budget is never stored
+    cache.set("huge", {"text": "x" * size * 3})
+    assert cache.get("huge") is None
+    assert cache.get("k2") == value
+
+
+def test_lru_expires_entries(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr("app.cache.time.monotonic", lambda: now[0])
+    cache = LRUCache(max_entries=10, max_bytes=10 ** 6, ttl_seconds=5)
+    cache.set("k", {"v": 1})
+    now[0] += 4
+    assert cache.get("k") == {"v": 1}
+    now[0] += 2
+    assert cache.get("k") is None
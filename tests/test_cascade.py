@@ -0,0 +1,75 @@
+import joblib
+import numpy as np
+
+from app.cascade import Cascade, band_report, build_pipeline, load_cascade
+
+
+class Pipeline:
+    """First stage whose AI probability is looked up by text."""
+
+    classes_ = [0, 1]
+
+    def __init__(self, ai: dict):
+        self.ai = ai
+
+    def predict_proba(self, texts):
+        return np.array([[1 - self.ai[text], self.ai[text]] for text in texts])
+
+
+def transformer(calls: list):
+    def score(texts):
+        calls.append(list(texts))
+        return [{"prediction": 1, "confidence": 0.99, "probabilities": {"human": 0.01, "ai": 0.99},
+                 "model_version": "v1", "text": text} for text in texts]
+
+    return score
+
+
+def test_confident_texts_skip_the_transformer():
+    cascade = Cascade(Pipeline({"human": 0.05, "unsure": 0.5, "ai": 0.95, "edge": 0.2}), low=0.2, high=0.8)
+    calls = []
+    results = cascade.score(["human", "unsure", "ai", "edge"], transformer(calls))
+    # The band is inclusive; everything outside it is decided by the pre-filter
+    assert calls == [["unsure", "edge"]]
+    assert [r["stage"] for r in results] == ["prefilter", "transformer", "prefilter", "transformer"]
+    assert [r.get("text") for r in results] == [None, "unsure", None, "edge"]
+    assert results[0]["prediction"] == 0 and results[0]["probabilities"] == {"human": 0.95, "ai": 0.05}
+    assert results[2]["prediction"] == 1 and results[2]["confidence"] == 0.95
+
+
+def test_nothing_escalated_makes_no_transformer_call():
+    calls = []
+    results = Cascade(Pipeline({"a": 0.0, "b": 1.0})).score(["a", "b"], transformer(calls))
+    assert calls == [] and [r["stage"] for r in results] == ["prefilter", "prefilter"]
+
+
+def test_everything_escalated_keeps_order():
+    calls = []
+    texts = [f"t{i}" for i in range(5)]
+    results = Cascade(Pipeline({text: 0.5 for text in texts})).score(texts, transformer(calls))
+    assert calls == [texts]
+    assert [r["text"] for r in results] == texts
+
+
+def test_band_report():
+    ai_probs = [0.1, 0.45, 0.55, 0.9]
+    labels = [0, 1, 0, 1]
+    rows = band_report(ai_probs, labels, transformer_preds=[0, 1, 0, 1], bands=[(0.5, 0.5), (0.4, 0.6), (0.0, 1.0)])
+    assert [row["escalation_rate"] for row in rows] == [0.0, 0.5, 1.0]
+    # Decided alone at threshold 0.6: 0.45 -> human (wrong), 0.55 -> human (right)
+    assert [row["prefilter_accuracy"] for row in rows] == [0.75, 1.0, None]
+    assert [row["cascade_accuracy"] for row in rows] == [0.75, 1.0, 1.0]
+    assert "cascade_accuracy" not in band_report(ai_probs, labels, bands=[(0.4, 0.6)])[0]
+
+
+def test_load_cascade(tmp_path):
+    assert load_cascade("") is None
+    assert load_cascade(str(tmp_path / "missing.joblib")) is None
+    pipeline = build_pipeline()
+    pipeline.set_params(tfidf__min_df=1)
+    pipeline.fit(["written by a person", "generated by a model"] * 3, [0, 1] * 3)
+    path = tmp_path / "cascade.joblib"
+    joblib.dump(pipeline, path)
+    cascade = load_cascade(str(path))
+    assert len(cascade.version) == 12
+    assert len(cascade.ai_probabilities(["a person"])) == 1
@@ -0,0 +1,127 @@
+import asyncio
+
+import pytest
+
+import dedup
+from dedup import HealDeduplicator, log_signature
+
+LOGS = "Starting\nTraceback (most recent call last):\nModuleNotFoundError: No module named 'foo'"
+
+
+class Heals:
+    """Counts fetch/heal calls; heals succeed unless told otherwise."""
+
+    def __init__(self, logs=LOGS, success=True, delay=0.0):
+        self.logs, self.success, self.delay = logs, success, delay
+        self.fetched = self.healed = 0
+
+    async def fetch_logs(self):
+        self.fetched += 1
+        return self.logs
+
+    async def run_heal(self, logs):
+        self.healed += 1
+        await asyncio.sleep(self.delay)
+        return {"success": self.success, "action_taken": "restart"}
+
+
+def heal(d, heals, fingerprint="fp", deployment="app"):
+    return d.heal("ns", deployment, fingerprint, heals.fetch_logs, heals.run_heal)
+
+
+def test_concurrent_alerts_share_one_heal():
+    d, heals = HealDeduplicator(), Heals(delay=0.05)
+
+    async def run():
+        return await asyncio.gather(*(heal(d, heals, fingerprint=f"fp-{i}") for i in range(5)))
+
+    results = asyncio.run(run())
+    assert heals.healed == 1 and heals.fetched == 1
+    assert sorted(outcome for outcome, _ in results) == ["coalesced"] * 4 + ["executed"]
+    assert all(result["success"] for _, result in results)
+
+
+def test_cooldown_by_fingerprint_and_signature():
+    d, heals = HealDeduplicator(cooldown=60), Heals()
+
+    async def run():
+        first = await heal(d, heals)
+        same_fingerprint = await heal(d, heals)
+        same_error = await heal(d, heals, fingerprint="other")
+        other_deployment = await heal(d, heals, fingerprint="third", deployment="other-app")
+        return first, same_fingerprint, same_error, other_deployment
+
+    outcomes = [outcome for outcome, _ in asyncio.run(run())]
+    assert outcomes == ["executed", "cooldown", "cooldown", "executed"]
+    # The fingerprint hit is answered before any log fetch
+    assert heals.fetched == 3 and heals.healed == 2
+
+
+def test_cooldown_expires(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(dedup.time, "monotonic", lambda: now[0])
+    d, heals = HealDeduplicator(cooldown=60), Heals()
+
+    async def run():
+        outcomes = [(await heal(d, heals))[0]]
+        now[0] += 59
+        outcomes.append((await heal(d, heals))[0])
+        now[0] += 2
+        outcomes.append((await heal(d, heals))[0])
+        return outcomes
+
+    assert asyncio.run(run()) == ["executed", "cooldown", "executed"]
+
+
+def test_failed_heals_only_get_the_failure_cooldown(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(dedup.time, "monotonic", lambda: now[0])
+    d, heals = HealDeduplicator(cooldown=300, failure_cooldown=30), Heals(success=False)
+
+    async def run():
+        outcomes = [(await heal(d, heals))[0]]
+        now[0] += 10
+        outcomes.append((await heal(d, heals))[0])
+        now[0] += 25
+        outcomes.append((await heal(d, heals))[0])
+        return outcomes
+
+    assert asyncio.run(run()) == ["executed", "cooldown", "executed"]
+
+    d, heals = HealDeduplicator(cooldown=300, failure_cooldown=0), Heals(success=False)
+
+    async def retry():
+        return [(await heal(d, heals))[0] for _ in range(2)]
+
+    assert asyncio.run(retry()) == ["executed", "executed"]
+
+
+def test_no_logs_and_errors():
+    d = HealDeduplicator()
+    assert asyncio.run(heal(d, Heals(logs=""))) == ("no_logs", None)
+
+    class Failing(Heals):
+        async def run_heal(self, logs):
+            await asyncio.sleep(0.05)
+            raise RuntimeError("boom")
+
+    failing = Failing()
+
+    async def run():
+        return await asyncio.gather(heal(d, failing, "a"), heal(d, failing, "b"), return_exceptions=True)
+
+    assert [type(r) for r in asyncio.run(run())] == [RuntimeError, RuntimeError]
+    # Nothing was cached, the next alert heals again
+    assert asyncio.run(heal(d, Heals()))[0] == "executed"
+
+
+@pytest.mark.parametrize("logs, same", [
+    ("2024-05-01T10:00:00Z ERROR worker-7f9c6d5b8-x2x9q crashed", "2024-06-02T11:11:11Z ERROR worker-55d9c8f6b4-abcde crashed"),
+    ("INFO ready\nValueError: bad input", "DEBUG other noise\nValueError: bad input"),
+])
+def test_log_signature_ignores_volatile_parts(logs, same):
+    assert log_signature(logs) == log_signature(same)
+
+
+def test_log_signature_falls_back_to_last_lines():
+    assert log_signature("all good\nstill good") != log_signature("all good\nsomething else")
@@ -0,0 +1,46 @@
+import subprocess
+
+from k8s_utils import _batch_script, _split_batch_output, exec_commands_in_pod
+
+TOKEN = "__mcp_test__"
+
+
+def run_batch(commands: list) -> str:
+    script = _batch_script(commands, TOKEN)
+    return "\n" + subprocess.run(["/bin/sh", "-c", script], capture_output=True, text=True).stdout
+
+
+def test_batch_captures_each_command_separately():
+    commands = ["echo one", "echo two >&2; exit 3", "printf 'no newline'"]
+    results = _split_batch_output(run_batch(commands), commands, TOKEN)
+    assert [r["command"] for r in results] == commands
+    assert [r["exit_code"] for r in results] == [0, 3, 0]
+    assert [r["success"] for r in results] == [True, False, True]
+    assert [r["output"].strip() for r in results] == ["one", "two", "no newline"]
+
+
+def test_batch_quotes_commands():
+    commands = ["echo \"it's $((1 + 1))\""]
+    results = _split_batch_output(run_batch(commands), commands, TOKEN)
+    assert results[0]["output"].strip() == "it's 2"
+
+
+def test_unfinished_and_missing_commands():
+    output = f"\n{TOKEN} begin 0\nok\n{TOKEN} end 0 0\n\n{TOKEN} begin 1\npartial"
+    results = _split_batch_output(output, ["a", "b", "c"], TOKEN)
+    assert [r["exit_code"] for r in results] == [0, None]
+    assert results[1]["output"] == "partial" and not results[1]["success"]
+
+
+def test_non_zero_exit_neither_stops_the_batch_nor_fails_it(cluster, clients):
+    pod = cluster.pods("ns", "app")[0]
+    res = exec_commands_in_pod("ns", pod, ["pip install fail-pkg", "echo after"])
+    assert res["success"]
+    assert [r["exit_code"] for r in res["results"]] == [1, 0]
+    assert "$ echo after" in res["output"]
+    assert cluster.calls["exec"] == 1
+
+
+def test_missing_pod_fails(clients):
+    res = exec_commands_in_pod("ns", "no-such-pod", ["echo hi"])
+    assert not res["success"] and res["results"] == []
@@ -0,0 +1,127 @@
+import asyncio
+import io
+import threading
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app import executor, utils
+from app.executor import InferenceExecutor, QueueFull, available_cpus
+
+
+def test_admission_is_bounded_by_workers_and_queue():
+    pool = InferenceExecutor(workers=2, max_queue=1, torch_threads=1)
+    pool.acquire(2)
+    pool.acquire()
+    with pytest.raises(QueueFull):
+        pool.acquire()
+    pool.release()
+    with pytest.raises(QueueFull):
+        pool.acquire(2)
+    with pool.admit():
+        assert pool._admitted == 3
+    assert pool._admitted == 2
+
+
+def test_admit_releases_on_error():
+    pool = InferenceExecutor(workers=1, max_queue=0, torch_threads=1)
+    with pytest.raises(RuntimeError):
+        with pool.admit():
+            raise RuntimeError("boom")
+    assert pool._admitted == 0
+
+
+def test_run_executes_on_a_worker_thread():
+    pool = InferenceExecutor(workers=1, max_queue=0, torch_threads=1)
+
+    async def run():
+        return await pool.run(lambda: threading.current_thread().name)
+
+    assert asyncio.run(run()).startswith("inference")
+    assert pool._admitted == 0 and pool._running == 0
+
+
+def cgroup_files(monkeypatch, files: dict):
+    def fake_open(path, *args, **kwargs):
+        if path not in files:
+            raise FileNotFoundError(path)
+        return io.StringIO(files[path])
+
+    monkeypatch.setattr(executor, "open", fake_open, raising=False)
+
+
+def test_available_cpus_reads_the_cgroup_quota(monkeypatch):
+    cgroup_files(monkeypatch, {"/sys/fs/cgroup/cpu.max": "250000 100000\n"})
+    assert available_cpus() == 2
+    cgroup_files(monkeypatch, {"/sys/fs/cgroup/cpu.max": "50000 100000\n"})
+    assert available_cpus() == 1
+    cgroup_files(monkeypatch, {"/sys/fs/cgroup/cpu/cpu.cfs_quota_us": "300000",
+                               "/sys/fs/cgroup/cpu/cpu.cfs_period_us": "100000"})
+    assert available_cpus() == 3
+
+
+def test_available_cpus_without_a_quota(monkeypatch):
+    monkeypatch.setattr(executor.os, "cpu_count", lambda: 6)
+    cgroup_files(monkeypatch, {"/sys/fs/cgroup/cpu.max": "max 100000\n",
+                               "/sys/fs/cgroup/cpu/cpu.cfs_quota_us": "-1",
+                               "/sys/fs/cgroup/cpu/cpu.cfs_period_us": "100000"})
+    assert available_cpus() == 6
+    cgroup_files(monkeypatch, {})
+    assert available_cpus() == 6
+
+
+@pytest.fixture
+def api(monkeypatch):
+    """The API with a fake scorer and its own small executor, without loading a model."""
+    from app import main
+
+    pool = InferenceExecutor(workers=1, max_queue=1, torch_threads=1)
+    monkeypatch.setattr(main, "inference_pool", pool)
+    monkeypatch.setattr(main, "_score_bucketed", lambda texts: [
+        {"prediction": 1, "confidence": 0.9, "probabilities": {"Human": 0.1, "AI": 0.9}} for _ in texts
+    ])
+    was_ready = utils.model_ready.is_set()
+    utils.model_ready.set()
+    yield main, pool
+    if not was_ready:
+        utils.model_ready.clear()
+
+
+def test_full_queue_answers_429_with_retry_after(api):
+    main, pool = api
+    client = TestClient(main.app)
+    pool.acquire(2)
+    response = client.post("/predict/batch", json={"texts": ["a"]})
+    assert response.status_code == 429
+    assert response.headers["Retry-After"] == str(executor.RETRY_AFTER_SECONDS)
+    pool.release(2)
+    assert client.post("/predict/batch", json={"texts": ["a"]}).status_code == 200
+    assert pool._admitted == 0
+
+
+def test_stream_holds_one_slot_and_returns_it(api, monkeypatch):
+    main, pool = api
+    client = TestClient(main.app)
+    admitted = []
+    real_score = main._score_bucketed
+
+    def score(texts):
+        admitted.append(pool._admitted)
+        return real_score(texts)
+
+    monkeypatch.setattr(main, "_score_bucketed", score)
+    response = client.post("/predict/stream", content=b'"one"\n"two"\n', headers={"Content-Type": "application/x-ndjson"})
+    assert response.status_code == 200 and len(response.text.splitlines()) == 2
+    assert admitted and set(admitted) == {1}
+    assert pool._admitted == 0
+
+    def fail(texts):
+        raise RuntimeError("scoring failed")
+
+    monkeypatch.setattr(main, "_score_bucketed", fail)
+    # The response has started by then, so the error just cuts the stream short
+    try:
+        client.post("/predict/stream", content=b'"one"\n', headers={"Content-Type": "application/x-ndjson"})
+    except RuntimeError:
+        pass
+    assert pool._admitted == 0
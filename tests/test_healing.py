@@ -0,0 +1,33 @@
+import pytest
+
+import healing
+from llm_utils import decision_cache
+
+DECISION = {"action": "exec", "commands": ["pip install foo"]}
+
+
+@pytest.fixture
+def signature():
+    signature = "test-healing-signature"
+    decision_cache.set(signature, DECISION)
+    yield signature
+    decision_cache.invalidate(signature)
+
+
+def heal_log(signature, exit_codes, success=True):
+    return {"success": success, "error_signature": signature, "exit_codes": exit_codes}
+
+
+def test_successful_commands_keep_the_cached_decision(signature):
+    healing.save_healing_log(heal_log(signature, [0, 0]))
+    assert decision_cache.get(signature) == DECISION
+
+
+def test_non_zero_exit_invalidates_the_cached_decision(signature):
+    healing.save_healing_log(heal_log(signature, [0, 1]))
+    assert decision_cache.get(signature) is None
+
+
+def test_failed_heal_invalidates_the_cached_decision(signature):
+    healing.save_healing_log(heal_log(signature, [], success=False))
+    assert decision_cache.get(signature) is None
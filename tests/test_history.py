@@ -0,0 +1,81 @@
+import json
+
+from history import HealingHistory
+
+
+def make_history(tmp_path, heals: int = 0) -> HealingHistory:
+    history = HealingHistory(str(tmp_path / "history.db"))
+    for i in range(heals):
+        history.append({
+            "timestamp": f"2024-01-01T00:00:{i:02d}",
+            "namespace": "ns-a" if i % 2 else "ns-b",
+            "deployment_name": f"app-{i % 3}",
+            "pod_name": f"pod-{i}",
+            "error_signature": "sig-1" if i < 5 else "sig-2",
+            "healing_action": ["pip install x"],
+            "success": i % 4 != 0,
+            "logs": "boom",
+            "exit_codes": [0],
+        })
+    return history
+
+
+def test_pages_cover_every_heal_once_newest_first(tmp_path):
+    history = make_history(tmp_path, heals=23)
+    seen, cursor = [], None
+    while True:
+        page = history.query(cursor=cursor, limit=5)
+        seen += [item["id"] for item in page["items"]]
+        cursor = page["next_cursor"]
+        if cursor is None:
+            break
+    assert seen == list(range(23, 0, -1))
+
+
+def test_pages_stay_stable_while_heals_are_appended(tmp_path):
+    history = make_history(tmp_path, heals=10)
+    first = history.query(limit=4)
+    make_history(tmp_path, heals=3)  # same file, newer ids
+    second = history.query(cursor=first["next_cursor"], limit=4)
+    assert [item["id"] for item in second["items"]] == [6, 5, 4, 3]
+
+
+def test_filters_and_entry_shape(tmp_path):
+    history = make_history(tmp_path, heals=12)
+    page = history.query(deployment="app-1", limit=50)
+    assert [item["id"] for item in page["items"]] == [11, 8, 5, 2]
+    page = history.query(namespace="ns-a", signature="sig-2", success=True, since="2024-01-01T00:00:06")
+    assert [item["pod_name"] for item in page["items"]] == ["pod-11", "pod-9", "pod-7"]
+
+    item = history.query(limit=1)["items"][0]
+    assert item["healing_action"] == ["pip install x"]
+    assert item["exit_codes"] == [0]
+    assert item["success"] is True and item["cached_decision"] is False
+    assert "logs" not in item
+    assert history.query(limit=1, include_logs=True)["items"][0]["logs"] == "boom"
+
+
+def test_deployment_filter_uses_an_index(tmp_path):
+    history = make_history(tmp_path)
+    plan = history._conn().execute(
+        "EXPLAIN QUERY PLAN SELECT * FROM heals WHERE deployment_name = ? ORDER BY id DESC LIMIT 5", ["app-1"]
+    ).fetchall()
+    assert any("heals_deployment" in row["detail"] for row in plan)
+
+
+def test_legacy_import_skips_malformed_rows(tmp_path):
+    legacy = tmp_path / "healing_dataset.json"
+    legacy.write_text(json.dumps([
+        {"timestamp": "2023-01-01T00:00:00", "deployment_name": "old", "success": True},
+        "not a heal",
+        {"timestamp": "2023-01-01T00:00:01", "deployment_name": {"bad": "type"}},
+        {"timestamp": "2023-01-01T00:00:02", "deployment_name": "old", "success": False},
+    ]))
+    history = make_history(tmp_path)
+    history.import_legacy(str(legacy))
+    assert [item["timestamp"] for item in history.query()["items"]] == \
+        ["2023-01-01T00:00:02", "2023-01-01T00:00:00"]
+    assert not legacy.exists()
+    assert (tmp_path / "healing_dataset.json.migrated").exists()
+    # Not in a transaction any more: later appends still commit
+    assert not history._conn().in_transaction
@@ -0,0 +1,131 @@
+import copy
+import threading
+import time
+
+from kubernetes import client
+
+import fake_k8s
+import k8s_utils
+from k8s_utils import Informer
+
+
+def pod_informer(cluster, **kwargs) -> Informer:
+    return Informer(cluster.core_v1.list_pod_for_all_namespaces, watch_factory=cluster.watch, **kwargs)
+
+
+def set_ready(cluster, pod_name: str, ready: bool):
+    with cluster._changed:
+        pod = copy.deepcopy(cluster._objects["pods"][("ns", pod_name)])
+        pod.status.conditions = [client.V1PodCondition(type="Ready", status="True" if ready else "False")]
+        cluster._emit("pods", "MODIFIED", pod)
+
+
+def eventually(predicate, timeout: float = 5):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if predicate():
+            return True
+        time.sleep(0.02)
+    return False
+
+
+def test_initial_list_fills_the_cache(cluster):
+    informer = pod_informer(cluster).start()
+    try:
+        assert informer.wait_synced(5)
+        assert sorted(pod.metadata.name for pod in informer.list("ns", {"app": "app"})) == cluster.pods("ns", "app")
+        assert informer.list("ns", {"app": "other"}) == [] and informer.list("other-ns") == []
+        assert cluster.calls["list"] == 1
+    finally:
+        informer.stop()
+
+
+def test_watch_resumes_from_resource_version_without_relisting(cluster):
+    informer = pod_informer(cluster, timeout_seconds=0.3).start()
+    try:
+        assert informer.wait_synced(5)
+        cluster.add_deployment("ns", "later")
+        # Let several watch requests end and resume
+        assert eventually(lambda: cluster.calls["watch"] >= 3)
+        cluster.add_deployment("ns", "latest")
+        assert eventually(lambda: len(informer.list("ns")) == 4)
+        assert cluster.calls["list"] == 1
+        assert informer.resource_version == str(cluster._version)
+    finally:
+        informer.stop()
+
+
+def test_relists_when_the_resource_version_expired(cluster, monkeypatch):
+    monkeypatch.setattr(fake_k8s, "EVENT_HISTORY", 2)
+    for i in range(3):
+        cluster.add_deployment("ns", f"extra-{i}")
+    informer = pod_informer(cluster)
+    informer.resource_version = "1"  # resuming from a version the server no longer has
+    informer.start()
+    try:
+        assert eventually(lambda: cluster.calls["list"] == 1)
+        assert informer.wait_synced(5)
+        assert len(informer.list("ns")) == 5
+    finally:
+        informer.stop()
+
+
+def test_relists_on_a_410_error_event(cluster):
+    expired = [True]
+
+    class ExpiringWatch:
+        def __init__(self):
+            self.inner = cluster.watch()
+
+        def stop(self):
+            self.inner.stop()
+
+        def stream(self, func, **kwargs):
+            if expired:
+                expired.pop()
+                yield {"type": "ERROR", "raw_object": {"code": 410, "message": "too old resource version"}}
+                return
+            yield from self.inner.stream(func, **kwargs)
+
+    informer = Informer(cluster.core_v1.list_pod_for_all_namespaces, watch_factory=ExpiringWatch).start()
+    try:
+        assert eventually(lambda: cluster.calls["list"] == 2)
+        cluster.add_deployment("ns", "after")
+        assert eventually(lambda: len(informer.list("ns")) == 3)
+    finally:
+        informer.stop()
+
+
+def test_wait_for_pod_ready_returns_on_the_ready_event(clients):
+    cluster = clients
+    pod_name = cluster.pods("ns", "app")[0]
+    set_ready(cluster, pod_name, False)
+    k8s_utils.start_informers()
+    assert k8s_utils.pod_informer.wait_synced(5)
+    assert not k8s_utils.is_pod_ready(k8s_utils.pod_informer.get("ns", pod_name))
+
+    threading.Timer(0.2, set_ready, (cluster, pod_name, True)).start()
+    started = time.monotonic()
+    assert k8s_utils.wait_for_pod_ready("ns", pod_name, timeout=5)
+    # Woken by the watch event, not by a 3 s poll, and without direct reads
+    assert time.monotonic() - started < 1.5
+    assert cluster.calls["get"] == 0
+
+    set_ready(cluster, pod_name, False)
+    assert eventually(lambda: not k8s_utils.is_pod_ready(k8s_utils.pod_informer.get("ns", pod_name)))
+    assert not k8s_utils.wait_for_pod_ready("ns", pod_name, timeout=0.3)
+
+
+def test_falls_back_to_direct_reads_when_sync_times_out(clients, monkeypatch):
+    cluster = clients
+    cluster.latency = {"list": 3}
+    monkeypatch.setattr(k8s_utils, "CACHE_SYNC_TIMEOUT", 0.2)
+    pod_name = cluster.pods("ns", "app")[0]
+
+    started = time.monotonic()
+    assert k8s_utils._get_pod("ns", pod_name).metadata.name == pod_name
+    assert k8s_utils.wait_for_pod_ready("ns", pod_name, timeout=5)
+    assert k8s_utils._get_pod("ns", "missing") is None
+    # Only the first lookup waited for the sync
+    assert time.monotonic() - started < 1.5
+    assert cluster.calls["get"] == 3
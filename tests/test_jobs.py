@@ -0,0 +1,50 @@
+import asyncio
+
+import pytest
+
+from jobs import JobQueue, QueueFull
+
+
+def test_full_queue_refuses_jobs():
+    async def run():
+        queue = JobQueue(workers=1, max_queued=2)
+        queue.start()
+        release = asyncio.Event()
+        running = queue.submit("heal", release.wait)
+        await asyncio.sleep(0)  # the worker takes the first job
+        queued = [queue.submit("heal", release.wait) for _ in range(2)]
+        assert not queue.has_room()
+        with pytest.raises(QueueFull):
+            queue.submit("heal", release.wait)
+        release.set()
+        await asyncio.gather(*(queue.wait(job) for job in [running, *queued]))
+        assert queue.has_room(2)
+        await queue.stop()
+        return [job.status for job in [running, *queued]]
+
+    assert asyncio.run(run()) == ["succeeded"] * 3
+
+
+def test_forgetting_skips_unfinished_jobs():
+    async def run():
+        queue = JobQueue(workers=2, max_kept=2, max_queued=0)
+        queue.start()
+        release = asyncio.Event()
+
+        async def done():
+            return "done"
+
+        slow = queue.submit("heal", release.wait)
+        finished = [queue.submit("heal", done) for _ in range(3)]
+        await asyncio.gather(*(queue.wait(job) for job in finished))
+        latest = queue.submit("heal", done)
+        kept = (queue.get(slow.id), [queue.get(job.id) for job in finished], queue.get(latest.id))
+        release.set()
+        await queue.wait(slow)
+        await queue.stop()
+        return kept
+
+    slow, finished, latest = asyncio.run(run())
+    # The oldest job was still running, so the finished jobs after it were forgotten instead
+    assert slow is not None and latest is not None
+    assert finished == [None, None, None]
@@ -0,0 +1,162 @@
+import asyncio
+import threading
+import time
+
+import pytest
+
+import llm_backends
+import llm_utils
+from llm_backends import LLMClient, LLMUnavailable
+
+
+class Backend:
+    def __init__(self, name: str, answer: str = None, delay: float = 0):
+        self.name = name
+        self.answer = answer
+        self.delay = delay
+        self.calls = 0
+        self.closed = False
+
+    async def generate(self, prompt: str) -> str:
+        self.calls += 1
+        await asyncio.sleep(self.delay)
+        if self.answer is None:
+            raise RuntimeError(f"{self.name} is down")
+        return self.answer
+
+    async def aclose(self):
+        self.closed = True
+
+
+@pytest.fixture(autouse=True)
+def no_backoff(monkeypatch):
+    monkeypatch.setattr(llm_backends, "LLM_BACKOFF_BASE", 0)
+
+
+@pytest.fixture
+def make_client():
+    clients = []
+
+    def make(backends, **kwargs):
+        client = LLMClient(backends, **{"hedge_after": 0, **kwargs})
+        clients.append(client)
+        return client
+
+    yield make
+    for client in clients:
+        client.close()
+
+
+def test_retry_fails_over_to_the_next_backend(make_client):
+    down, up = Backend("down"), Backend("up", answer="ok")
+    client = make_client([down, up], max_attempts=2)
+    assert client.complete("prompt", str.upper) == ("OK", "up")
+    assert down.calls == 1 and up.calls == 1
+
+
+def test_unusable_answer_is_retried_elsewhere(make_client):
+    def parse(text):
+        if text == "junk":
+            raise ValueError("not json")
+        return text
+
+    client = make_client([Backend("a", answer="junk"), Backend("b", answer="good")], max_attempts=2)
+    assert client.complete("prompt", parse) == ("good", "b")
+
+
+def test_slow_call_is_hedged(make_client):
+    slow, fast = Backend("slow", answer="late", delay=1), Backend("fast", answer="early")
+    client = make_client([slow, fast], hedge_after=0.05)
+    started = time.monotonic()
+    assert client.complete("prompt", str) == ("early", "fast")
+    assert time.monotonic() - started < 0.5
+
+
+def test_open_breaker_skips_the_backend(make_client):
+    down, up = Backend("down"), Backend("up", answer="ok")
+    client = make_client([down, up], max_attempts=1)
+    for _ in range(client.breakers["down"].failures):
+        with pytest.raises(LLMUnavailable):
+            client.complete("prompt", str)
+    assert client.complete("prompt", str) == ("ok", "up")
+    assert down.calls == client.breakers["down"].failures
+
+
+def trip(client, name: str, reset_seconds: float = 0.05):
+    breaker = client.breakers[name]
+    breaker.reset_seconds = reset_seconds
+    for _ in range(breaker.failures):
+        breaker.record(False, 0)
+    time.sleep(reset_seconds)
+    return breaker
+
+
+def test_tripped_backend_recovers_while_another_serves(make_client):
+    a, b = Backend("a", answer="from a"), Backend("b", answer="from b")
+    client = make_client([a, b], max_attempts=2)
+    breaker = trip(client, "b")
+    # a answers; b's trial slot is only taken when a call is actually sent to it
+    for _ in range(3):
+        assert client.complete("prompt", str) == ("from a", "a")
+    assert b.calls == 0 and not breaker._trial
+    a.answer = None
+    assert client.complete("prompt", str) == ("from b", "b")
+    assert breaker._opened_at is None
+
+
+def test_cancelled_trial_frees_the_slot(make_client):
+    a, b = Backend("a", answer="from a", delay=0.2), Backend("b", answer="from b", delay=1)
+    client = make_client([a, b], hedge_after=0.05)
+    breaker = trip(client, "b")
+    assert client.complete("prompt", str) == ("from a", "a")
+    # The losing hedge is cancelled on the client's loop just after the answer is returned
+    deadline = time.monotonic() + 2
+    while breaker._trial and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert b.calls == 1 and not breaker._trial
+    assert breaker.allow()
+
+
+def test_every_breaker_open_fails_at_once(make_client):
+    down = Backend("down")
+    client = make_client([down], max_attempts=1)
+    for _ in range(client.breakers["down"].failures):
+        with pytest.raises(LLMUnavailable):
+            client.complete("prompt", str)
+    with pytest.raises(LLMUnavailable, match="circuit open"):
+        client.complete("prompt", str)
+
+
+def test_close_stops_the_loop_and_closes_backends():
+    stuck = Backend("stuck", answer="never", delay=60)
+    client = LLMClient([stuck], hedge_after=0)
+    errors = []
+
+    def call():
+        try:
+            client.complete("prompt", str)
+        except LLMUnavailable as e:
+            errors.append(e)
+
+    caller = threading.Thread(target=call)
+    caller.start()
+    time.sleep(0.05)
+    client.close()
+    caller.join(5)
+    assert len(errors) == 1
+    assert stuck.closed and not client._thread.is_alive()
+    with pytest.raises(LLMUnavailable):
+        client.complete("prompt", str)
+
+
+def test_use_backends_closes_the_previous_client_and_versions_the_cache():
+    previous, version = llm_utils.llm_client, llm_utils.decision_cache.version
+    llm_utils.decision_cache.set("sig", {"commands": ["true"], "description": ""})
+    try:
+        llm_utils.use_backends([Backend("other", answer="{}")])
+        assert not previous._thread.is_alive()
+        assert llm_utils.decision_cache.version != version
+        assert llm_utils.decision_cache.get("sig") is None
+    finally:
+        llm_utils.use_backends(previous.backends)
+    assert llm_utils.decision_cache.version == version
@@ -0,0 +1,92 @@
+import random
+import time
+
+import pytest
+
+import log_reader
+from fake_k8s import FakeCluster
+from llm_utils import extract_key_errors
+from log_reader import PodLogReader
+
+
+def old_extract_key_errors(logs: str, max_chars=500) -> str:
+    """extract_key_errors as it was before ErrorExtractor."""
+    lines = logs.strip().splitlines()
+    error_lines = []
+    keywords = ["Traceback", "ModuleNotFoundError", "ImportError", "FileNotFoundError", "PermissionError", "RuntimeError", "NameError"]
+    exclude = ["FutureWarning", "DeprecationWarning"]
+
+    for line in reversed(lines):
+        if any(x in line for x in keywords) and not any(y in line for y in exclude):
+            error_lines.insert(0, line)
+
+    extracted = "\n".join(error_lines)
+    return extracted[-max_chars:] if extracted else "\n".join(lines[-10:])[-max_chars:]
+
+
+LINE_PARTS = ["INFO starting", "Traceback (most recent call last):", "ModuleNotFoundError: No module named 'x'",
+              "ImportError: cannot import name 'y'", "FutureWarning: RuntimeError soon", "PermissionError: denied",
+              "DeprecationWarning: NameError", "  File \"app.py\", line 3", "", "   ", "RuntimeError: " + "x" * 300]
+
+
+def test_extract_key_errors_matches_the_old_implementation():
+    rng = random.Random(0)
+    for _ in range(200):
+        logs = "\n".join(rng.choice(LINE_PARTS) + rng.choice(["", " tail", "\t"]) for _ in range(rng.randint(0, 60)))
+        if rng.random() < 0.3:
+            logs = "\n\n " + logs + "\n  \n"
+        for max_chars in (1, 50, 500, 2000):
+            assert extract_key_errors(logs, max_chars) == old_extract_key_errors(logs, max_chars), logs
+
+
+@pytest.fixture
+def cluster():
+    cluster = FakeCluster()
+    cluster.add_deployment("ns", "app", logs=["boot"])
+    return cluster
+
+
+def reader_for(cluster):
+    return PodLogReader(cluster.core_v1, get_pod=lambda ns, name: cluster.core_v1.read_namespaced_pod(name, ns))
+
+
+def test_later_reads_only_take_new_lines(cluster):
+    pod = cluster.pods("ns", "app")[0]
+    reader = reader_for(cluster)
+    assert reader.read("ns", pod) == "boot"
+    time.sleep(0.01)
+    cluster.log("ns", pod, "one")
+    time.sleep(0.01)
+    cluster.log("ns", pod, "two")
+    assert reader.read("ns", pod) == "boot\none\ntwo"
+    # Nothing new: the overlapping since_seconds window is deduplicated
+    assert reader.read("ns", pod) == "boot\none\ntwo"
+    assert cluster.calls["logs"] == 3
+
+
+def test_tail_is_bounded(cluster, monkeypatch):
+    monkeypatch.setattr(log_reader, "LOG_TAIL_LINES", 3)
+    pod = cluster.pods("ns", "app")[0]
+    reader = reader_for(cluster)
+    time.sleep(0.01)
+    cluster.log("ns", pod, *[f"line {i}" for i in range(10)])
+    assert reader.read("ns", pod) == "line 7\nline 8\nline 9"
+
+
+def test_crashed_container_logs_are_read_after_a_restart(cluster):
+    pod = cluster.pods("ns", "app")[0]
+    reader = reader_for(cluster)
+    reader.read("ns", pod)
+    time.sleep(0.01)
+    cluster.crash("ns", pod, "ModuleNotFoundError: No module named 'cv2'")
+    time.sleep(0.01)
+    cluster.log("ns", pod, "restarted")
+    assert reader.read("ns", pod).splitlines() == ["boot", "ModuleNotFoundError: No module named 'cv2'", "restarted"]
+
+
+def test_reader_forgets_least_recently_read_pods(cluster):
+    reader = PodLogReader(cluster.core_v1, max_pods=1)
+    pod = cluster.pods("ns", "app")[0]
+    reader.read("ns", pod)
+    reader.read("ns", "other")
+    assert list(reader._pods) == [("ns", "other", None)]
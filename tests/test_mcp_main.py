@@ -0,0 +1,57 @@
+import asyncio
+import gc
+import time
+
+import main
+
+
+def test_heals_of_one_deployment_serialize_and_locks_are_dropped(monkeypatch):
+    running, overlaps = set(), []
+
+    def heal(namespace, deployment, logs):
+        if deployment in running:
+            overlaps.append(deployment)
+        running.add(deployment)
+        time.sleep(0.05)
+        running.discard(deployment)
+        return {"success": True, "action_taken": "restart"}
+
+    monkeypatch.setattr(main, "analyze_logs_and_heal", heal)
+
+    async def run():
+        await asyncio.gather(*(main._heal("ns", f"app-{i % 2}", f"pod-{i}", logs="boom") for i in range(6)))
+
+    asyncio.run(run())
+    gc.collect()
+    assert overlaps == []
+    assert len(main.deployment_locks) == 0
+
+
+def test_full_queue_answers_429_and_503(monkeypatch):
+    from fastapi import HTTPException
+    from jobs import JobQueue
+
+    class Alerts:
+        async def json(self):
+            return {"alerts": [{"status": "firing", "labels": {"mcp_namespace": "ns", "mcp_deployment": "app", "mcp_pod": "app-1"}}]}
+
+    async def run():
+        queue = JobQueue(workers=1, max_queued=1)
+        monkeypatch.setattr(main, "jobs", queue)
+        queue.start()
+        release = asyncio.Event()
+        queue.submit("heal", release.wait)
+        await asyncio.sleep(0)
+        queue.submit("heal", release.wait)
+        errors = []
+        for call in (main.heal(main.HealRequest(namespace="ns", deployment_name="app", pod_name="app-1"), wait=0),
+                     main.auto_heal(Alerts(), wait=False)):
+            try:
+                await call
+            except HTTPException as e:
+                errors.append((e.status_code, e.headers["Retry-After"]))
+        release.set()
+        await queue.stop()
+        return errors
+
+    assert asyncio.run(run()) == [(429, main.QUEUE_FULL_RETRY_AFTER), (503, main.QUEUE_FULL_RETRY_AFTER)]
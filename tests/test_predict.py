@@ -0,0 +1,24 @@
+import pytest
+
+from app import utils
+
+
+def test_bucketed_results_keep_input_order(model, monkeypatch):
+    texts = ["b" * 200, "hi", "c" * 50, "a" * 400, "mid length text", "d" * 5, "e" * 120]
+    widths = []
+    forward = utils._forward
+
+    def recording_forward(model, inputs, *args):
+        widths.append(inputs["input_ids"].shape[1])
+        return forward(model, inputs, *args)
+
+    monkeypatch.setattr(utils, "_forward", recording_forward)
+    results = utils.predict_bucketed(texts, chunk_size=2, model=model)
+    monkeypatch.setattr(utils, "_forward", forward)
+
+    # Chunks go shortest first, each padded only to its own longest text
+    assert widths == sorted(widths) and len(widths) == 4
+    assert len(results) == len(texts)
+    for text, result in zip(texts, results):
+        alone = utils.predict_batch([text], model=model)[0]
+        assert result["probabilities"]["ai"] == pytest.approx(alone["probabilities"]["ai"], abs=1e-6)
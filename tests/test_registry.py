@@ -0,0 +1,127 @@
+import random
+import time
+
+import pytest
+
+from app import registry as registry_module
+from app.registry import ModelRegistry, ModelVersion
+
+
+class Backend:
+    name = "torch"
+
+
+def version(name: str) -> ModelVersion:
+    return ModelVersion(name, tokenizer=object(), backend=Backend(), model_dir=f"/models/{name}")
+
+
+@pytest.fixture(autouse=True)
+def fast_drain(monkeypatch):
+    monkeypatch.setattr(registry_module, "DRAIN_POLL_SECONDS", 0.01)
+
+
+def served(registry) -> dict:
+    return {v["version"]: v["weight"] for v in registry.versions()}
+
+
+def test_activate_replaces_or_joins():
+    registry = ModelRegistry()
+    v1, v2, v3 = version("v1"), version("v2"), version("v3")
+    registry.activate(v1)
+    registry.activate(v2, weight=0.25, replace=False)
+    assert served(registry) == {"v1": 1.0, "v2": 0.25}
+    assert registry.signature() == "v1:1,v2:0.25"
+    assert registry.primary() is v1
+
+    registry.activate(v3)
+    assert served(registry) == {"v3": 1.0}
+    registry.wait_drained(5)
+    assert v1.backend is None and v2.backend is None and v3.backend is not None
+
+
+def test_reactivating_a_version_replaces_it():
+    registry = ModelRegistry()
+    old, new = version("v1"), version("v1")
+    registry.activate(version("v0"))
+    registry.activate(old, replace=False)
+    registry.activate(new, weight=2, replace=False)
+    assert served(registry) == {"v0": 1.0, "v1": 2.0}
+    assert registry.get("v1") is new
+    registry.wait_drained(5)
+    assert old.backend is None
+
+
+def test_traffic_is_split_by_weight():
+    registry = ModelRegistry()
+    registry.activate(version("stable"), weight=3)
+    registry.activate(version("canary"), weight=1, replace=False)
+    random.seed(0)
+    picks = []
+    for _ in range(4000):
+        with registry.use() as model:
+            picks.append(model.version)
+    assert picks.count("canary") / len(picks) == pytest.approx(0.25, abs=0.03)
+
+    assert registry.set_weight("canary", 3)
+    random.seed(0)
+    picks = []
+    for _ in range(4000):
+        with registry.use() as model:
+            picks.append(model.version)
+    assert picks.count("canary") / len(picks) == pytest.approx(0.5, abs=0.03)
+
+
+def test_weights_must_be_positive_and_known():
+    registry = ModelRegistry()
+    registry.activate(version("v1"))
+    assert not registry.set_weight("missing", 1)
+    for weight in (0, -1):
+        with pytest.raises(ValueError):
+            registry.set_weight("v1", weight)
+        with pytest.raises(ValueError):
+            registry.activate(version("v2"), weight=weight)
+
+
+def test_only_version_is_never_retired():
+    registry = ModelRegistry()
+    v1, v2 = version("v1"), version("v2")
+    registry.activate(v1)
+    assert not registry.retire("v1")
+    assert not registry.retire("missing")
+    registry.activate(v2, replace=False)
+    assert registry.retire("v1")
+    assert served(registry) == {"v2": 1.0}
+    assert not registry.retire("v2")
+    registry.wait_drained(5)
+    assert v1.backend is None and v2.backend is not None
+
+
+def test_no_version_loaded():
+    with pytest.raises(RuntimeError):
+        with ModelRegistry().use():
+            pass
+
+
+def test_retired_version_is_released_only_after_its_calls_drain():
+    registry = ModelRegistry()
+    old = version("old")
+    registry.activate(old)
+    with registry.use() as model:
+        assert model is old
+        registry.activate(version("new"))
+        # No new traffic goes to it, but the running call keeps its model
+        with registry.use() as other:
+            assert other.version == "new"
+        time.sleep(0.1)
+        assert old.backend is not None and old.in_flight == 1
+    registry.wait_drained(5)
+    assert old.backend is None and old.in_flight == 0
+
+
+def test_stragglers_past_the_drain_timeout_keep_the_model():
+    registry = ModelRegistry()
+    stuck = version("stuck")
+    with registry.use(stuck):
+        registry._drain_in_background(stuck, timeout=0.05)
+        registry.wait_drained(5)
+        assert stuck.backend is not None
@@ -0,0 +1,72 @@
+from rules import Rulebook, load_rulebook
+
+RULES = [
+    {"name": "module", "pattern": r"No module named '(?P<module>[A-Za-z0-9_.]+)'",
+     "commands": ["pip install {package}"], "description": "Install {package}"},
+    {"name": "model_file", "pattern": r"FileNotFoundError: .*'(?P<path>[^']*)'", "action": "restart"},
+    {"name": "repeat", "pattern": r"(?P<word>\w+) again (?P=word)", "commands": ["echo {word}"]},
+]
+
+
+def test_first_rule_in_file_wins_with_latest_occurrence():
+    rulebook = Rulebook(RULES, {"cv2": "opencv-python"})
+    logs = "FileNotFoundError: 'model.bin'\nNo module named 'yaml'\nNo module named 'cv2.data'\n"
+    assert rulebook.match(logs) == {
+        "action": "commands",
+        "commands": ["pip install opencv-python"],
+        "description": "Install opencv-python",
+        "rule": "module",
+    }
+
+
+def test_restart_rule_and_backreferences():
+    rulebook = Rulebook(RULES)
+    assert rulebook.match("FileNotFoundError: [Errno 2] 'app/model/config.json'") == {
+        "action": "restart", "commands": [], "description": "Matched rule model_file", "rule": "model_file",
+    }
+    assert rulebook.match("boom again boom")["commands"] == ["echo boom"]
+    assert rulebook.match("boom again bang") is None
+
+
+def test_no_match():
+    assert Rulebook(RULES).match("all good") is None
+    assert Rulebook([]).match("No module named 'x'") is None
+    assert Rulebook(RULES).match(None) is None
+
+
+def test_unsafe_captured_values_are_rejected():
+    rulebook = Rulebook([{"name": "file", "pattern": r"missing '(?P<path>[^']*)'", "commands": ["touch {path}"]}])
+    assert rulebook.match("missing 'data/input.csv'")["commands"] == ["touch data/input.csv"]
+    for value in ("x; rm -rf /", "$(reboot)", "a b", "`id`", "x&&y"):
+        assert rulebook.match(f"missing '{value}'") is None
+
+
+def test_invalid_rules_are_skipped():
+    rulebook = Rulebook([
+        {"name": "bad_regex", "pattern": "(", "commands": ["x"]},
+        {"name": "bad_action", "pattern": "x", "action": "delete"},
+        {"name": "no_commands", "pattern": "x"},
+        {"name": "no_pattern", "commands": ["x"]},
+        {"name": "ok", "pattern": "x", "commands": ["echo ok"]},
+    ])
+    assert [rule["name"] for rule in rulebook.rules] == ["ok"]
+    assert rulebook.match("x")["rule"] == "ok"
+
+
+def test_shipped_rulebook_loads(tmp_path):
+    rulebook = load_rulebook()
+    assert rulebook.rules
+    assert rulebook.match("ModuleNotFoundError: No module named 'sklearn'")["commands"] == \
+        ["pip install scikit-learn"]
+    assert rulebook.match("ModuleNotFoundError: No module named 'app.utils'") is None
+    assert load_rulebook(str(tmp_path / "missing.yaml")).rules == []
+
+
+def test_packages_are_only_installed_from_the_allowlist():
+    packages = {"cv2": "opencv-python", "google.cloud.aiplatform": "google-cloud-aiplatform", "app": "app"}
+    rulebook = Rulebook(RULES, packages, project_packages=["app"])
+    assert rulebook.match("No module named 'google.cloud.aiplatform.v1'")["commands"] == \
+        ["pip install google-cloud-aiplatform"]
+    # Not listed, a sibling of a listed module, or the project's own code
+    for module in ("leftpad", "google.cloud.storage", "google", "app.utils"):
+        assert rulebook.match(f"No module named '{module}'") is None
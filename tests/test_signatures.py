@@ -0,0 +1,29 @@
+from signatures import SIGNATURE_CHARS, error_signature, normalize_errors
+
+
+def test_masks_volatile_parts():
+    line = ("2024-05-01 10:00:00,123 pod api-7f9c6d5b8-x2x9q request 3f2b8c1e-1d2a-4e5f-8a9b-0c1d2e3f4a5b "
+            "at 0x7f3a2b1c failed after 42 tries, commit 0123456789abcdef, File \"app.py\", line 17")
+    assert normalize_errors(line) == (
+        "<ts> pod <pod> request <uuid> at <addr> failed after <n> tries, commit <hash>, File \"app.py\", line <n>"
+    )
+
+
+def test_keeps_each_line_once_at_its_last_occurrence():
+    text = "Traceback\n  File x\nKeyError: 1\nTraceback\n  File x\nKeyError: 2\n\n"
+    assert normalize_errors(text) == "Traceback\nFile x\nKeyError: <n>"
+
+
+def test_signature_is_stable_across_occurrences():
+    first = "2024-05-01T10:00:00Z worker-7f9c6d5b8-x2x9q OSError: [Errno 28] No space left, line 12"
+    second = "2025-01-09T23:59:59Z worker-55d9c8f6b4-abcde OSError: [Errno 28] No space left, line 99"
+    assert error_signature(first) == error_signature(second)
+    assert error_signature(first) != error_signature("KeyError: 'x'")
+    assert len(error_signature(first)) == 16
+
+
+def test_only_the_tail_is_hashed():
+    tail = "\n".join(f"Error number {chr(97 + i)} happened" for i in range(26))
+    assert len(tail) > SIGNATURE_CHARS
+    assert error_signature("unrelated first line\n" + tail) == error_signature("another first line\n" + tail)
+    assert error_signature("") == error_signature(None)
@@ -0,0 +1,99 @@
+import asyncio
+
+from app.streaming import iter_rows, score_rows
+
+
+async def chunks_of(data: bytes, size: int):
+    for i in range(0, len(data), size):
+        yield data[i:i + size]
+
+
+def rows(data: bytes, fmt: str, chunk_size: int = 3, **fields) -> list:
+    async def collect():
+        return [row async for row in iter_rows(chunks_of(data, chunk_size), fmt, **fields)]
+
+    return asyncio.run(collect())
+
+
+def test_ndjson_rows():
+    body = '{"id": 7, "text": "héllo"}\r\n"bare string"\n\nnot json\n{"id": 9, "text": " "}\n{"id": 10}'
+    assert rows(body.encode("utf-8"), "ndjson") == [
+        (0, 7, "héllo", None),
+        (1, None, "bare string", None),
+        (2, None, None, "Invalid JSON: Expecting value: line 1 column 1 (char 0)"),
+        (3, 9, None, "Missing or empty 'text'"),
+        (4, 10, None, "Missing or empty 'text'"),
+    ]
+
+
+def test_ndjson_custom_fields():
+    body = b'{"doc": "a", "body": "some text"}\n'
+    assert rows(body, "ndjson", text_field="body", id_field="doc") == [(0, "a", "some text", None)]
+
+
+def test_csv_rows_with_quoted_newlines():
+    body = 'id,text\r\n1,plain\n2,"two\nlines, with comma"\n3,\n4,"say ""hi"""'
+    assert rows(body.encode(), "csv") == [
+        (0, "1", "plain", None),
+        (1, "2", "two\nlines, with comma", None),
+        (2, "3", None, "Missing or empty 'text'"),
+        (3, "4", 'say "hi"', None),
+    ]
+
+
+def test_csv_without_text_column():
+    assert rows(b"id,body\n1,x\n", "csv") == [(0, None, None, "CSV header has no 'text' column")]
+
+
+def test_score_rows_keeps_order_and_errors():
+    calls = []
+
+    async def score_batch(texts):
+        calls.append(list(texts))
+        return [{"prediction": len(text)} for text in texts]
+
+    items = [(0, "a", "x", None), (1, None, None, "bad"), (2, "c", "yyy", None)]
+
+    async def collect():
+        async def source():
+            for item in items:
+                yield item
+
+        return [line async for line in score_rows(source(), score_batch, batch_size=2)]
+
+    assert asyncio.run(collect()) == [
+        '{"row": 0, "id": "a", "prediction": 1}\n',
+        '{"row": 1, "error": "bad"}\n',
+        '{"row": 2, "id": "c", "prediction": 3}\n',
+    ]
+    assert calls == [["x"], ["yyy"]]
+
+
+def test_overlong_ndjson_line_is_skipped():
+    body = b'"short"\n"' + b"x" * 50 + b'"\n"after"'
+    assert rows(body, "ndjson", chunk_size=7, max_chars=20) == [
+        (0, None, "short", None),
+        (1, None, None, "Record longer than 20 characters"),
+        (2, None, "after", None),
+    ]
+
+
+def test_overlong_line_without_newline_is_not_buffered():
+    body = b'"a"\n' + b"y" * 10_000
+    assert rows(body, "ndjson", chunk_size=64, max_chars=100) == [
+        (0, None, "a", None),
+        (1, None, None, "Record longer than 100 characters"),
+    ]
+
+
+def test_unbalanced_csv_quote_resyncs():
+    body = 'id,text\n1,"never closed\n' + "".join(f"{i},row {i}\n" for i in range(2, 40)) + "ok,fine\n"
+    result = rows(body.encode(), "csv", chunk_size=16, max_chars=60)
+    assert (0, None, None, "Record longer than 60 characters") in result
+    assert result[-1] == (len(result) - 1, "ok", "fine", None)
+
+
+def test_overlong_csv_header():
+    assert rows(b"id," + b"h" * 100 + b"\n1,x\n", "csv", max_chars=20) == [
+        (0, None, None, "CSV header longer than 20 characters"),
+    ]
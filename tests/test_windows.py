@@ -0,0 +1,42 @@
+import pytest
+
+from app import utils
+
+
+def window_starts(model, tokens: int, stride: int) -> list:
+    # The byte-level test tokenizer maps each lowercase letter to one token
+    result = utils.predict_long("a" * tokens, stride=stride, return_windows=True, model=model)
+    return [(w["start"], w["end"]) for w in result["windows"]]
+
+
+def test_short_text_is_one_window(model):
+    assert window_starts(model, 100, 256) == [(0, 100)]
+
+
+def test_windows_overlap_by_stride_and_cover_the_end(model):
+    window_size = utils.MAX_LENGTH - 2
+    assert window_starts(model, 1000, 256) == [(0, 510), (256, 766), (512, 1000)]
+    assert window_starts(model, window_size, 256) == [(0, window_size)]
+    assert window_starts(model, window_size + 1, 256) == [(0, window_size), (256, window_size + 1)]
+
+
+def test_stride_is_clamped_to_the_window(model):
+    assert window_starts(model, 1200, 10_000) == [(0, 510), (510, 1020), (1020, 1200)]
+
+
+def test_too_many_windows(model, monkeypatch):
+    monkeypatch.setattr(utils, "MAX_WINDOWS", 2)
+    with pytest.raises(ValueError):
+        utils.predict_long("a" * 1000, stride=256, model=model)
+
+
+def test_aggregations(model):
+    text = "a" * 700 + "b" * 700
+    per_window = [w["probabilities"]["ai"]
+                  for w in utils.predict_long(text, return_windows=True, model=model)["windows"]]
+    mean = utils.predict_long(text, aggregation="mean", model=model)["probabilities"]["ai"]
+    assert mean == pytest.approx(sum(per_window) / len(per_window))
+    assert utils.predict_long(text, aggregation="max", model=model)["probabilities"]["ai"] == \
+        pytest.approx(max(per_window))
+    with pytest.raises(ValueError):
+        utils.predict_long(text, aggregation="median", model=model)